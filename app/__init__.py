@@ -2,6 +2,9 @@
 from flask import Flask
 from .config import Config
 from .models import db
+from .cache import cache
+from .profiler import profiler
+from . import metrics, db_engine
 from .routes import bp as main_bp
 from .auth.routes_auth import auth_bp, login_manager
 from .orders_routes import orders_bp 
@@ -10,6 +13,20 @@ from .followups_routes import followups_bp
 from .payments_routes import payments_bp
 from .products_routes import products_bp
 from .quotes_routes import quotes_bp
+from .bulk_export_routes import bulk_export_bp, export_command
+from .jobs_routes import jobs_bp
+from .receivables_routes import receivables_bp
+from .profiler_routes import profiler_bp
+from .notifications_routes import notifications_bp
+from .jobs import jobs_worker_command
+from .scheduler import followups_scheduler_command
+from .batch_pdf_routes import batch_pdf_bp, pdf_batch_command
+from .balances import balances_reconcile_command
+from .db_indexes import db_indexes_command
+from .search import search_index_command
+from .rollups import rollups_rebuild_command
+from .seed import seed_command
+from .benchmark import bench_command, bench_login_command
 
 
 def create_app():
@@ -17,7 +34,11 @@ def create_app():
     app.config.from_object(Config)
 
     db.init_app(app)
+    db_engine.init_app(app)
     login_manager.init_app(app)
+    cache.init_app(app)
+    profiler.init_app(app)
+    metrics.init_app(app)
 
     # Blueprints
     app.register_blueprint(auth_bp, url_prefix="/auth")
@@ -28,5 +49,25 @@ def create_app():
     app.register_blueprint(payments_bp)
     app.register_blueprint(products_bp)
     app.register_blueprint(quotes_bp)
+    app.register_blueprint(bulk_export_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(batch_pdf_bp)
+    app.register_blueprint(receivables_bp)
+    app.register_blueprint(profiler_bp)
+    app.register_blueprint(notifications_bp)
+    app.register_blueprint(metrics.metrics_bp)
+
+    # Comandos CLI (flask <comando>)
+    app.cli.add_command(search_index_command)
+    app.cli.add_command(rollups_rebuild_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(jobs_worker_command)
+    app.cli.add_command(followups_scheduler_command)
+    app.cli.add_command(pdf_batch_command)
+    app.cli.add_command(balances_reconcile_command)
+    app.cli.add_command(db_indexes_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bench_command)
+    app.cli.add_command(bench_login_command)
 
     return app
@@ -0,0 +1,88 @@
+# app/auth/passwords.py
+"""Política de hash de contraseñas y verificación en un pool acotado.
+
+- ``PASSWORD_HASH_METHOD`` define el algoritmo y costo (formato de Werkzeug:
+  ``scrypt:16384:8:1``, ``pbkdf2:sha256:600000``...). Al iniciar sesión con
+  un hash hecho con otra política se vuelve a generar con la vigente.
+- ``verify`` corre ``check_password_hash`` en un pool de
+  ``PASSWORD_VERIFY_WORKERS`` hilos (hashlib suelta el GIL en scrypt/pbkdf2),
+  así una ola de inicios de sesión usa como máximo esos núcleos y el resto de
+  peticiones del worker sigue atendiéndose (con workers ``gthread``, ver
+  gunicorn.conf.py; el worker ``sync`` atiende una a la vez). Si ya hay
+  ``PASSWORD_VERIFY_QUEUE`` verificaciones esperando, se rechaza con
+  ``VerifyBusy`` en vez de acumular.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = "scrypt"
+
+
+class VerifyBusy(Exception):
+    """Demasiadas verificaciones de contraseña en curso en este worker."""
+
+
+def policy():
+    if has_app_context():
+        return current_app.config.get("PASSWORD_HASH_METHOD") or DEFAULT_METHOD
+    return DEFAULT_METHOD
+
+
+@lru_cache(maxsize=8)
+def _normalized(method):
+    # "scrypt" -> "scrypt:32768:8:1": Werkzeug completa los parámetros por defecto
+    return generate_password_hash("x", method=method).split("$", 1)[0]
+
+
+def hash_password(raw, method=None):
+    return generate_password_hash(raw, method=method or policy())
+
+
+def needs_rehash(pwhash, method=None):
+    """True si ``pwhash`` no se generó con la política vigente."""
+    return pwhash.split("$", 1)[0] != _normalized(method or policy())
+
+
+def hash_many(raws, method=None, processes=None):
+    """Hashes de ``raws`` en paralelo (altas masivas); mismo orden que la entrada."""
+    method = method or policy()
+    if processes == 1 or len(raws) < 2:
+        return [generate_password_hash(r, method=method) for r in raws]
+    with ProcessPoolExecutor(max_workers=processes) as ex:
+        return list(ex.map(generate_password_hash, raws, [method] * len(raws),
+                           chunksize=max(len(raws) // ((processes or os.cpu_count() or 1) * 4), 1)))
+
+
+# -----------------------------
+# Verificación acotada
+# -----------------------------
+_lock = threading.Lock()
+_state = {"pid": None, "pool": None, "slots": None}
+
+
+def _pool():
+    with _lock:
+        if _state["pid"] != os.getpid():   # no heredar hilos tras un fork
+            workers = current_app.config.get("PASSWORD_VERIFY_WORKERS", 2)
+            queue = current_app.config.get("PASSWORD_VERIFY_QUEUE", 32)
+            _state.update(pid=os.getpid(),
+                          pool=ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwverify"),
+                          slots=threading.BoundedSemaphore(workers + queue))
+        return _state["pool"], _state["slots"]
+
+
+def verify(pwhash, raw):
+    """``check_password_hash`` en el pool; lanza ``VerifyBusy`` si está saturado."""
+    pool, slots = _pool()
+    timeout = current_app.config.get("PASSWORD_VERIFY_TIMEOUT", 5)
+    if not slots.acquire(timeout=timeout):
+        raise VerifyBusy()
+    try:
+        return pool.submit(check_password_hash, pwhash, raw).result()
+    finally:
+        slots.release()
@@ -1,7 +1,9 @@
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from ..models import db, User
+from .passwords import VerifyBusy, needs_rehash, verify
+from .user_cache import SESSION_KEY, detached_user, user_cache
 
 auth_bp = Blueprint("auth", __name__, template_folder="../templates")
 login_manager = LoginManager()
@@ -9,7 +11,16 @@ login_manager.login_view = "auth.login"
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Sin consulta mientras la copia del worker siga vigente (ver user_cache.py)
+    data = user_cache.get(int(user_id))
+    if data is None:
+        return None
+    stored = session.get(SESSION_KEY)
+    if stored is None:
+        session[SESSION_KEY] = data["session_version"]   # sesiones anteriores a este cambio
+    elif stored != data["session_version"]:
+        return None                                      # la contraseña cambió
+    return detached_user(data)
 
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
@@ -18,8 +29,20 @@ def login():
         password = request.form.get("password", "")
 
         user = User.query.filter_by(email=email).first()
-        if user and user.is_active and user.check_password(password):
+        try:
+            # Verificación fuera del hilo de la petición, con concurrencia acotada
+            ok = bool(user and user.is_active and verify(user.password_hash, password))
+        except VerifyBusy:
+            flash("Hay demasiados inicios de sesión en este momento. Intente de nuevo.", "warning")
+            return render_template("login.html"), 503
+        if ok:
+            if needs_rehash(user.password_hash):
+                # Cambió PASSWORD_HASH_METHOD: guardar con la política vigente
+                # (las demás sesiones siguen valiendo)
+                user.rehash_password(password)
+                db.session.commit()
             login_user(user)
+            session[SESSION_KEY] = user.session_version
             flash("Sesión iniciada.", "success")
             next_url = request.args.get("next") or url_for("main.list_clients")
             return redirect(next_url)
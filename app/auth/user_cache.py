@@ -0,0 +1,83 @@
+# app/auth/user_cache.py
+"""Caché por worker del usuario de la sesión (lo que carga ``load_user``).
+
+Cada petición autenticada necesitaba un SELECT de ``users``. Aquí se guarda
+por id una copia de las columnas del usuario durante ``USER_CACHE_TTL``
+segundos y se arma un ``User`` desprendido de la sesión, sin tocar la base.
+
+Cualquier commit que modifique un usuario (``is_active``, contraseña...)
+incrementa la versión compartida "users" (``VERSIONS_BY_MODEL`` en
+cache.py) y todos los workers vacían su copia en la siguiente petición.
+
+``User.session_version`` se guarda en la cookie al iniciar sesión; si ya
+no coincide (la contraseña cambió) la sesión deja de ser válida. Volver a
+generar el hash con otra política al iniciar sesión no lo cambia.
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import inspect as sa_inspect, select, text
+from sqlalchemy.orm import make_transient_to_detached
+
+from ..cache import cache
+from ..models import db, User
+
+VERSION_NAME = "users"
+SESSION_KEY = "_session_version"
+
+
+class UserCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = {}   # id -> (vence, columnas)
+
+    def get(self, user_id):
+        """Columnas del usuario (dict) o None si no existe."""
+        version = cache.version(VERSION_NAME)
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(user_id)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        row = db.session.execute(
+            select(User.id, User.email, User.is_active, User.created_at, User.session_version)
+            .where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        data = dict(row._mapping)
+        ttl = current_app.config.get("USER_CACHE_TTL", 30)
+        with self._lock:
+            if self._version == version:
+                self._entries[user_id] = (now + ttl, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def detached_user(data):
+    """``User`` con las columnas cacheadas, desprendido (no está en ninguna sesión)."""
+    user = User(**data)
+    make_transient_to_detached(user)
+    return user
+
+
+def install():
+    """Agrega ``users.session_version`` a una base existente; True si la agregó."""
+    cols = {c["name"] for c in sa_inspect(db.engine).get_columns("users")}
+    if "session_version" in cols:
+        return False
+    with db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN session_version INTEGER NOT NULL DEFAULT 0"))
+    return True
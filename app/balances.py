@@ -0,0 +1,167 @@
+# app/balances.py
+"""Pagado y saldo de cada pedido guardados como columnas (``Order.paid_total``,
+``Order.balance``), igual que ``Order.total``.
+
+- Al hacer flush de pagos nuevos / borrados / modificados se ajusta el pedido
+  con ``UPDATE orders SET paid_total = paid_total + d, balance = balance - d``
+  en la misma transacción (suma atómica: dos pagos simultáneos no se pisan).
+- Si cambia ``Order.total`` se recalcula ``balance = total - paid_total``.
+- ``flask balances-reconcile`` compara contra SUM(payments) y reporta (o con
+  ``--fix`` corrige) las diferencias; también crea las columnas en una base
+  existente.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+import click
+from sqlalchemy import event, func, inspect as sa_inspect, select, text, update
+from sqlalchemy.orm import attributes
+from sqlalchemy.orm.util import identity_key
+
+from flask_sqlalchemy.session import Session
+
+from .cache import mark_tags
+from .models import db, _D, Order, Payment
+
+_INFO_KEY = "balance_orders"
+
+
+def apply_payment(conn, order_id, delta):
+    """Suma ``delta`` a lo pagado del pedido (para escrituras Core/bulk de pagos)."""
+    conn.execute(
+        update(Order)
+        .where(Order.id == order_id)
+        .values(paid_total=Order.paid_total + delta, balance=Order.balance - delta)
+    )
+
+
+# -----------------------------
+# Mantenimiento en el flush
+# -----------------------------
+@event.listens_for(Session, "before_flush")
+def _sync_balance(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, Order):
+            obj.balance = _D(obj.total) - _D(obj.paid_total)
+    for obj in session.dirty:
+        if isinstance(obj, Order) and attributes.get_history(obj, "total").added:
+            # Expresión SQL: usa el paid_total vigente en la BD, no el cargado
+            obj.balance = _D(obj.total) - Order.paid_total
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_payments(session, flush_context):
+    deltas = defaultdict(Decimal)
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            deltas[obj.order_id] += _D(obj.amount)
+    for obj in session.deleted:
+        if isinstance(obj, Payment):
+            hist_order = attributes.get_history(obj, "order_id")
+            order_id = (hist_order.deleted or hist_order.unchanged or [obj.order_id])[0]
+            hist_amount = attributes.get_history(obj, "amount")
+            deltas[order_id] -= _D((hist_amount.deleted or hist_amount.unchanged or [obj.amount])[0])
+    for obj in session.dirty:
+        if not isinstance(obj, Payment):
+            continue
+        hist_order = attributes.get_history(obj, "order_id")
+        hist_amount = attributes.get_history(obj, "amount")
+        if not (hist_order.has_changes() or hist_amount.has_changes()):
+            continue
+        old_order = (hist_order.deleted or hist_order.unchanged)[0]
+        old_amount = (hist_amount.deleted or hist_amount.unchanged)[0]
+        deltas[old_order] -= _D(old_amount)
+        deltas[obj.order_id] += _D(obj.amount)
+
+    deltas = {oid: d for oid, d in deltas.items() if oid and d}
+    if not deltas:
+        return
+    conn = session.connection()
+    for order_id, delta in deltas.items():
+        apply_payment(conn, order_id, delta)
+    session.info.setdefault(_INFO_KEY, set()).update(deltas)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _expire_orders(session, flush_context):
+    # Los pedidos ya cargados tienen paid_total/balance viejos
+    for order_id in session.info.pop(_INFO_KEY, ()):
+        obj = session.identity_map.get(identity_key(Order, order_id))
+        if obj is not None:
+            session.expire(obj, ["paid_total", "balance"])
+
+
+# -----------------------------
+# Conciliación
+# -----------------------------
+def _real_paid():
+    return (select(Payment.order_id, func.sum(Payment.amount).label("paid"))
+            .group_by(Payment.order_id)
+            .subquery())
+
+
+def find_drift(limit=None):
+    """Pedidos cuyo paid_total/balance no cuadra con SUM(payments)."""
+    paid = _real_paid()
+    real = func.coalesce(paid.c.paid, 0)
+    stmt = (select(Order.id, Order.total, Order.paid_total, Order.balance, real.label("real_paid"))
+            .outerjoin(paid, paid.c.order_id == Order.id)
+            # Redondeo a centavos: SQLite guarda NUMERIC como REAL y la resta no es exacta
+            .where((func.round(Order.paid_total - real, 2) != 0)
+                   | (func.round(Order.balance - (Order.total - real), 2) != 0))
+            .order_by(Order.id))
+    if limit:
+        stmt = stmt.limit(limit)
+    return db.session.execute(stmt).all()
+
+
+def fix_drift(order_ids):
+    """Recalcula paid_total y balance desde los pagos para ``order_ids``."""
+    real = (select(func.coalesce(func.sum(Payment.amount), 0))
+            .where(Payment.order_id == Order.id)
+            .scalar_subquery())
+    for i in range(0, len(order_ids), 500):
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids[i:i + 500]))
+            .values(paid_total=real, balance=Order.total - real)
+            .execution_options(synchronize_session=False)
+        )
+    mark_tags(db.session, "dashboard", "receivables")
+    db.session.commit()
+
+
+def install():
+    """Agrega las columnas e índice a una tabla ``orders`` ya existente."""
+    cols = {c["name"] for c in sa_inspect(db.engine).get_columns("orders")}
+    with db.engine.begin() as conn:
+        for name in ("paid_total", "balance"):
+            if name not in cols:
+                conn.execute(text(
+                    f"ALTER TABLE orders ADD COLUMN {name} DECIMAL(10, 2) NOT NULL DEFAULT 0"))
+        for index in Order.__table__.indexes:
+            index.create(conn, checkfirst=True)
+    return bool({"paid_total", "balance"} - cols)
+
+
+@click.command("balances-reconcile")
+@click.option("--fix", is_flag=True, help="Corrige los pedidos con diferencias.")
+def balances_reconcile_command(fix):
+    """Compara paid_total/balance de los pedidos contra la suma de pagos."""
+    if install():
+        click.echo("▶ Columnas paid_total / balance agregadas a orders.")
+    drift = find_drift()
+    if not drift:
+        click.echo("✅ Sin diferencias.")
+        return
+    click.echo(f"⚠️  {len(drift)} pedidos con diferencias:")
+    for r in drift[:20]:
+        click.echo(f"  #{r.id}: pagado {r.paid_total} (real {r.real_paid}), "
+                   f"saldo {r.balance} (real {_D(r.total) - _D(r.real_paid)})")
+    if len(drift) > 20:
+        click.echo(f"  ... y {len(drift) - 20} más")
+    if fix:
+        fix_drift([r.id for r in drift])
+        click.echo("✅ Corregido.")
+    else:
+        raise SystemExit(1)
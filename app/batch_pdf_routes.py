@@ -0,0 +1,280 @@
+# app/batch_pdf_routes.py
+"""Impresión por lotes de facturas (pedidos) y cotizaciones.
+
+GET /pdf/batch/<orders|quotes>.<pdf|zip>
+    ?ids=1,2,3  o filtros: status, client_id, q, date_from, date_to (YYYY-MM-DD)
+flask pdf-batch <orders|quotes> [--format pdf|zip] [filtros] -o archivo
+
+Los documentos se generan con las mismas funciones que las rutas
+individuales y pasando por la caché de PDFs, así que lo ya impreso no se
+vuelve a dibujar. La ruta web genera en el mismo proceso, sin pool, los
+lotes de hasta BATCH_PDF_SYNC_MAX_DOCS documentos; los más grandes (o con
+``?async=1``) van a la cola de trabajos (ver jobs.py), igual que la CLI se
+reparten en un ProcessPoolExecutor de BATCH_PDF_WORKERS procesos. Así un
+lote pesado no abre procesos dentro de un worker de gunicorn.
+
+El ZIP se envía a medida que llegan los documentos; el PDF unido se arma
+con pypdf al final. Ambos informan el rendimiento en documentos por segundo
+(cabeceras X-Batch-* en el PDF, ``resumen.txt`` al final del ZIP, y en
+consola).
+"""
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import click
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from flask_login import login_required
+from pypdf import PdfWriter
+from sqlalchemy import type_coerce
+
+from . import pdf_cache
+from .exports import stream_file
+from .jobs_routes import wants_async, enqueue_response
+from .models import db, Client, Order, Quote
+from .search import client_match
+
+batch_pdf_bp = Blueprint("batch_pdf", __name__)
+
+KINDS = {"orders": Order, "quotes": Quote}
+FORMATS = {"pdf": "application/pdf", "zip": "application/zip"}
+CHUNK = 20  # documentos por tarea enviada al pool
+
+
+# -----------------------------
+# Selección de documentos
+# -----------------------------
+def select_ids(kind, ids=None, status=None, client_id=None, q=None, date_from=None, date_to=None):
+    """Ids (ordenados) de los pedidos/cotizaciones que cumplen los filtros."""
+    model = KINDS[kind]
+    stmt = db.select(model.id).order_by(model.id)
+    if ids:
+        stmt = stmt.where(model.id.in_(ids))
+    if status:
+        stmt = stmt.where(model.status == status)
+    if client_id:
+        stmt = stmt.where(model.client_id == client_id)
+    if q:
+        stmt = stmt.join(Client, Client.id == model.client_id).where(client_match(q))
+    if date_from:
+        stmt = stmt.where(model.created_at >= type_coerce(date_from, db.Date))
+    if date_to:
+        stmt = stmt.where(model.created_at < type_coerce(date_to + timedelta(days=1), db.Date))
+    return list(db.session.execute(stmt).scalars())
+
+
+# -----------------------------
+# Render (en el proceso que sea)
+# -----------------------------
+def _render_one(kind, doc_id):
+    if kind == "orders":
+        from .orders_routes import order_pdf_key, render_order_pdf
+        order = db.session.get(Order, doc_id)
+        if order is None:
+            return None, None
+        key, render, name = order_pdf_key(order), (lambda: render_order_pdf(order)), f"Pedido_{order.id}.pdf"
+    else:
+        from .quotes_routes import quote_pdf_key, render_quote_pdf
+        q = db.session.get(Quote, doc_id)
+        if q is None:
+            return None, None
+        key, render, name = quote_pdf_key(q), (lambda: render_quote_pdf(q)), f"cotizacion_{q.id}.pdf"
+
+    if not current_app.config.get("PDF_CACHE_ENABLED", True):
+        return name, render()
+    with open(pdf_cache.get_or_render(key, render), "rb") as fh:
+        return name, fh.read()
+
+
+def _render_chunk(kind, ids):
+    try:
+        return [doc for doc in (_render_one(kind, i) for i in ids) if doc[0]]
+    finally:
+        db.session.remove()
+
+
+_child_app = None
+
+
+def _init_child():
+    global _child_app
+    from . import create_app
+    _child_app = create_app()
+
+
+def _render_chunk_in_child(kind, ids):
+    with _child_app.app_context():
+        return _render_chunk(kind, ids)
+
+
+def iter_documents(kind, ids, processes=None):
+    """Genera (nombre, bytes) en orden de id. Con 1 proceso no abre pool."""
+    processes = processes or current_app.config.get("BATCH_PDF_WORKERS", 4)
+    chunks = [ids[i:i + CHUNK] for i in range(0, len(ids), CHUNK)]
+    if processes <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _render_chunk(kind, chunk)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(processes, len(chunks)), mp_context=ctx,
+                             initializer=_init_child) as pool:
+        for docs in pool.map(_render_chunk_in_child, [kind] * len(chunks), chunks):
+            yield from docs
+
+
+class BatchStats:
+    def __init__(self):
+        self.docs = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return f"{self.docs} documentos en {self.seconds:.1f} s ({self.rate:.1f} docs/s)"
+
+
+# -----------------------------
+# Salidas
+# -----------------------------
+def write_merged(kind, ids, out, processes=None):
+    """Une todos los PDFs en uno solo y lo escribe en ``out`` (archivo binario)."""
+    stats = BatchStats()
+    writer = PdfWriter()
+    for _, data in iter_documents(kind, ids, processes):
+        writer.append(io.BytesIO(data))
+        stats.docs += 1
+    writer.write(out)
+    return stats
+
+
+class _ZipSink(io.RawIOBase):
+    """Destino no 'seekable' para zipfile: acumula bytes hasta que se piden."""
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_zip(kind, ids, processes=None, stats=None):
+    """Genera el ZIP por trozos a medida que llegan los documentos."""
+    stats = stats or BatchStats()
+    sink = _ZipSink()
+    # Los PDF ya vienen comprimidos: ZIP_STORED
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+        for name, data in iter_documents(kind, ids, processes):
+            zf.writestr(name, data)
+            stats.docs += 1
+            yield sink.drain()
+        zf.writestr("resumen.txt", stats.summary() + "\n")
+    yield sink.drain()
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def _parse_ids(value):
+    return [int(x) for x in value.replace(" ", "").split(",") if x] if value else None
+
+
+@batch_pdf_bp.route("/pdf/batch/<kind>.<fmt>")
+@login_required
+def batch_pdf(kind, fmt):
+    if kind not in KINDS or fmt not in FORMATS:
+        abort(404)
+    try:
+        ids = select_ids(
+            kind,
+            ids=_parse_ids(request.args.get("ids")),
+            status=(request.args.get("status") or "").strip(),
+            client_id=request.args.get("client_id", type=int),
+            q=(request.args.get("q") or "").strip(),
+            date_from=_parse_date(request.args.get("date_from")),
+            date_to=_parse_date(request.args.get("date_to")),
+        )
+    except ValueError:
+        return jsonify({"error": "ids debe ser una lista de enteros y las fechas YYYY-MM-DD"}), 400
+
+    limit = current_app.config.get("BATCH_PDF_MAX_DOCS", 2000)
+    if not ids:
+        return jsonify({"error": "Ningún documento cumple los filtros"}), 404
+    if len(ids) > limit:
+        return jsonify({"error": f"Máximo {limit} documentos por lote (usa flask pdf-batch)"}), 413
+    if wants_async() or len(ids) > current_app.config.get("BATCH_PDF_SYNC_MAX_DOCS", 100):
+        return enqueue_response("batch_pdf", {"kind": kind, "fmt": fmt, "ids": ids})
+
+    # En la petición, sin pool: si el cliente corta el ZIP se deja de generar
+    name = f"{kind}_{date.today().isoformat()}.{fmt}"
+    if fmt == "zip":
+        return Response(
+            stream_with_context(iter_zip(kind, ids, processes=1)),
+            mimetype=FORMATS[fmt],
+            headers={"Content-Disposition": f'attachment; filename="{name}"'},
+        )
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            stats = write_merged(kind, ids, fh, processes=1)
+    except Exception:
+        os.remove(path)
+        raise
+    current_app.logger.info("pdf-batch %s: %s", kind, stats.summary())
+    resp = stream_file(path, name, FORMATS[fmt])
+    resp.headers["X-Batch-Docs"] = str(stats.docs)
+    resp.headers["X-Batch-Seconds"] = f"{stats.seconds:.3f}"
+    resp.headers["X-Batch-Docs-Per-Second"] = f"{stats.rate:.2f}"
+    return resp
+
+
+@click.command("pdf-batch")
+@click.argument("kind", type=click.Choice(sorted(KINDS)))
+@click.option("--format", "fmt", type=click.Choice(sorted(FORMATS)), default="pdf")
+@click.option("--ids", help="Lista de ids separados por coma.")
+@click.option("--status")
+@click.option("--client-id", type=int)
+@click.option("--from", "date_from", help="Desde (YYYY-MM-DD).")
+@click.option("--to", "date_to", help="Hasta, inclusive (YYYY-MM-DD).")
+@click.option("--processes", "-p", type=int, help="Procesos del pool (BATCH_PDF_WORKERS).")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), required=True)
+def pdf_batch_command(kind, fmt, ids, status, client_id, date_from, date_to, processes, output):
+    """Genera en paralelo un PDF unido o un ZIP con facturas / cotizaciones."""
+    try:
+        doc_ids = select_ids(kind, ids=_parse_ids(ids), status=status, client_id=client_id,
+                             date_from=_parse_date(date_from), date_to=_parse_date(date_to))
+    except ValueError:
+        raise click.BadParameter("ids enteros y fechas YYYY-MM-DD")
+    if not doc_ids:
+        click.echo("Ningún documento cumple los filtros.", err=True)
+        sys.exit(1)
+
+    with open(output, "wb") as fh:
+        if fmt == "pdf":
+            stats = write_merged(kind, doc_ids, fh, processes)
+        else:
+            stats = BatchStats()
+            for chunk in iter_zip(kind, doc_ids, processes, stats):
+                fh.write(chunk)
+    click.echo(f"✅ {stats.summary()} → {output}")
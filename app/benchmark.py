@@ -0,0 +1,291 @@
+# app/benchmark.py
+"""Benchmark de las rutas principales dentro del proceso (``flask bench``).
+
+Usa el cliente de pruebas de Flask con la sesión de un usuario existente,
+así que mide la aplicación completa (consultas, plantillas, PDFs, XLSX) sin
+red ni servidor. Para cada ruta reporta p50/p95/p99 y consultas por
+petición, y guarda el resultado en JSON con el commit actual para comparar
+corridas (``--compare anterior.json``). Pensado para SQLite con datos de
+``flask seed``.
+"""
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import delete, event, func, select
+
+from .cache import cache
+from .models import db, Client, FollowUp, Order, OrderItem, Payment, Quote, User
+
+# (nombre, peso): las rutas pesadas corren menos veces
+ROUTES = [
+    ("orders", 1), ("orders_page", 1), ("orders_status", 1), ("clients_search", 1),
+    ("dashboard", 1), ("api_followups", 1), ("order_pdf", 3), ("quote_pdf", 3),
+    ("orders_export", 10),
+]
+
+
+def percentile(sorted_values, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    k = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(k, len(sorted_values) - 1)]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _url_factories(rnd):
+    """{ruta: función() -> URL} con valores tomados de la base."""
+    max_order = db.session.scalar(select(func.max(Order.id))) or 0
+    max_quote = db.session.scalar(select(func.max(Quote.id))) or 0
+    names = [n for n, in db.session.execute(
+        select(Client.last_name).group_by(Client.last_name).limit(50))]
+    pages = max((db.session.scalar(select(func.count(Order.id))) or 0) // 10, 1)
+    first_fu = db.session.scalar(select(func.min(FollowUp.when_at))) or datetime.utcnow()
+    last_fu = db.session.scalar(select(func.max(FollowUp.when_at))) or datetime.utcnow()
+    span = max((last_fu - first_fu).days - 35, 1)
+
+    def month():
+        start = first_fu.date() + timedelta(days=rnd.randrange(span))
+        return f"/api/followups?start={start}&end={start + timedelta(days=35)}"
+
+    return {
+        "orders": lambda: "/orders",
+        "orders_page": lambda: f"/orders?page={rnd.randrange(1, min(pages, 500) + 1)}",
+        "orders_status": lambda: f"/orders?status={rnd.choice(['pendiente', 'enviado', 'cancelado'])}",
+        "clients_search": lambda: f"/clients?q={rnd.choice(names or ['a'])[:4]}",
+        "dashboard": lambda: "/dashboard",
+        "api_followups": month,
+        "order_pdf": lambda: f"/orders/{rnd.randrange(1, max_order + 1)}/invoice.pdf",
+        "quote_pdf": lambda: f"/quotes/{rnd.randrange(1, max_quote + 1)}/pdf",
+        "orders_export": lambda: f"/orders/export?q={rnd.choice(names or ['a'])}&status=cancelado",
+    }
+
+
+def _row_counts():
+    return {m.__tablename__: db.session.scalar(select(func.count()).select_from(m))
+            for m in (Client, Order, OrderItem, Payment, Quote, FollowUp)}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=current_app.root_path, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(requests=30, warmup=3, only=None, seed=1):
+    """Corre el benchmark y devuelve el dict de resultados (el mismo que se guarda)."""
+    rnd = random.Random(seed)
+    user_id = db.session.scalar(select(User.id).where(User.is_active == True).order_by(User.id))
+    if user_id is None:
+        raise click.ClickException("No hay usuarios: corra 'flask seed' o create_user.py.")
+
+    client = current_app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+    urls = _url_factories(rnd)
+    results = {}
+    for name, weight in ROUTES:
+        if only and name not in only:
+            continue
+        n = max(requests // weight, 3)
+        timings, queries, statuses = [], [], {}
+        for i in range(warmup + n):
+            url = urls[name]()
+            with QueryCounter(db.engine) as qc:
+                started = time.perf_counter()
+                resp = client.get(url)
+                resp.get_data()  # respuestas por bloques: incluir la generación
+                elapsed = (time.perf_counter() - started) * 1000
+            if i >= warmup:
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                timings.append(elapsed)
+                queries.append(qc.count)
+        timings.sort()
+        results[name] = {
+            "requests": n,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "mean_ms": round(sum(timings) / n, 2),
+            "max_ms": round(timings[-1], 2),
+            "queries_per_request": round(sum(queries) / n, 2),
+            "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        }
+
+    return {
+        "commit": _commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "database": {"dialect": db.engine.dialect.name, "rows": _row_counts()},
+        "settings": {"requests": requests, "warmup": warmup, "seed": seed,
+                     "pdf_cache": current_app.config.get("PDF_CACHE_ENABLED", True)},
+        "routes": results,
+    }
+
+
+def _echo_table(result, previous=None):
+    prev = (previous or {}).get("routes", {})
+    click.echo(f"{'ruta':<16}{'n':>5}{'p50':>10}{'p95':>10}{'p99':>10}{'consultas':>11}")
+    for name, r in result["routes"].items():
+        line = (f"{name:<16}{r['requests']:>5}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+                f"{r['p99_ms']:>10.1f}{r['queries_per_request']:>11.1f}")
+        old = prev.get(name)
+        if old and old.get("p95_ms"):
+            line += f"   p95 {(r['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:+.0f}%"
+        click.echo(line)
+
+
+@click.command("bench")
+@click.option("-n", "--requests", default=30, show_default=True, help="Peticiones por ruta.")
+@click.option("--warmup", default=3, show_default=True, help="Peticiones descartadas por ruta.")
+@click.option("--only", default="", help="Rutas separadas por coma (" + ", ".join(n for n, _ in ROUTES) + ").")
+@click.option("--seed", default=1, show_default=True)
+@click.option("--pdf-cache/--no-pdf-cache", default=False, show_default=True,
+              help="Usar la caché de PDFs (por defecto se mide la generación).")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="Archivo JSON de salida.")
+@click.option("--compare", type=click.File("r"), help="JSON de una corrida anterior.")
+def bench_command(requests, warmup, only, seed, pdf_cache, output, compare):
+    """Mide p50/p95/p99 y consultas por petición de las rutas principales."""
+    current_app.config["PDF_CACHE_ENABLED"] = pdf_cache
+    only = {s.strip() for s in only.split(",") if s.strip()}
+    result = run_benchmark(requests=requests, warmup=warmup, only=only, seed=seed)
+
+    rows = result["database"]["rows"]
+    click.echo(f"▶ {result['database']['dialect']} · commit {result['commit'] or '?'} · "
+               + ", ".join(f"{k} {v:,}" for k, v in rows.items()))
+    _echo_table(result, json.load(compare) if compare else None)
+
+    stamp = result["commit"] or datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    output = output or f"bench-{stamp}.json"
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2, ensure_ascii=False)
+    click.echo(f"✅ Resultados en {output}")
+
+
+# -----------------------------
+# Ola de inicios de sesión
+# -----------------------------
+def run_login_burst(users=20, logins=200, concurrency=20, probe_ms=20):
+    """``logins`` POST /auth/login desde ``concurrency`` hilos a la vez, mientras
+    otro hilo mide una página liviana para ver si el resto del worker se traba.
+    Los usuarios de prueba se borran al terminar."""
+    from .seed import create_users
+
+    emails = [f"login{i}@bench.example.com" for i in range(users)]
+    create_users([(e, "bench") for e in emails])
+    try:
+        return _login_burst(emails, logins, concurrency, probe_ms)
+    finally:
+        db.session.rollback()
+        db.session.execute(delete(User).where(User.email.in_(emails)))
+        db.session.commit()
+        cache.bump("users")   # DELETE masivo: no pasa por VERSIONS_BY_MODEL
+
+
+def _login_burst(emails, logins, concurrency, probe_ms):
+    users = len(emails)
+    app = current_app._get_current_object()
+    timings, statuses, probe = [], {}, []
+    lock = threading.Lock()
+    done = threading.Event()
+    per_thread = [logins // concurrency + (1 if i < logins % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def login_worker(k, n):
+        client = app.test_client()
+        for i in range(n):
+            started = time.perf_counter()
+            resp = client.post("/auth/login", data={"email": emails[(k + i) % users],
+                                                    "password": "bench"})
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                timings.append(elapsed)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            client.post("/auth/logout")
+
+    def probe_worker():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get("/auth/login")
+            probe.append((time.perf_counter() - started) * 1000)
+            done.wait(probe_ms / 1000)
+
+    threads = [threading.Thread(target=login_worker, args=(k, n)) for k, n in enumerate(per_thread)]
+    prober = threading.Thread(target=probe_worker)
+    started = time.perf_counter()
+    prober.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    timings.sort()
+    probe.sort()
+    ok = statuses.get(302, 0)
+    return {
+        "commit": _commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "settings": {"users": users, "logins": logins, "concurrency": concurrency,
+                     "hash_method": app.config.get("PASSWORD_HASH_METHOD"),
+                     "verify_workers": app.config.get("PASSWORD_VERIFY_WORKERS")},
+        "seconds": round(seconds, 3),
+        "logins_per_second": round(ok / seconds, 2) if seconds else None,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "login_ms": {"p50": round(percentile(timings, 50), 2), "p95": round(percentile(timings, 95), 2),
+                     "p99": round(percentile(timings, 99), 2)},
+        "other_requests_ms": {"n": len(probe), "p50": round(percentile(probe, 50) or 0, 2),
+                              "p99": round(percentile(probe, 99) or 0, 2)},
+    }
+
+
+@click.command("bench-login")
+@click.option("--users", default=20, show_default=True,
+              help="Usuarios de prueba (se crean y se borran al terminar).")
+@click.option("--logins", default=200, show_default=True, help="Inicios de sesión en total.")
+@click.option("-c", "--concurrency", default=20, show_default=True, help="Hilos enviando a la vez.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="Archivo JSON de salida.")
+@click.option("--i-know", is_flag=True, help="Permitir una base que no sea SQLite.")
+def bench_login_command(users, logins, concurrency, output, i_know):
+    """Mide inicios de sesión por segundo y p99 durante una ola de logins."""
+    from .seed import require_scratch_db
+    require_scratch_db(i_know)
+    r = run_login_burst(users=users, logins=logins, concurrency=concurrency)
+    click.echo(f"▶ {r['settings']['hash_method']} · {r['settings']['verify_workers']} hilos de verificación")
+    click.echo(f"  {r['logins_per_second']} logins/s en {r['seconds']} s · estados {r['statuses']}")
+    click.echo(f"  login p50 {r['login_ms']['p50']} ms · p95 {r['login_ms']['p95']} ms · "
+               f"p99 {r['login_ms']['p99']} ms")
+    click.echo(f"  otras peticiones durante la ola: p50 {r['other_requests_ms']['p50']} ms · "
+               f"p99 {r['other_requests_ms']['p99']} ms")
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            json.dump(r, fh, indent=2, ensure_ascii=False)
+        click.echo(f"✅ Resultados en {output}")
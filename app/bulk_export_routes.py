@@ -0,0 +1,166 @@
+# app/bulk_export_routes.py
+"""Volcado masivo de tablas en CSV / NDJSON para procesos de BI.
+
+GET /api/export/<tabla>.csv | .ndjson [?since=ISO-8601]
+flask export <tabla> [--format csv|ndjson] [--since ...] [--output archivo]
+
+Las filas se leen con ``yield_per`` (cursor del lado del servidor en MySQL) y
+se emiten con un generador, así que la memoria no depende del tamaño de la
+tabla. ``since`` filtra por ``updated_at`` para traer solo lo que cambió
+desde la última corrida; las filas salen ordenadas por esa columna, así que
+la última fija la próxima marca. Se relee además EXPORT_SINCE_OVERLAP_SECONDS
+antes de ``since`` (una transacción larga puede confirmar filas con un
+``updated_at`` anterior a la marca): esas filas pueden salir repetidas y el
+destino debe aplicarlas por ``id``. Los borrados no aparecen en un volcado
+con ``since``; para reflejarlos hace falta un volcado completo.
+
+order_items, payments y quote_items no tienen ``updated_at`` y sus filas se
+editan o borran en el lugar (``sync_items``), así que un filtro por
+``created_at`` perdería cambios: esas tablas se exportan siempre completas y
+``since`` se rechaza.
+"""
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from functools import wraps
+from hmac import compare_digest
+
+import click
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from flask_login import current_user
+
+from .auth.routes_auth import login_manager
+from .models import db, dt_since, Client, Order, OrderItem, Payment, FollowUp, Quote, QuoteItem
+
+bulk_export_bp = Blueprint("bulk_export", __name__)
+
+# tabla -> (modelo, columna para ?since=; None = solo volcado completo)
+EXPORT_TABLES = {
+    "clients":     (Client, Client.updated_at),
+    "orders":      (Order, Order.updated_at),
+    "order_items": (OrderItem, None),
+    "payments":    (Payment, None),
+    "followups":   (FollowUp, FollowUp.updated_at),
+    "quotes":      (Quote, Quote.updated_at),
+    "quote_items": (QuoteItem, None),
+}
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+YIELD_PER = 2000
+CSV_FLUSH_ROWS = 500
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _statement(table, since=None):
+    model, since_col = EXPORT_TABLES[table]
+    cols = list(model.__table__.columns)
+    if since_col is None:
+        stmt = db.select(*cols).order_by(model.id)
+    else:
+        stmt = db.select(*cols).order_by(since_col, model.id)
+    if since:
+        overlap = timedelta(seconds=current_app.config.get("EXPORT_SINCE_OVERLAP_SECONDS", 60))
+        stmt = stmt.where(dt_since(since_col, since - overlap))
+    return [c.name for c in cols], stmt.execution_options(yield_per=YIELD_PER)
+
+
+def iter_export(table, fmt, since=None):
+    """Genera el volcado de ``table`` en trozos de texto."""
+    names, stmt = _statement(table, since)
+    rows = db.session.execute(stmt)
+
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps({k: _plain(v) for k, v in zip(names, row)}, ensure_ascii=False) + "\n"
+        return
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(names)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([_plain(v) for v in row])
+        if i % CSV_FLUSH_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _parse_since(s):
+    """Fecha ISO-8601 como UTC naive (lo que guardan las columnas)."""
+    if not s:
+        return None
+    value = datetime.fromisoformat(s.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def full_only(table):
+    return EXPORT_TABLES[table][1] is None
+
+
+def _token_or_login(view):
+    """Acepta sesión iniciada o 'Authorization: Bearer <EXPORT_API_TOKEN>'."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get("EXPORT_API_TOKEN")
+        auth = request.headers.get("Authorization", "")
+        if token and auth.startswith("Bearer ") and compare_digest(auth[7:], token):
+            return view(*args, **kwargs)
+        if not current_user.is_authenticated:
+            return login_manager.unauthorized()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@bulk_export_bp.route("/api/export/<table>.<fmt>")
+@_token_or_login
+def bulk_export(table, fmt):
+    if table not in EXPORT_TABLES or fmt not in FORMATS:
+        abort(404)
+    try:
+        since = _parse_since(request.args.get("since"))
+    except ValueError:
+        return jsonify({"error": "since debe ser una fecha ISO-8601"}), 400
+    if since and full_only(table):
+        return jsonify({"error": f"{table} no admite since: se exporta completa"}), 400
+
+    name = f"{table}.{fmt}"
+    return Response(
+        stream_with_context(iter_export(table, fmt, since)),
+        mimetype=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
+
+
+@click.command("export")
+@click.argument("table", type=click.Choice(sorted(EXPORT_TABLES)))
+@click.option("--format", "fmt", type=click.Choice(sorted(FORMATS)), default="csv")
+@click.option("--since", help="Solo filas cambiadas desde esta fecha (ISO-8601).")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), help="Archivo destino (por defecto stdout).")
+def export_command(table, fmt, since, output):
+    """Vuelca una tabla completa en CSV o NDJSON."""
+    try:
+        since_dt = _parse_since(since)
+    except ValueError:
+        raise click.BadParameter("debe ser una fecha ISO-8601", param_hint="--since")
+    if since_dt and full_only(table):
+        raise click.BadParameter(f"{table} se exporta completa", param_hint="--since")
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    try:
+        for chunk in iter_export(table, fmt, since_dt):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
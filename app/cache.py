@@ -0,0 +1,228 @@
+# app/cache.py
+"""Caché compartida entre workers de gunicorn, respaldada por un archivo SQLite.
+
+Todos los procesos abren el mismo archivo (CACHE_PATH), así que un valor
+calculado por un worker lo aprovechan los demás. Cada entrada tiene TTL y una
+etiqueta (tag); al hacer commit de cambios en los modelos de ``TAGS_BY_MODEL``
+se borran las entradas de esas etiquetas.
+
+Además guarda contadores de versión (``VERSIONS_BY_MODEL``) para las
+estructuras que cada worker mantiene en memoria (índice de clientes,
+catálogo de productos, usuarios de sesión, cola del scheduler de
+seguimientos, avisos): el commit incrementa la versión y cada worker, al
+ver un número distinto, recarga lo suyo.
+
+Los aciertos/fallos se acumulan en memoria y se escriben cada
+CACHE_STATS_FLUSH_SECONDS (no un UPDATE por cada ``get``).
+"""
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlalchemy import event
+from flask_sqlalchemy.session import Session
+
+from .models import (Client, FollowUp, Notification, NotificationRead, Order, OrderItem, Payment,
+                     Product, User)
+
+# Qué etiquetas invalida escribir cada modelo
+TAGS_BY_MODEL = {
+    Order: {"dashboard", "receivables"},
+    OrderItem: {"dashboard"},
+    Payment: {"dashboard", "receivables"},
+    Client: {"dashboard", "receivables"},
+}
+
+# Qué contador de versión incrementa escribir cada modelo
+VERSIONS_BY_MODEL = {
+    Client: "clients",
+    Product: "products",
+    User: "users",
+    FollowUp: "followups",
+    Notification: "notifications",
+    NotificationRead: "notifications",
+}
+
+_INFO_KEY = "cache_tags"
+_VERSIONS_KEY = "cache_versions"
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS cache (
+           key TEXT PRIMARY KEY,
+           tag TEXT,
+           expires_at REAL NOT NULL,
+           value BLOB NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS ix_cache_tag ON cache(tag)",
+    """CREATE TABLE IF NOT EXISTS cache_stats (
+           name TEXT PRIMARY KEY,
+           hits INTEGER NOT NULL DEFAULT 0,
+           misses INTEGER NOT NULL DEFAULT 0)""",
+    """CREATE TABLE IF NOT EXISTS cache_versions (
+           name TEXT PRIMARY KEY,
+           version INTEGER NOT NULL DEFAULT 0)""",
+]
+
+
+class SharedCache:
+    def __init__(self, app=None):
+        self.path = None
+        self.default_ttl = 300
+        self.enabled = True
+        self.stats_flush = 5.0
+        self._local = threading.local()
+        self._pending = {}          # nombre -> [hits, misses] sin escribir
+        self._pending_pid = os.getpid()
+        self._flushed_at = time.monotonic()
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config.get("CACHE_PATH") or os.path.join(
+            tempfile.gettempdir(), "app_cache.sqlite")
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 300)
+        self.enabled = app.config.get("CACHE_ENABLED", True)
+        self.stats_flush = app.config.get("CACHE_STATS_FLUSH_SECONDS", 5.0)
+        app.extensions["shared_cache"] = self
+
+    # Una conexión por hilo y por proceso (no se comparte tras fork)
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid() or self._local.path != self.path:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.path = self.path
+        return conn
+
+    def _count(self, name, hit):
+        with self._stats_lock:
+            if self._pending_pid != os.getpid():   # lo heredado del padre ya lo escribe él
+                self._pending, self._pending_pid = {}, os.getpid()
+            self._pending.setdefault(name, [0, 0])[0 if hit else 1] += 1
+            due = time.monotonic() - self._flushed_at >= self.stats_flush
+        if due:
+            self._flush_stats()
+
+    def _flush_stats(self):
+        with self._stats_lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if pending:
+            self._conn().executemany(
+                "INSERT INTO cache_stats(name, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET hits = hits + excluded.hits, "
+                "misses = misses + excluded.misses",
+                [(name, h, m) for name, (h, m) in pending.items()])
+
+    def get(self, key, tag=None):
+        """Devuelve el valor cacheado o None."""
+        if not self.enabled or not self.path:
+            return None
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())).fetchone()
+        self._count(tag or key, row is not None)
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None, tag=None):
+        if not self.enabled or not self.path:
+            return
+        ttl = self.default_ttl if ttl is None else ttl
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache(key, tag, expires_at, value) VALUES (?, ?, ?, ?)",
+            (key, tag, time.time() + ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+
+    def get_or_set(self, key, fn, ttl=None, tag=None):
+        value = self.get(key, tag=tag)
+        if value is None:
+            # Si la etiqueta se invalida mientras se calcula, el valor puede
+            # ser anterior al commit: se devuelve pero no se guarda
+            before = self.version(f"tag:{tag}") if tag else None
+            value = fn()
+            if tag is None or self.version(f"tag:{tag}") == before:
+                self.set(key, value, ttl=ttl, tag=tag)
+        return value
+
+    def invalidate(self, *tags):
+        if not self.path or not tags:
+            return
+        conn = self._conn()
+        conn.execute(f"DELETE FROM cache WHERE tag IN ({','.join('?' * len(tags))})", tags)
+        conn.executemany(
+            "INSERT INTO cache_versions(name, version) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            [(f"tag:{tag}",) for tag in tags])
+
+    def clear(self):
+        if self.path:
+            self._conn().execute("DELETE FROM cache")
+
+    # Contadores de versión: cada worker compara el suyo para saber si
+    # sus estructuras en memoria quedaron viejas (no dependen de CACHE_ENABLED)
+    def version(self, name):
+        if not self.path:
+            return 0
+        row = self._conn().execute(
+            "SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name):
+        if self.path:
+            self._conn().execute(
+                "INSERT INTO cache_versions(name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1", (name,))
+
+    def stats(self):
+        """{nombre: {"hits": n, "misses": n}} acumulado entre todos los workers
+        (lo de los demás, hasta su última escritura)."""
+        if not self.path:
+            return {}
+        self._flush_stats()
+        rows = self._conn().execute("SELECT name, hits, misses FROM cache_stats").fetchall()
+        return {name: {"hits": h, "misses": m} for name, h, m in rows}
+
+
+cache = SharedCache()
+
+
+# -----------------------------
+# Invalidación por escrituras
+# -----------------------------
+def mark_tags(session, *tags):
+    """Invalida ``tags`` al próximo commit (para escrituras Core/bulk)."""
+    session.info.setdefault(_INFO_KEY, set()).update(tags)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_tags(session, flush_context):
+    tags = session.info.setdefault(_INFO_KEY, set())
+    versions = session.info.setdefault(_VERSIONS_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags.update(TAGS_BY_MODEL.get(type(obj), ()))
+        if type(obj) in VERSIONS_BY_MODEL:
+            versions.add(VERSIONS_BY_MODEL[type(obj)])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_tags(session):
+    # Se invalida tras el commit: si fuera en el flush, otro worker podría
+    # recalcular con datos viejos y volver a cachearlos
+    tags = session.info.pop(_INFO_KEY, None)
+    if tags:
+        cache.invalidate(*tags)
+    for name in session.info.pop(_VERSIONS_KEY, ()):
+        cache.bump(name)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_tags(session, previous_transaction):
+    session.info.pop(_INFO_KEY, None)
+    session.info.pop(_VERSIONS_KEY, None)
@@ -0,0 +1,82 @@
+# app/catalog.py
+"""Catálogo de productos en memoria para /api/products.
+
+Cada worker guarda todos los productos ya serializados, más un índice
+ordenado de (prefijo, id) con el SKU y las palabras del nombre. Mientras la
+versión compartida "products" (ver ``VERSIONS_BY_MODEL`` en cache.py) no
+cambie, las consultas no tocan la base de datos. ``etag`` es un hash del
+contenido: el navegador revalida y recibe 304 si el catálogo no cambió.
+"""
+import hashlib
+import json
+import re
+import threading
+from bisect import bisect_left
+
+from .cache import cache
+from .client_index import normalize
+from .models import db, Product
+
+VERSION_NAME = "products"
+
+
+class Catalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self.items = []     # [{"id", "sku", "name", "price"}] por nombre
+        self.by_id = {}
+        self._index = []    # [(token, posición en items)] ordenada
+        self.etag = None
+
+    def _load(self, version):
+        rows = db.session.execute(
+            db.select(Product.id, Product.sku, Product.name, Product.price)
+            .order_by(Product.name, Product.id)
+        ).all()
+        items = [{"id": r.id, "sku": r.sku, "name": r.name, "price": float(r.price)} for r in rows]
+        index = []
+        for pos, p in enumerate(items):
+            tokens = set(re.split(r"[^\w]+", normalize(p["name"])))
+            if p["sku"]:
+                tokens.add(normalize(p["sku"]))
+            tokens.discard("")
+            index.extend((tok, pos) for tok in tokens)
+        index.sort()
+        etag = hashlib.sha1(json.dumps(items, separators=(",", ":")).encode()).hexdigest()
+
+        with self._lock:
+            self.items, self._index, self.etag = items, index, etag
+            self.by_id = {p["id"]: p for p in items}
+            self._version = version
+
+    def ensure_fresh(self):
+        version = cache.version(VERSION_NAME)
+        if version != self._version:
+            self._load(version)
+        return self
+
+    def _prefix(self, word):
+        found = set()
+        i = bisect_left(self._index, (word,))
+        while i < len(self._index) and self._index[i][0].startswith(word):
+            found.add(self._index[i][1])
+            i += 1
+        return found
+
+    def search(self, q, limit=50):
+        """Productos cuyo SKU o palabras del nombre empiezan por cada palabra de ``q``."""
+        words = normalize(q).split()
+        with self._lock:
+            if not words:
+                return self.items[:limit] if limit else list(self.items)
+            positions = None
+            for word in sorted(words, key=len, reverse=True):
+                found = self._prefix(word)
+                positions = found if positions is None else positions & found
+                if not positions:
+                    return []
+            return [self.items[pos] for pos in sorted(positions)[:limit]]
+
+
+catalog = Catalog()
@@ -0,0 +1,158 @@
+# app/client_index.py
+"""Índice en memoria de clientes para el autocompletado de formularios.
+
+Cada worker mantiene una lista ordenada de (token, id) con las palabras
+normalizadas (minúsculas, sin tildes) de nombre, apellido, email y empresa;
+una búsqueda por prefijo es un ``bisect`` en vez de recorrer la tabla.
+
+Al hacer commit de cambios en ``Client`` se incrementa la versión
+compartida "clients" (ver ``VERSIONS_BY_MODEL`` en cache.py). Cada worker la compara en la
+siguiente búsqueda y, si cambió, relee solo los clientes con ``updated_at``
+reciente. Cada CLIENT_INDEX_REBUILD_SECONDS se reconstruye completo por si
+hubo escrituras que no pasaron por el ORM.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from flask import current_app
+
+from .cache import cache
+from .models import db, dt_since, Client
+
+VERSION_NAME = "clients"
+# Margen al releer por updated_at: una transacción larga puede confirmar
+# filas con un updated_at anterior a la última marca vista
+_OVERLAP = timedelta(seconds=60)
+_WORD = re.compile(r"[\w@.+-]+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def _tokens(first_name, last_name, email, company):
+    tokens = set()
+    for value in (first_name, last_name, company):
+        tokens.update(re.split(r"[^\w]+", normalize(value)))
+    email = normalize(email)
+    if email:
+        tokens.add(email)
+        tokens.update(re.split(r"[^\w]+", email))
+    tokens.discard("")
+    return tokens
+
+
+class ClientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = []    # [(token, client_id)] ordenada
+        self._clients = {}   # id -> {"id", "name", "email", "company", "tokens"}
+        self._version = None
+        self._watermark = None
+        self._built_at = 0.0
+
+    # --- carga ---
+    def _rows(self, since=None):
+        stmt = db.select(Client.id, Client.first_name, Client.last_name, Client.email,
+                         Client.company, Client.is_deleted, Client.updated_at)
+        if since is not None:
+            stmt = stmt.where(dt_since(Client.updated_at, since))
+        return db.session.execute(stmt)
+
+    def _entry(self, row):
+        name = f"{row.first_name} {row.last_name}"
+        return {
+            "id": row.id,
+            "name": name,
+            "sort": (normalize(name), row.id),
+            "email": row.email,
+            "company": row.company or "",
+            "tokens": _tokens(row.first_name, row.last_name, row.email, row.company),
+        }
+
+    def _remove(self, client_id):
+        old = self._clients.pop(client_id, None)
+        if old:
+            for tok in old["tokens"]:
+                i = bisect_left(self._tokens, (tok, client_id))
+                if i < len(self._tokens) and self._tokens[i] == (tok, client_id):
+                    del self._tokens[i]
+
+    def rebuild(self):
+        version = cache.version(VERSION_NAME)
+        clients, tokens, watermark = {}, [], None
+        for row in self._rows():
+            watermark = max(watermark, row.updated_at) if watermark else row.updated_at
+            if row.is_deleted:
+                continue
+            entry = self._entry(row)
+            clients[row.id] = entry
+            tokens.extend((tok, row.id) for tok in entry["tokens"])
+        tokens.sort()
+        with self._lock:
+            self._clients, self._tokens = clients, tokens
+            self._version, self._watermark = version, watermark
+            self._built_at = time.monotonic()
+
+    def _refresh(self, version):
+        since = self._watermark - _OVERLAP if self._watermark else None
+        rows = list(self._rows(since))
+        with self._lock:
+            for row in rows:
+                self._remove(row.id)
+                if not row.is_deleted:
+                    entry = self._entry(row)
+                    self._clients[row.id] = entry
+                    for tok in entry["tokens"]:
+                        insort(self._tokens, (tok, row.id))
+                if self._watermark is None or row.updated_at > self._watermark:
+                    self._watermark = row.updated_at
+            self._version = version
+
+    def ensure_fresh(self):
+        max_age = current_app.config.get("CLIENT_INDEX_REBUILD_SECONDS", 3600)
+        if self._version is None or time.monotonic() - self._built_at > max_age:
+            self.rebuild()
+            return
+        version = cache.version(VERSION_NAME)
+        if version != self._version:
+            self._refresh(version)
+
+    # --- consulta ---
+    def _prefix_ids(self, word):
+        ids = set()
+        i = bisect_left(self._tokens, (word,))
+        while i < len(self._tokens) and self._tokens[i][0].startswith(word):
+            ids.add(self._tokens[i][1])
+            i += 1
+        return ids
+
+    def search(self, q, limit=20):
+        """Clientes activos cuyo nombre/email/empresa empiezan por cada palabra de ``q``."""
+        words = _WORD.findall(normalize(q))
+        if not words:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            ids = None
+            # la palabra más larga primero: el rango de prefijo es el más corto
+            for word in sorted(words, key=len, reverse=True):
+                found = self._prefix_ids(word)
+                ids = found if ids is None else ids & found
+                if not ids:
+                    return []
+            hits = heapq.nsmallest(limit, (self._clients[i] for i in ids), key=lambda c: c["sort"])
+        return [
+            {"id": c["id"], "name": c["name"], "email": c["email"], "company": c["company"],
+             "label": f'{c["name"]} — {c["email"]}'}
+            for c in hits
+        ]
+
+
+client_index = ClientIndex()
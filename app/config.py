@@ -4,6 +4,28 @@ from urllib.parse import quote_plus
 from dotenv import load_dotenv
 load_dotenv()
 
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS según el motor (ver DB_* en .env.example).
+
+    MySQL: pool por worker de gunicorn con pre-ping y reciclado por debajo de
+    ``wait_timeout``. SQLite: solo el tiempo de espera de bloqueo; los PRAGMA
+    se aplican al conectar (app/db_engine.py).
+    """
+    if uri.startswith("sqlite"):
+        return {"connect_args": {"timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")) / 1000}}
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "280")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "True") == "True",
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    }
+    if uri.startswith("mysql"):
+        options["connect_args"] = {"connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "10"))}
+    return options
+
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
 
@@ -18,4 +40,80 @@ class Config:
         f"mysql+pymysql://{user}:{password}@{host}:{port}/{dbname}",
     )
     SQLALCHEMY_ECHO = os.getenv("SQLALCHEMY_ECHO", "False") == "True"
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # PRAGMA de SQLite al conectar (WAL: los lectores no esperan a los escritores)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))   # negativo = KiB
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
     SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS", "False") == "True"
+
+    # Paginación: "offset" (paginate clásico) o "cursor" (keyset por created_at, id)
+    PAGINATION_MODE = os.getenv("PAGINATION_MODE", "offset")
+    PAGINATION_COUNT_TTL = int(os.getenv("PAGINATION_COUNT_TTL", "60"))
+
+    # Caché compartida entre workers (archivo SQLite); vacío = directorio temporal
+    CACHE_PATH = os.getenv("CACHE_PATH", "")
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "True") == "True"
+    CACHE_STATS_FLUSH_SECONDS = float(os.getenv("CACHE_STATS_FLUSH_SECONDS", "5"))
+    RECEIVABLES_CACHE_TTL = int(os.getenv("RECEIVABLES_CACHE_TTL", "300"))
+
+    # Token opcional para /api/export/* (Authorization: Bearer <token>) desde procesos BI
+    EXPORT_API_TOKEN = os.getenv("EXPORT_API_TOKEN", "")
+    EXPORT_SINCE_OVERLAP_SECONDS = int(os.getenv("EXPORT_SINCE_OVERLAP_SECONDS", "60"))  # margen de ?since=
+
+    # Trabajos en segundo plano (flask jobs-worker)
+    JOBS_DIR = os.getenv("JOBS_DIR", "")
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+    JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+    JOBS_RESULT_TTL = int(os.getenv("JOBS_RESULT_TTL", "24"))  # horas
+    JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+    JOBS_STALE_SECONDS = int(os.getenv("JOBS_STALE_SECONDS", "1800"))
+
+    # Caché de PDFs (facturas / cotizaciones); vacío = directorio temporal
+    PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "")
+    PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "200"))
+    PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "True") == "True"
+
+    # Impresión por lotes (/pdf/batch, flask pdf-batch)
+    BATCH_PDF_WORKERS = int(os.getenv("BATCH_PDF_WORKERS", "4"))
+    BATCH_PDF_MAX_DOCS = int(os.getenv("BATCH_PDF_MAX_DOCS", "2000"))
+    BATCH_PDF_SYNC_MAX_DOCS = int(os.getenv("BATCH_PDF_SYNC_MAX_DOCS", "100"))  # más = cola de trabajos
+
+    # Autocompletado de clientes: reconstrucción completa del índice en memoria
+    CLIENT_INDEX_REBUILD_SECONDS = int(os.getenv("CLIENT_INDEX_REBUILD_SECONDS", "3600"))
+
+    # Perfilador de SQL por petición (Server-Timing, N+1, /admin/profiler)
+    PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "False") == "True"
+    PROFILER_SLOW_MS = float(os.getenv("PROFILER_SLOW_MS", "200"))
+    PROFILER_NPLUS1_THRESHOLD = int(os.getenv("PROFILER_NPLUS1_THRESHOLD", "5"))
+    PROFILER_KEEP = int(os.getenv("PROFILER_KEEP", "50"))
+    # Emails con acceso a /admin/profiler (separados por coma); vacío = cualquier usuario
+    PROFILER_ADMINS = [e.strip().lower() for e in os.getenv("PROFILER_ADMINS", "").split(",") if e.strip()]
+
+    # /metrics (Prometheus): token opcional "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+    # Segundos que cada worker reutiliza el usuario de la sesión sin consultar la base
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "30"))
+
+    # Contraseñas: algoritmo/costo (formato Werkzeug, p. ej. scrypt:16384:8:1) y verificación acotada
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_VERIFY_WORKERS = int(os.getenv("PASSWORD_VERIFY_WORKERS", "2"))
+    PASSWORD_VERIFY_QUEUE = int(os.getenv("PASSWORD_VERIFY_QUEUE", "32"))
+    PASSWORD_VERIFY_TIMEOUT = float(os.getenv("PASSWORD_VERIFY_TIMEOUT", "5"))
+
+    # Calendario (/api/followups): rango máximo por petición y días que se guardan los borrados para ?since=
+    FOLLOWUPS_MAX_RANGE_DAYS = int(os.getenv("FOLLOWUPS_MAX_RANGE_DAYS", "92"))
+    FOLLOWUPS_TOMBSTONE_DAYS = int(os.getenv("FOLLOWUPS_TOMBSTONE_DAYS", "30"))
+
+    # Scheduler de seguimientos vencidos (flask followups-scheduler) y avisos en la barra
+    SCHEDULER_WINDOW_MINUTES = int(os.getenv("SCHEDULER_WINDOW_MINUTES", "60"))
+    SCHEDULER_BATCH = int(os.getenv("SCHEDULER_BATCH", "5000"))
+    SCHEDULER_CATCHUP_MINUTES = int(os.getenv("SCHEDULER_CATCHUP_MINUTES", "60"))
+    SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "1"))
+    SCHEDULER_RESCAN_SECONDS = int(os.getenv("SCHEDULER_RESCAN_SECONDS", "60"))
+    NOTIFICATIONS_POLL_SECONDS = int(os.getenv("NOTIFICATIONS_POLL_SECONDS", "30"))
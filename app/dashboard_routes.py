@@ -2,98 +2,106 @@
 from datetime import datetime, timedelta
 from flask import Blueprint, render_template
 from flask_login import login_required
-from sqlalchemy import func, extract, desc
-from .models import db, Client, Order, OrderItem, Product
-import json
+from sqlalchemy import func, desc
+from .cache import cache
+from .models import db, Client, Product, DailyRevenue, DailyClientRevenue, DailyProductSales
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
 @dashboard_bp.route("/dashboard")
 @login_required
 def dashboard():
+    # Igual para todos los usuarios: se cachea entre workers y se invalida al
+    # hacer commit de pedidos/ítems/pagos/clientes (app/cache.py)
+    hoy = datetime.utcnow().date()
+    ctx = cache.get_or_set(f"dashboard:{hoy.isoformat()}", _dashboard_data, tag="dashboard")
+    return render_template("dashboard.html", **ctx)
+
+
+def _dashboard_data():
+    # Todo sale de los rollups diarios (app/rollups.py), no de orders/order_items
+
     # === Métricas rápidas ===
     total_clientes = db.session.scalar(
         db.select(func.count(Client.id)).where(Client.is_deleted == False)
     )
-    total_pedidos = db.session.scalar(db.select(func.count(Order.id)))
-    total_pendientes = db.session.scalar(
-        db.select(func.count(Order.id)).where(Order.status == "pendiente")
-    )
-    total_ingresos = db.session.scalar(
-        db.select(func.coalesce(func.sum(Order.total), 0))
-    )
+    total_pedidos, total_pendientes, total_ingresos = db.session.execute(
+        db.select(
+            func.coalesce(func.sum(DailyRevenue.orders_count), 0),
+            func.coalesce(func.sum(DailyRevenue.pending_count), 0),
+            func.coalesce(func.sum(DailyRevenue.revenue), 0),
+        )
+    ).one()
 
-    # === Ingresos últimos 30 días (por día) ===
+    # === Serie diaria (30 días) y mensual (6 meses) desde la misma lectura ===
     hoy = datetime.utcnow().date()
     hace_30 = hoy - timedelta(days=29)
+    six_months_ago = (hoy.replace(day=1) - timedelta(days=150))  # ~5 meses + buffer
 
-    ingresos_30 = (
-        db.session.query(
-            func.date(Order.created_at).label("fecha"),
-            func.coalesce(func.sum(Order.total), 0).label("monto"),
-        )
-        .filter(func.date(Order.created_at) >= hace_30)
-        .group_by(func.date(Order.created_at))
-        .order_by(func.date(Order.created_at))
-        .all()
-    )
+    dias = db.session.execute(
+        db.select(DailyRevenue.day, DailyRevenue.revenue, DailyRevenue.paid)
+        .where(DailyRevenue.day >= six_months_ago)
+        .order_by(DailyRevenue.day)
+    ).all()
+    por_dia = {r.day: r for r in dias}
 
     labels_30 = []
     data_30 = []
+    data_paid_30 = []
     for i in range(30):
         d = hace_30 + timedelta(days=i)
         labels_30.append(d.strftime("%Y-%m-%d"))
-        found = next((float(r.monto) for r in ingresos_30 if r.fecha == d), 0.0)
-        data_30.append(found)
+        r = por_dia.get(d)
+        data_30.append(float(r.revenue) if r else 0.0)
+        data_paid_30.append(float(r.paid) if r else 0.0)
 
-    # === Ingresos últimos 6 meses (por mes) ===
-    six_months_ago = (hoy.replace(day=1) - timedelta(days=150))  # ~5 meses + buffer
-    ingresos_mes = (
-        db.session.query(
-            extract("year", Order.created_at).label("y"),
-            extract("month", Order.created_at).label("m"),
-            func.coalesce(func.sum(Order.total), 0).label("monto"),
-        )
-        .filter(Order.created_at >= six_months_ago)
-        .group_by("y", "m")
-        .order_by("y", "m")
-        .all()
-    )
-    labels_mes = [f"{int(y):04d}-{int(m):02d}" for y, m, _ in ingresos_mes]
-    data_mes = [float(monto) for _, _, monto in ingresos_mes]
+    por_mes = {}
+    for r in dias:
+        key = f"{r.day.year:04d}-{r.day.month:02d}"
+        por_mes[key] = por_mes.get(key, 0.0) + float(r.revenue)
+    labels_mes = [k for k in sorted(por_mes) if por_mes[k]]
+    data_mes = [por_mes[k] for k in labels_mes]
 
     # === Top clientes por ingresos (Top 5) ===
-    top_clientes = (
-        db.session.query(
-            Client.id,
-            Client.first_name,
-            Client.last_name,
-            func.coalesce(func.sum(Order.total), 0).label("monto"),
+    top_ids = (
+        db.select(
+            DailyClientRevenue.client_id,
+            func.sum(DailyClientRevenue.revenue).label("monto"),
         )
-        .join(Order, Order.client_id == Client.id)
-        .group_by(Client.id, Client.first_name, Client.last_name)
+        .group_by(DailyClientRevenue.client_id)
         .order_by(desc("monto"))
         .limit(5)
-        .all()
+        .subquery()
     )
+    top_clientes = [
+        dict(r._mapping) for r in db.session.execute(
+            db.select(Client.id, Client.first_name, Client.last_name, top_ids.c.monto)
+            .join(top_ids, top_ids.c.client_id == Client.id)
+            .order_by(desc(top_ids.c.monto))
+        )
+    ]
 
     # === Top productos más vendidos (por cantidad) ===
     TOP_N = 5
-    top_products_rows = (
-        db.session.query(
-            OrderItem.product_id,
-            Product.name.label("product_name"),
-            func.coalesce(func.sum(OrderItem.quantity), 0).label("qty"),
-            func.coalesce(func.sum(OrderItem.quantity * OrderItem.unit_price), 0).label(
-                "revenue"
-            ),
+    top_prod = (
+        db.select(
+            DailyProductSales.product_id,
+            func.sum(DailyProductSales.qty).label("qty"),
+            func.sum(DailyProductSales.revenue).label("revenue"),
         )
-        .outerjoin(Product, Product.id == OrderItem.product_id)
-        .group_by(OrderItem.product_id, Product.name)
+        .group_by(DailyProductSales.product_id)
         .order_by(desc("qty"))
         .limit(TOP_N)
-        .all()
+        .subquery()
     )
+    top_products_rows = db.session.execute(
+        db.select(
+            Product.name.label("product_name"), top_prod.c.qty, top_prod.c.revenue,
+        )
+        .select_from(top_prod)
+        .outerjoin(Product, Product.id == top_prod.c.product_id)
+        .order_by(desc(top_prod.c.qty))
+    ).all()
 
     labels_top = []
     data_qty_top = []
@@ -104,14 +112,14 @@ def dashboard():
         data_rev_top.append(float(row.revenue or 0))
 
     # Pasar todo al template
-    return render_template(
-        "dashboard.html",
+    return dict(
         total_clientes=total_clientes or 0,
         total_pedidos=total_pedidos or 0,
         total_pendientes=total_pendientes or 0,
         total_ingresos=float(total_ingresos or 0),
         labels_30=labels_30,
         data_30=data_30,
+        data_paid_30=data_paid_30,
         labels_mes=labels_mes,
         data_mes=data_mes,
         top_clientes=top_clientes,
@@ -0,0 +1,55 @@
+# app/db_engine.py
+"""Ajustes del engine que dependen del motor.
+
+Las opciones del pool salen de ``Config.SQLALCHEMY_ENGINE_OPTIONS``. En
+SQLite además se aplican PRAGMA en cada conexión nueva: WAL (los lectores no
+se bloquean con una escritura en curso), ``synchronous=NORMAL`` (seguro con
+WAL), ``busy_timeout`` (esperar el bloqueo en vez de fallar con "database is
+locked"), ``cache_size`` y ``mmap_size``.
+"""
+from sqlalchemy import event
+
+from .models import db
+
+
+def _sqlite_pragmas(config):
+    pragmas = [
+        ("busy_timeout", config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        ("journal_mode", config.get("SQLITE_JOURNAL_MODE", "WAL")),
+        ("synchronous", config.get("SQLITE_SYNCHRONOUS", "NORMAL")),
+        ("cache_size", config.get("SQLITE_CACHE_SIZE", -65536)),
+        ("mmap_size", config.get("SQLITE_MMAP_SIZE", 0)),
+    ]
+    return [(name, value) for name, value in pragmas if value not in (None, "")]
+
+
+def _apply_pragmas(engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def init_app(app):
+    pragmas = _sqlite_pragmas(app.config)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+                _apply_pragmas(engine, pragmas)
+
+
+def pool_stats():
+    """Estado del pool de este proceso: tamaño, en uso, libres y overflow."""
+    pool = db.engine.pool
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow", "timeout"):
+        fn = getattr(pool, name, None)
+        if fn is not None:
+            stats[name] = fn()
+    if "overflow" in stats:
+        stats["overflow"] = max(stats["overflow"], 0)
+    return stats
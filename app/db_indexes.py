@@ -0,0 +1,195 @@
+# app/db_indexes.py
+"""Índices de las consultas reales y diagnóstico con EXPLAIN.
+
+Los índices están declarados en los modelos (``__table_args__``), así que
+``db.create_all()`` los crea en una base nueva. Para una base existente:
+
+    flask --app app db-indexes             # crea las tablas e índices que falten
+    flask --app app db-indexes --explain   # además corre EXPLAIN y marca escaneos completos
+
+``explain_all()`` arma las consultas principales de cada blueprint con los
+mismos filtros y orden que las rutas, y devuelve el plan de cada una. En
+SQLite un ``SCAN tabla`` sin índice es un recorrido completo; en MySQL,
+``type = ALL``. Recorrer un índice entero (``SCAN ... USING INDEX`` /
+``type = index``) solo se acepta si la consulta tiene LIMIT. Ordenar en
+un B-tree temporal / "Using filesort" también se reporta porque anula el
+LIMIT de la paginación.
+"""
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import desc, func, inspect as sa_inspect, text, type_coerce
+
+from . import balances, recurrence
+from .auth import user_cache
+from .models import db, Client, FollowUp, Order, Payment, Quote
+
+
+def missing_indexes():
+    """Índices declarados en los modelos que no existen en la base."""
+    insp = sa_inspect(db.engine)
+    tables = set(insp.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+        missing.extend(ix for ix in table.indexes if ix.name not in existing)
+    return missing
+
+
+def install():
+    """Crea las tablas, columnas e índices que falten; devuelve los nombres de los índices."""
+    names = [ix.name for ix in missing_indexes()]
+    with db.engine.begin() as conn:
+        db.metadata.create_all(conn, checkfirst=True)
+    # columnas agregadas después de crear la base (sus índices las necesitan)
+    recurrence.install()
+    user_cache.install()
+    if balances.install():
+        # paid_total / balance nacen en 0: se calculan desde los pagos
+        balances.fix_drift([r.id for r in balances.find_drift()])
+    with db.engine.begin() as conn:
+        for index in missing_indexes():
+            index.create(conn, checkfirst=True)
+    return names
+
+
+# -----------------------------
+# Consultas principales por blueprint
+# -----------------------------
+def main_queries():
+    """[(nombre, select)] con los patrones de las rutas (valores de ejemplo)."""
+    now = datetime.utcnow()
+    day = now.date()
+    orders = db.select(Order.id, Order.total, Client.first_name).join(Client, Order.client_id == Client.id)
+    quotes = db.select(Quote.id, Quote.total, Client.first_name).join(Client, Quote.client_id == Client.id)
+    return [
+        ("main.list_clients",
+         db.select(Client.id).where(Client.is_deleted == False)
+         .order_by(Client.created_at.desc(), Client.id.desc()).limit(10)),
+        ("orders.list_orders",
+         orders.order_by(desc(Order.created_at), desc(Order.id)).limit(10)),
+        ("orders.list_orders?status",
+         orders.where(Order.status == "pendiente")
+         .order_by(desc(Order.created_at), desc(Order.id)).limit(10)),
+        ("orders.list_orders?saldo",
+         orders.where(Order.balance > 0).order_by(desc(Order.created_at)).limit(10)),
+        ("orders.client_orders",
+         db.select(Order.id).where(Order.client_id == 1)
+         .order_by(Order.created_at.desc(), Order.id.desc()).limit(10)),
+        ("quotes.list_quotes",
+         quotes.order_by(desc(Quote.created_at), desc(Quote.id)).limit(10)),
+        ("quotes.list_quotes?status",
+         quotes.where(Quote.status == "enviada")
+         .order_by(desc(Quote.created_at), desc(Quote.id)).limit(10)),
+        ("followups.api_followups",
+         db.select(FollowUp.id, FollowUp.title)
+         .where(FollowUp.when_at >= now - timedelta(days=35), FollowUp.when_at < now)
+         .order_by(FollowUp.when_at)),
+        ("followups.api_followups (series)",
+         db.select(FollowUp.id).where(FollowUp.series_end >= now - timedelta(days=35), FollowUp.when_at < now)),
+        ("followups.api_followups (since)",
+         db.select(FollowUp.id).where(FollowUp.updated_at >= now - timedelta(minutes=5),
+                                      FollowUp.when_at >= now - timedelta(days=35), FollowUp.when_at < now)),
+        ("scheduler.window",
+         db.select(FollowUp.id).where(FollowUp.when_at >= now, FollowUp.when_at < now + timedelta(hours=1),
+                                      FollowUp.done == False, FollowUp.recur_freq.is_(None))
+         .order_by(FollowUp.when_at, FollowUp.id).limit(5001)),
+        ("payments.order_payments",
+         db.select(Payment.id).where(Payment.order_id == 1).order_by(desc(Payment.paid_at))),
+        ("dashboard.total_clientes",
+         db.select(func.count(Client.id)).where(Client.is_deleted == False)),
+        ("rollups.orders_of_day",
+         db.select(func.count(Order.id), func.sum(Order.total))
+         .where(Order.created_at >= type_coerce(day, db.Date),
+                Order.created_at < type_coerce(day + timedelta(days=1), db.Date))),
+        ("rollups.payments_of_day",
+         db.select(func.sum(Payment.amount))
+         .where(Payment.paid_at >= type_coerce(day, db.Date),
+                Payment.paid_at < type_coerce(day + timedelta(days=1), db.Date))),
+        ("receivables.aging",
+         db.select(Order.client_id + 0, func.sum(Order.balance), func.count(Order.id),
+                   func.min(Order.created_at))
+         .where(Order.balance > 0, Order.status != "cancelado",
+                Order.created_at < type_coerce(day + timedelta(days=1), db.Date))
+         .group_by(Order.client_id + 0)),
+    ]
+
+
+def _compile(stmt):
+    return str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _sqlite_plan(conn, sql, limited):
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    plan = [r[-1] for r in rows]
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            problems.append(f"escaneo completo: {detail}")
+        elif detail.startswith("SCAN ") and not limited:
+            problems.append(f"recorre todo el índice: {detail}")
+        elif "TEMP B-TREE FOR ORDER BY" in detail:
+            problems.append("ordena en B-tree temporal")
+    return plan, problems
+
+
+def _mysql_plan(conn, sql, limited):
+    rows = [r._mapping for r in conn.execute(text("EXPLAIN " + sql))]
+    plan, problems = [], []
+    for r in rows:
+        extra = r.get("Extra") or ""
+        plan.append(f"{r['table']}: type={r['type']} key={r['key']} rows={r['rows']} {extra}".strip())
+        if r["type"] == "ALL":
+            problems.append(f"escaneo completo: {r['table']}")
+        elif r["type"] == "index" and not limited:
+            problems.append(f"recorre todo el índice: {r['table']} ({r['key']})")
+        if "filesort" in extra:
+            problems.append(f"filesort: {r['table']}")
+    return plan, problems
+
+
+def explain_all():
+    """[(nombre, plan, problemas)] para cada consulta de ``main_queries()``."""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        explain = _sqlite_plan
+    elif dialect in ("mysql", "mariadb"):
+        explain = _mysql_plan
+    else:
+        raise click.ClickException(f"EXPLAIN no soportado para {dialect}")
+    results = []
+    with db.engine.connect() as conn:
+        for name, stmt in main_queries():
+            plan, problems = explain(conn, _compile(stmt), stmt._limit_clause is not None)
+            results.append((name, plan, problems))
+    return results
+
+
+@click.command("db-indexes")
+@click.option("--explain", "run_explain", is_flag=True,
+              help="Corre EXPLAIN sobre las consultas principales y marca escaneos completos.")
+@click.option("--dry-run", is_flag=True, help="Solo lista los índices que faltan.")
+def db_indexes_command(run_explain, dry_run):
+    """Crea los índices declarados en los modelos que falten en la base."""
+    if dry_run:
+        names = [ix.name for ix in missing_indexes()]
+        click.echo("Faltan: " + ", ".join(names) if names else "✅ No falta ningún índice.")
+    else:
+        names = install()
+        click.echo(f"✅ Creados: {', '.join(names)}" if names else "✅ No falta ningún índice.")
+    if not run_explain:
+        return
+
+    flagged = 0
+    for name, plan, problems in explain_all():
+        click.echo(f"{'⚠️ ' if problems else '✅'} {name}")
+        for line in plan:
+            click.echo(f"     {line}")
+        for p in problems:
+            click.echo(f"     → {p}")
+        flagged += bool(problems)
+    if flagged:
+        click.echo(f"{flagged} consultas con escaneo completo u ordenamiento sin índice.")
+        raise SystemExit(1)
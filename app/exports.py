@@ -0,0 +1,80 @@
+# app/exports.py
+"""Utilidades para exportar a Excel sin cargar todo en memoria.
+
+Las filas llegan como generadores (consultas con ``yield_per``) y se escriben
+con openpyxl en modo write-only, que vuelca cada fila a disco. El .xlsx es un
+ZIP que solo se puede cerrar al final, así que se arma en un archivo temporal
+y luego se envía por bloques, borrándolo al terminar.
+"""
+import os
+import tempfile
+
+from flask import Response
+from openpyxl import Workbook
+
+from .metrics import timed_document
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CHUNK_SIZE = 64 * 1024
+YIELD_PER = 1000
+
+
+def fmt_dt(value, fmt="%Y-%m-%d %H:%M:%S"):
+    return value.strftime(fmt) if value else ""
+
+
+def write_xlsx(path, sheets):
+    """Escribe ``sheets`` = [(título, encabezados, filas_iterables), ...] en ``path``."""
+    with timed_document("xlsx") as doc:
+        wb = Workbook(write_only=True)
+        for title, header, rows in sheets:
+            ws = wb.create_sheet(title)
+            ws.append(header)
+            for row in rows:
+                ws.append(row)
+        wb.save(path)
+        doc["bytes"] = os.path.getsize(path)
+    return path
+
+
+def stream_file(path, download_name, mimetype, delete=True):
+    """Respuesta que envía ``path`` en bloques de CHUNK_SIZE.
+
+    Con ``delete`` el archivo se borra al cerrar la respuesta (``call_on_close``),
+    aunque el generador no llegue a empezar (cliente que corta, HEAD, error).
+    """
+    size = os.path.getsize(path)
+
+    def generate():
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    def remove():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    resp = Response(generate(), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{download_name}"',
+        "Content-Length": str(size),
+    })
+    if delete:
+        resp.call_on_close(remove)
+    return resp
+
+
+def xlsx_response(download_name, sheets):
+    """Arma el .xlsx en un temporal y lo devuelve como respuesta por bloques."""
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(path, sheets)
+    except Exception:
+        os.remove(path)
+        raise
+    return stream_file(path, download_name, XLSX_MIMETYPE)
@@ -1,9 +1,15 @@
 # app/followups_routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import hashlib
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify,
+                   current_app)
 from flask_login import login_required
-from sqlalchemy import asc, desc
-from datetime import datetime, timedelta
-from .models import db, Client, Order, FollowUp
+from flask_sqlalchemy.session import Session
+from sqlalchemy import and_, delete, desc, event, func, insert, or_, select
+from sqlalchemy.orm import attributes
+from datetime import datetime, timedelta, timezone
+from . import recurrence
+from .cache import cache
+from .models import db, dt_param, dt_since, Client, Order, FollowUp, FollowUpDeletion
 
 followups_bp = Blueprint("followups", __name__)
 
@@ -13,57 +19,260 @@ followups_bp = Blueprint("followups", __name__)
 def calendar_view():
     return render_template("calendar.html")
 
-# Feed JSON para FullCalendar (rango opcional)
+# -----------------------------
+# Feed JSON para FullCalendar
+# -----------------------------
+# GET /api/followups?start=YYYY-MM-DD&end=YYYY-MM-DD[&since=ISO-8601]
+#
+# El rango se valida y se limita a FOLLOWUPS_MAX_RANGE_DAYS. La respuesta lleva
+# ETag y Last-Modified calculados con una sola consulta de agregados sobre el
+# rango (última edición, cantidad, último id, último borrado), así que volver a
+# un mes ya visto responde 304 sin leer ni serializar eventos. El ETag suma la
+# versión compartida "followups" (cache.py, sube con cada commit que toca un
+# seguimiento): ``updated_at`` tiene resolución de 1 s en SQLite y dos
+# ediciones en el mismo segundo darían los mismos agregados.
+#
+# Con ?since=<X-Sync-Token anterior> solo devuelve lo que cambió en el rango:
+#   {"events": [...], "deleted": [ids], "sync": "...", "reset": false}
+# Los borrados (y los seguimientos que se movieron de fecha) se leen de
+# followup_deletions, que guarda FOLLOWUPS_TOMBSTONE_DAYS días; un ``since``
+# más viejo responde "reset": true con el rango completo.
+#
+# Las series (recurrence.py) se expanden solo dentro del rango; cada ocurrencia
+# sale con id "<serie>:<fecha>" y groupId = serie. En ?since=, "groups" lista
+# las series que cambiaron o se borraron: el calendario quita todas sus
+# ocurrencias antes de agregar "events".
+KIND_COLORS = {"seguimiento": "#0d6efd", "entrega": "#28a745", "cobro": "#fd7e14"}
+DONE_COLOR = "#9AA0A6"  # gris para completados
+DEFAULT_SPAN_DAYS = 42   # lo que abarca la vista de mes
+_FEED_COLUMNS = (FollowUp.id, FollowUp.title, FollowUp.order_id, FollowUp.kind,
+                 FollowUp.done, FollowUp.when_at)
+_SERIES_COLUMNS = _FEED_COLUMNS + (FollowUp.recur_freq, FollowUp.recur_interval,
+                                   FollowUp.recur_until, FollowUp.recur_count, FollowUp.recur_exdates)
+
+
+class RangeError(ValueError):
+    pass
+
+
+def feed_range(args):
+    """(desde, hasta) validados; ``hasta`` es exclusivo e incluye todo el día ``end``."""
+    try:
+        # FullCalendar manda fechas con hora y zona: nos quedamos con YYYY-MM-DD
+        start = datetime.fromisoformat(args["start"][:10]) if args.get("start") else None
+        end = datetime.fromisoformat(args["end"][:10]) if args.get("end") else None
+    except ValueError:
+        raise RangeError("start y end deben ser fechas YYYY-MM-DD")
+    if start is None and end is None:
+        start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=7)
+    if start is None:
+        start = end - timedelta(days=DEFAULT_SPAN_DAYS)
+    if end is None:
+        end = start + timedelta(days=DEFAULT_SPAN_DAYS)
+    end += timedelta(days=1)
+    if end <= start:
+        raise RangeError("end no puede ser anterior a start")
+    max_days = current_app.config.get("FOLLOWUPS_MAX_RANGE_DAYS", 92)
+    if (end - start).days > max_days + 1:
+        raise RangeError(f"el rango no puede pasar de {max_days} días")
+    return start, end
+
+
+def _in_range(col, start, end):
+    return (col >= start, col < end)
+
+
+def _overlaps(model, start, end):
+    """Filas con when_at en el rango o series cuyo intervalo [when_at, series_end] lo cruza."""
+    return or_(and_(*_in_range(model.when_at, start, end)),
+               and_(model.series_end >= start, model.when_at < end))
+
+
+def feed_stamp(start, end):
+    """(etag, última modificación) del rango; cambia con cualquier alta, edición o baja."""
+    changed, count, last_id = db.session.execute(
+        select(func.max(FollowUp.updated_at), func.count(FollowUp.id), func.max(FollowUp.id))
+        .where(_overlaps(FollowUp, start, end))
+    ).one()
+    deleted = db.session.scalar(
+        select(func.max(FollowUpDeletion.deleted_at)).where(_overlaps(FollowUpDeletion, start, end)))
+    raw = f"{start}|{end}|{changed}|{count}|{last_id}|{deleted}|{cache.version('followups')}"
+    last = max((d for d in (changed, deleted) if d), default=None)
+    return hashlib.sha1(raw.encode()).hexdigest(), last
+
+
+def feed_events(rows, series=(), start=None, end=None):
+    """Eventos de FullCalendar: ``rows`` son tuplas ``_FEED_COLUMNS`` y ``series``
+    tuplas ``_SERIES_COLUMNS`` que se expanden dentro de [start, end)."""
+    # url_for una sola vez por respuesta, no por evento
+    head, tail = url_for("followups.edit_followup", followup_id=0).rsplit("/0/", 1)
+    events = []
+
+    def add(eid, title, order_id, kind, done, when_at, url, group=None):
+        color = DONE_COLOR if done else KIND_COLORS.get(kind, KIND_COLORS["seguimiento"])
+        ev = {
+            "id": eid,
+            "title": f"[Pedido #{order_id}] {title}" if order_id else title,
+            "start": when_at.isoformat(),
+            "allDay": False,
+            "backgroundColor": color,
+            "borderColor": color,
+            "url": url,
+        }
+        if group is not None:
+            ev["groupId"] = group
+        events.append(ev)
+
+    for fid, title, order_id, kind, done, when_at in rows:
+        add(fid, title, order_id, kind, done, when_at, f"{head}/{fid}/{tail}")
+    for fid, title, order_id, kind, done, when_at, *rule in series:
+        for occ in recurrence.occurrences(when_at, *rule, start, end):
+            stamp = occ.isoformat()   # = EXDATE_FMT (las ocurrencias no llevan microsegundos)
+            add(f"{fid}:{stamp}", title, order_id, kind, done, occ,
+                f"{head}/{fid}/{tail}?occurrence={stamp}", group=fid)
+    return events
+
+
+def _range_rows(start, end, since=None):
+    stmt = (select(*_FEED_COLUMNS)
+            .where(*_in_range(FollowUp.when_at, start, end), FollowUp.recur_freq.is_(None)))
+    if since is not None:
+        stmt = stmt.where(dt_since(FollowUp.updated_at, since))
+    return db.session.execute(stmt.order_by(FollowUp.when_at, FollowUp.id))
+
+
+def _series_rows(start, end, since=None):
+    stmt = select(*_SERIES_COLUMNS).where(FollowUp.series_end >= start, FollowUp.when_at < end)
+    if since is not None:
+        stmt = stmt.where(dt_since(FollowUp.updated_at, since))
+    return db.session.execute(stmt.order_by(FollowUp.id)).all()
+
+
+def _deletions(start, end, since):
+    """(ids sueltos, ids de series) borrados o movidos del rango desde ``since``."""
+    rows = db.session.execute(
+        select(FollowUpDeletion.followup_id, FollowUpDeletion.series_end).distinct()
+        .where(dt_since(FollowUpDeletion.deleted_at, since), _overlaps(FollowUpDeletion, start, end)))
+    deleted, groups = set(), set()
+    for fid, series_end in rows:
+        (groups if series_end else deleted).add(fid)
+    return deleted, groups
+
+
+def _parse_since(s):
+    value = datetime.fromisoformat(s.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _not_modified(etag, last):
+    if request.if_none_match:
+        return etag in request.if_none_match
+    ims = request.if_modified_since
+    return bool(ims and last and last.replace(microsecond=0, tzinfo=timezone.utc) <= ims)
+
+
 @followups_bp.route("/api/followups")
 @login_required
 def api_followups():
-    # FullCalendar suele mandar ?start=YYYY-MM-DD&end=YYYY-MM-DD
-    def parse_date(s: str):
-        if not s:
-            return None
-        try:
-            # nos quedamos con YYYY-MM-DD
-            return datetime.fromisoformat(s[:10])
-        except Exception:
-            return None
-
-    start = parse_date(request.args.get("start"))
-    end = parse_date(request.args.get("end"))
+    try:
+        start, end = feed_range(request.args)
+        since = _parse_since(request.args["since"]) if request.args.get("since") else None
+    except RangeError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError:
+        return jsonify({"error": "since debe ser una fecha ISO-8601"}), 400
 
+    etag, last = feed_stamp(start, end)
+    if _not_modified(etag, last):
+        resp = current_app.response_class(status=304)
+    elif since is None:
+        resp = jsonify(feed_events(_range_rows(start, end), _series_rows(start, end), start, end))
+    else:
+        keep = current_app.config.get("FOLLOWUPS_TOMBSTONE_DAYS", 30)
+        reset = since < datetime.utcnow() - timedelta(days=keep)
+        if reset:
+            since, deleted, groups = None, set(), set()
+        else:
+            deleted, groups = _deletions(start, end, since)
+        series = _series_rows(start, end, since)
+        groups.update(row[0] for row in series)
+        resp = jsonify({
+            "events": feed_events(_range_rows(start, end, since), series, start, end),
+            "deleted": sorted(deleted),
+            "groups": sorted(groups),
+            "sync": last.isoformat() if last else None,
+            "reset": reset,
+        })
+    resp.set_etag(etag)
+    if last:
+        resp.last_modified = last.replace(tzinfo=timezone.utc)
+        resp.headers["X-Sync-Token"] = last.isoformat()
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+# -----------------------------
+# Bajas para ?since=
+# -----------------------------
+@event.listens_for(Session, "before_flush")
+def _record_deletions(session, flush_context, instances):
+    """Anota los seguimientos borrados y los que cambiaron de fecha o de intervalo
+    (dejan su rango anterior)."""
+    rows = []
+    for obj in session.deleted:
+        if isinstance(obj, FollowUp) and obj.id is not None:
+            rows.append({"followup_id": obj.id, "when_at": obj.when_at, "series_end": obj.series_end})
+    for obj in session.dirty:
+        if isinstance(obj, FollowUp):
+            old, unloaded = {}, False
+            for attr in ("when_at", "series_end"):
+                hist = attributes.get_history(obj, attr)
+                if hist.has_changes():
+                    if hist.deleted:
+                        old[attr] = hist.deleted[0]
+                    else:
+                        unloaded = True
+            if unloaded:
+                # se reasignó sin haberse cargado (expirado tras un commit): el
+                # valor anterior sigue en la base hasta este flush
+                prev = session.connection().execute(select(FollowUp.when_at, FollowUp.series_end)
+                                                    .where(FollowUp.id == obj.id)).one_or_none()
+                if prev is None:
+                    continue
+                old = {"when_at": prev.when_at, "series_end": prev.series_end}
+            if old:
+                rows.append({"followup_id": obj.id, "when_at": old.get("when_at", obj.when_at),
+                             "series_end": old.get("series_end", obj.series_end)})
+    if not rows:
+        return
+    conn = session.connection()
+    conn.execute(insert(FollowUpDeletion), rows)
+    # holgura de un día sobre FOLLOWUPS_TOMBSTONE_DAYS por la zona horaria de now()
+    keep = current_app.config.get("FOLLOWUPS_TOMBSTONE_DAYS", 30)
+    conn.execute(delete(FollowUpDeletion).where(
+        FollowUpDeletion.deleted_at < dt_param(datetime.utcnow() - timedelta(days=keep + 1))))
+
+def _recurrence_form(form):
+    """Regla de recurrencia del formulario: (freq, intervalo, hasta, cantidad)."""
+    until_s = form.get("recur_until")
+    until = datetime.fromisoformat(until_s).replace(hour=23, minute=59, second=59) if until_s else None
+    return (form.get("recur_freq") or None, form.get("recur_interval", 1, type=int),
+            until, form.get("recur_count", type=int))
+
+
+def _occurrence_arg(f, raw):
+    """Fecha de la ocurrencia pedida si es válida para la serie ``f``."""
+    if not raw or not f.is_series:
+        return None
     try:
-        q = FollowUp.query
-        if start:
-            q = q.filter(FollowUp.when_at >= start)
-        if end:
-            # incluir todo el día 'end'
-            q = q.filter(FollowUp.when_at < (end + timedelta(days=1)))
-
-        items = q.order_by(asc(FollowUp.when_at)).all()
-
-        def color_for(kind, done):
-            if done:
-                return "#9AA0A6"  # gris para completados
-            return {"seguimiento": "#0d6efd", "entrega": "#28a745", "cobro": "#fd7e14"}.get(kind, "#0d6efd")
-
-        events = []
-        for f in items:
-            title = f.title
-            if f.order_id:
-                title = f"[Pedido #{f.order_id}] " + title
-            events.append({
-                "id": f.id,
-                "title": title,
-                "start": f.when_at.isoformat(),
-                "allDay": False,
-                "backgroundColor": color_for(f.kind, f.done),
-                "borderColor": color_for(f.kind, f.done),
-                "url": url_for("followups.edit_followup", followup_id=f.id),
-            })
-        return jsonify(events), 200
-    except Exception as e:
-        # Log mínimo y lista vacía para no romper el calendario
-        print("ERROR /api/followups:", repr(e))
-        return jsonify([]), 200
+        occ = datetime.strptime(raw, recurrence.EXDATE_FMT)
+    except ValueError:
+        return None
+    return occ if recurrence.is_occurrence(f, occ) else None
+
 
 # Crear seguimiento (desde pedido o cliente)
 @followups_bp.route("/followups/new", methods=["GET", "POST"])
@@ -71,7 +280,6 @@ def api_followups():
 def new_followup():
     client_id = request.args.get("client_id", type=int)
     order_id  = request.args.get("order_id", type=int)
-    clients = Client.query.filter_by(is_deleted=False).order_by(asc(Client.first_name)).all()
     orders  = Order.query.order_by(desc(Order.created_at)).limit(50).all()
 
     if request.method == "POST":
@@ -84,24 +292,32 @@ def new_followup():
 
         if not client_id or not title or not when_at_s:
             flash("Cliente, título y fecha/hora son obligatorios.", "danger")
-            return render_template("followup_form.html", followup=None, clients=clients, orders=orders, client_id=client_id, order_id=order_id)
+            selected_client = db.session.get(Client, client_id) if client_id else None
+            return render_template("followup_form.html", followup=None, selected_client=selected_client, orders=orders, order_id=order_id,
+                           frequencies=recurrence.FREQUENCIES)
 
         when_at = datetime.fromisoformat(when_at_s)
         f = FollowUp(client_id=client_id, order_id=order_id, kind=kind, title=title, notes=notes, when_at=when_at)
+        recurrence.set_rule(f, *_recurrence_form(request.form))
         db.session.add(f)
         db.session.commit()
         flash("Seguimiento creado.", "success")
         return redirect(url_for("followups.calendar_view"))
 
-    return render_template("followup_form.html", followup=None, clients=clients, orders=orders, client_id=client_id, order_id=order_id)
+    selected_client = db.session.get(Client, client_id) if client_id else None
+    return render_template("followup_form.html", followup=None, selected_client=selected_client, orders=orders, order_id=order_id,
+                           frequencies=recurrence.FREQUENCIES)
 
 # Editar / marcar hecho / eliminar
+# En una serie, ?occurrence=<fecha> (o el campo oculto del formulario) se refiere a una
+# sola ocurrencia: "toggle_done" la materializa y "skip" la omite; guardar y eliminar
+# afectan a toda la serie.
 @followups_bp.route("/followups/<int:followup_id>/edit", methods=["GET", "POST"])
 @login_required
 def edit_followup(followup_id):
     f = FollowUp.query.get_or_404(followup_id)
-    clients = Client.query.filter_by(is_deleted=False).order_by(asc(Client.first_name)).all()
     orders  = Order.query.order_by(desc(Order.created_at)).limit(50).all()
+    occurrence = _occurrence_arg(f, request.values.get("occurrence"))
 
     if request.method == "POST":
         action = request.form.get("action")
@@ -110,6 +326,21 @@ def edit_followup(followup_id):
             db.session.commit()
             flash("Seguimiento eliminado.", "success")
             return redirect(url_for("followups.calendar_view"))
+        elif action in ("toggle_done", "skip") and request.values.get("occurrence") and not occurrence:
+            # no caer en la acción sobre toda la serie
+            flash("La ocurrencia no es válida para esta serie.", "danger")
+            return render_template("followup_form.html", followup=f, orders=orders, occurrence=None,
+                                   frequencies=recurrence.FREQUENCIES), 400
+        elif action == "toggle_done" and occurrence:
+            child = recurrence.materialize(f, occurrence, done=True)
+            db.session.commit()
+            flash("Ocurrencia marcada como hecha.", "success")
+            return redirect(url_for("followups.edit_followup", followup_id=child.id))
+        elif action == "skip" and occurrence:
+            recurrence.skip(f, occurrence)
+            db.session.commit()
+            flash("Ocurrencia omitida.", "success")
+            return redirect(url_for("followups.calendar_view"))
         elif action == "toggle_done":
             f.done = not f.done
             db.session.commit()
@@ -122,8 +353,11 @@ def edit_followup(followup_id):
             f.notes     = (request.form.get("notes") or "").strip()
             when_at_s   = request.form.get("when_at")
             f.when_at   = datetime.fromisoformat(when_at_s) if when_at_s else f.when_at
+            recurrence.set_rule(f, *_recurrence_form(request.form),
+                                exdates=recurrence.parse_exdates(f.recur_exdates))
             db.session.commit()
             flash("Seguimiento actualizado.", "success")
             return redirect(url_for("followups.edit_followup", followup_id=f.id))
 
-    return render_template("followup_form.html", followup=f, clients=clients, orders=orders)
\ No newline at end of file
+    return render_template("followup_form.html", followup=f, orders=orders, occurrence=occurrence,
+                           frequencies=recurrence.FREQUENCIES)
@@ -0,0 +1,279 @@
+# app/jobs.py
+"""Cola de trabajos local para PDFs y exportaciones pesadas.
+
+No necesita broker: los trabajos viven en la tabla ``jobs`` y los ejecuta
+``flask jobs-worker``, un proceso aparte que reparte el trabajo en un
+ProcessPoolExecutor. Así una exportación grande ya no ocupa un worker de
+gunicorn. Cada resultado se guarda en JOBS_DIR y vence a las
+JOBS_RESULT_TTL horas; los fallos se reintentan con espera creciente,
+salvo los que no cambian al repetir (``PERMANENT_ERRORS``, p. ej. un pedido
+que no existe), que quedan fallidos de inmediato.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import update
+
+from . import pdf_cache
+from .exports import XLSX_MIMETYPE, write_xlsx
+from .models import db, dt_param, Job, Order, Quote
+
+PDF_MIMETYPE = "application/pdf"
+
+# Errores que darían lo mismo en cada reintento (parámetros o ids inválidos)
+PERMANENT_ERRORS = (LookupError, ValueError)
+
+
+# -----------------------------
+# Tipos de trabajo
+# -----------------------------
+def _order_pdf(params, path):
+    from .orders_routes import order_pdf_key, render_order_pdf
+    order = db.session.get(Order, params["order_id"])
+    if order is None:
+        raise LookupError(f"Pedido #{params['order_id']} no existe")
+    shutil.copyfile(pdf_cache.get_or_render(order_pdf_key(order), lambda: render_order_pdf(order)), path)
+    return f"Pedido_{order.id}.pdf", PDF_MIMETYPE
+
+
+def _quote_pdf(params, path):
+    from .quotes_routes import quote_pdf_key, render_quote_pdf
+    q = db.session.get(Quote, params["quote_id"])
+    if q is None:
+        raise LookupError(f"Cotización #{params['quote_id']} no existe")
+    shutil.copyfile(pdf_cache.get_or_render(quote_pdf_key(q), lambda: render_quote_pdf(q)), path)
+    return f"cotizacion_{q.id}.pdf", PDF_MIMETYPE
+
+
+def _export_clients(params, path):
+    from .routes import client_sheets
+    write_xlsx(path, client_sheets(params.get("q", "")))
+    return "clientes.xlsx", XLSX_MIMETYPE
+
+
+def _export_orders(params, path):
+    from .orders_routes import order_sheets
+    write_xlsx(path, order_sheets(params.get("status", ""), params.get("q", "")))
+    return "pedidos.xlsx", XLSX_MIMETYPE
+
+
+def _export_quotes(params, path):
+    from .quotes_routes import quote_sheets
+    write_xlsx(path, quote_sheets(params.get("status", ""), params.get("q", "")))
+    return "cotizaciones.xlsx", XLSX_MIMETYPE
+
+
+def _export_payments(params, path):
+    from .payments_routes import payment_sheets
+    write_xlsx(path, payment_sheets(params.get("order_id"), params.get("q", "")))
+    return "pagos.xlsx", XLSX_MIMETYPE
+
+
+def _export_receivables(params, path):
+    from datetime import date
+    from .receivables_routes import receivable_sheets
+    as_of = date.fromisoformat(params["as_of"])
+    write_xlsx(path, receivable_sheets(as_of))
+    return f"cuentas_por_cobrar_{as_of.isoformat()}.xlsx", XLSX_MIMETYPE
+
+
+def _batch_pdf(params, path):
+    from .batch_pdf_routes import FORMATS, KINDS, iter_zip, write_merged
+    kind, fmt, ids = params["kind"], params.get("fmt", "pdf"), params["ids"]
+    if kind not in KINDS or fmt not in FORMATS:
+        raise ValueError(f"Lote inválido: {kind}.{fmt}")
+    with open(path, "wb") as fh:
+        if fmt == "pdf":
+            write_merged(kind, ids, fh)
+        else:
+            for chunk in iter_zip(kind, ids):
+                fh.write(chunk)
+    return f"{kind}_{datetime.utcnow().date().isoformat()}.{fmt}", FORMATS[fmt]
+
+
+JOB_KINDS = {
+    "order_pdf": _order_pdf,
+    "quote_pdf": _quote_pdf,
+    "export_clients": _export_clients,
+    "export_orders": _export_orders,
+    "export_quotes": _export_quotes,
+    "export_payments": _export_payments,
+    "export_receivables": _export_receivables,
+    "batch_pdf": _batch_pdf,
+}
+
+
+def submit(kind, params=None, user_id=None):
+    """Encola un trabajo (hace commit) y lo devuelve."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+    job = Job(kind=kind, params=json.dumps(params or {}), user_id=user_id,
+              max_attempts=current_app.config.get("JOBS_MAX_ATTEMPTS", 3),
+              run_after=datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def job_dir(app=None):
+    app = app or current_app
+    path = app.config.get("JOBS_DIR") or os.path.join(tempfile.gettempdir(), "app_jobs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# -----------------------------
+# Ejecución en el pool (proceso hijo)
+# -----------------------------
+_child_app = None
+
+
+def _init_child():
+    global _child_app
+    from . import create_app
+    _child_app = create_app()
+
+
+def _run_in_child(job_id, kind, params):
+    with _child_app.app_context():
+        path = os.path.join(job_dir(_child_app), f"job_{job_id}")
+        try:
+            name, mimetype = JOB_KINDS[kind](params, path)
+            return path, name, mimetype
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        finally:
+            db.session.remove()
+
+
+# -----------------------------
+# Worker (proceso padre)
+# -----------------------------
+def _claim_next(now):
+    """Toma el siguiente trabajo en cola; UPDATE condicional = sin carreras
+    aunque haya varios workers."""
+    job = (Job.query
+           .filter(Job.status == "en_cola", Job.run_after <= dt_param(now))
+           .order_by(Job.id)
+           .first())
+    if job is None:
+        return None
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == "en_cola")
+        .values(status="en_proceso", started_at=now, attempts=Job.attempts + 1)
+    ).rowcount
+    db.session.commit()
+    return db.session.get(Job, job.id) if claimed else None
+
+
+def _finish(job_id, future):
+    job = db.session.get(Job, job_id)
+    now = datetime.utcnow()
+    try:
+        path, name, mimetype = future.result()
+    except Exception as e:
+        job.error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        if not isinstance(e, PERMANENT_ERRORS) and job.attempts < job.max_attempts:
+            # reintento con espera creciente: 10 s, 40 s, 90 s...
+            job.status = "en_cola"
+            job.run_after = now + timedelta(seconds=10 * job.attempts ** 2)
+        else:
+            job.status = "fallido"
+            job.finished_at = now
+    else:
+        ttl = current_app.config.get("JOBS_RESULT_TTL", 24)
+        job.status = "listo"
+        job.error = None
+        job.result_path, job.result_name, job.mimetype = path, name, mimetype
+        job.finished_at = now
+        job.expires_at = now + timedelta(hours=ttl)
+    db.session.commit()
+
+
+def purge_expired(now=None):
+    """Borra archivos de resultados vencidos. Devuelve cuántos."""
+    now = now or datetime.utcnow()
+    expired = Job.query.filter(Job.status == "listo", Job.expires_at < dt_param(now)).all()
+    for job in expired:
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        job.status = "vencido"
+        job.result_path = None
+    db.session.commit()
+    return len(expired)
+
+
+def _requeue_stale(now):
+    """Trabajos que quedaron 'en_proceso' tras una caída del worker.
+
+    La ejecución caída ya sumó su intento al tomarse (``_claim_next``): los
+    que agotaron ``max_attempts`` quedan fallidos, así un trabajo que tumba
+    al worker no vuelve a la cola para siempre.
+    """
+    limit = now - timedelta(seconds=current_app.config.get("JOBS_STALE_SECONDS", 1800))
+    stale = (Job.status == "en_proceso", Job.started_at < dt_param(limit))
+    db.session.execute(
+        update(Job)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status="fallido", finished_at=now,
+                error="El worker se detuvo durante la ejecución (sin intentos restantes)")
+    )
+    db.session.execute(
+        update(Job)
+        .where(*stale)
+        .values(status="en_cola", run_after=now)
+    )
+    db.session.commit()
+
+
+def run_worker(processes=None, poll=None, once=False):
+    processes = processes or current_app.config.get("JOBS_WORKERS", 2)
+    poll = poll or current_app.config.get("JOBS_POLL_SECONDS", 1.0)
+    ctx = multiprocessing.get_context("spawn")
+    running = {}
+    last_purge = 0.0
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                             initializer=_init_child) as pool:
+        _requeue_stale(datetime.utcnow())
+        while True:
+            for job_id, fut in list(running.items()):
+                if fut.done():
+                    _finish(job_id, fut)
+                    del running[job_id]
+
+            while len(running) < processes:
+                job = _claim_next(datetime.utcnow())
+                if job is None:
+                    break
+                running[job.id] = pool.submit(_run_in_child, job.id, job.kind, json.loads(job.params))
+
+            if time.monotonic() - last_purge > 60:
+                purge_expired()
+                last_purge = time.monotonic()
+
+            if once and not running:
+                return
+            time.sleep(poll)
+
+
+@click.command("jobs-worker")
+@click.option("--processes", "-p", type=int, help="Procesos del pool (JOBS_WORKERS).")
+@click.option("--once", is_flag=True, help="Procesa lo que haya en cola y termina.")
+def jobs_worker_command(processes, once):
+    """Ejecuta los trabajos en segundo plano (PDF / exportaciones)."""
+    db.create_all()
+    click.echo("▶ Worker de trabajos iniciado.")
+    run_worker(processes=processes, once=once)
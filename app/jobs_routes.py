@@ -0,0 +1,100 @@
+# app/jobs_routes.py
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, abort
+from flask_login import login_required, current_user
+from sqlalchemy import desc
+import json
+import os
+from .models import db, Job
+from . import jobs
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+def _wants_json():
+    return request.is_json or request.accept_mimetypes.best == "application/json"
+
+
+def _job_json(job):
+    data = {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "expires_at": job.expires_at.isoformat() if job.expires_at else None,
+        "status_url": url_for("jobs.job_status", job_id=job.id),
+    }
+    if job.status == "listo":
+        data["download_url"] = url_for("jobs.job_download", job_id=job.id)
+    return data
+
+
+def _own_job_or_404(job_id):
+    job = db.get_or_404(Job, job_id)
+    if job.user_id != current_user.id:
+        abort(404)
+    return job
+
+
+def enqueue_response(kind, params):
+    """Encola el trabajo y responde 202 (JSON) o redirige a la lista de trabajos."""
+    job = jobs.submit(kind, params, user_id=current_user.id)
+    if _wants_json():
+        return jsonify(_job_json(job)), 202
+    flash(f"Trabajo #{job.id} en cola. Descárgalo aquí cuando esté listo.", "info")
+    return redirect(url_for("jobs.list_jobs"))
+
+
+def wants_async():
+    """?async=1 en rutas de PDF/exportación = mandarlo a la cola."""
+    return request.args.get("async") in ("1", "true")
+
+
+# Lista de trabajos del usuario
+@jobs_bp.route("/jobs")
+@login_required
+def list_jobs():
+    items = (Job.query.filter_by(user_id=current_user.id)
+             .order_by(desc(Job.id)).limit(50).all())
+    if _wants_json():
+        return jsonify([_job_json(j) for j in items])
+    return render_template("jobs_list.html", jobs=items)
+
+
+# Encolar: {"kind": "export_orders", "params": {"status": "pendiente"}}
+@jobs_bp.route("/jobs", methods=["POST"])
+@login_required
+def submit_job():
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        kind, params = payload.get("kind"), payload.get("params") or {}
+    else:
+        kind = request.form.get("kind")
+        try:
+            params = json.loads(request.form.get("params") or "{}")
+        except ValueError:
+            params = None
+    if kind not in jobs.JOB_KINDS or not isinstance(params, dict):
+        return jsonify({"error": "kind o params inválidos",
+                        "kinds": sorted(jobs.JOB_KINDS)}), 400
+    return enqueue_response(kind, params)
+
+
+@jobs_bp.route("/jobs/<int:job_id>")
+@login_required
+def job_status(job_id):
+    return jsonify(_job_json(_own_job_or_404(job_id)))
+
+
+@jobs_bp.route("/jobs/<int:job_id>/download")
+@login_required
+def job_download(job_id):
+    job = _own_job_or_404(job_id)
+    if job.status == "vencido":
+        return jsonify({"error": "El resultado venció; vuelve a generarlo."}), 410
+    if job.status != "listo" or not job.result_path or not os.path.exists(job.result_path):
+        return jsonify(_job_json(job)), 409
+    return send_file(job.result_path, as_attachment=True,
+                     download_name=job.result_name, mimetype=job.mimetype)
@@ -0,0 +1,87 @@
+# app/line_items.py
+"""Guardar los ítems de un pedido/cotización aplicando solo las diferencias.
+
+El formulario manda el id de cada fila existente (``item_id[]``); las filas
+sin id son nuevas y las que ya no vienen se borran. Así editar una línea de
+un pedido de 300 es un UPDATE, no 300 DELETE + 300 INSERT. Los INSERT y
+UPDATE van en bloque (executemany) por fuera del unit of work, por lo que
+quien llama debe marcar rollups/caché si le afectan.
+"""
+from decimal import Decimal
+
+from flask import request
+from sqlalchemy import delete, insert, update
+
+from .models import db
+
+FIELDS = ("description", "quantity", "unit_price", "product_id")
+
+
+def to_decimal(x):
+    """Convierte cualquier entrada a Decimal(2) de forma segura."""
+    try:
+        return Decimal(str(x or 0)).quantize(Decimal("0.01"))
+    except Exception:
+        return Decimal("0.00")
+
+
+def _to_int(x):
+    try:
+        return int(x) if x else None
+    except ValueError:
+        return None
+
+
+def rows_from_form(skip=lambda row: False):
+    """Filas de ítems del form (arrays alineados por posición) como dicts."""
+    ids    = request.form.getlist("item_id[]")
+    descs  = request.form.getlist("item_description[]")
+    qtys   = request.form.getlist("item_qty[]")
+    prices = request.form.getlist("item_price[]")
+    prods  = request.form.getlist("item_product_id[]")
+    n = max(len(descs), len(qtys), len(prices), len(prods))
+    rows = []
+    for i in range(n):
+        row = {
+            "id":          _to_int(ids[i] if i < len(ids) else ""),
+            "description": (descs[i] if i < len(descs) else "").strip(),
+            "quantity":    to_decimal(qtys[i] if i < len(qtys) else "0"),
+            "unit_price":  to_decimal(prices[i] if i < len(prices) else "0"),
+            "product_id":  _to_int(prods[i] if i < len(prods) else ""),
+        }
+        if not skip(row):
+            rows.append(row)
+    return rows
+
+
+def sync_items(model, parent_key, parent_id, current, rows):
+    """Deja los ítems ``current`` del documento iguales a ``rows``.
+
+    Devuelve ``(total, changed)``: el total recalculado desde ``rows`` y si
+    hubo alguna escritura.
+    """
+    by_id = {it.id: it for it in current}
+    inserts, updates, kept = [], [], set()
+    total = Decimal("0.00")
+
+    for row in rows:
+        total += row["quantity"] * row["unit_price"]
+        values = {f: row[f] for f in FIELDS}
+        # Un id que no es de este documento (o repetido) se trata como fila nueva
+        item = by_id.get(row["id"]) if row["id"] not in kept else None
+        if item is None:
+            inserts.append({parent_key: parent_id, **values})
+            continue
+        kept.add(item.id)
+        changed = {f: v for f, v in values.items() if getattr(item, f) != v}
+        if changed:
+            updates.append({"id": item.id, **changed})
+
+    removed = [i for i in by_id if i not in kept]
+    if removed:
+        db.session.execute(delete(model).where(model.id.in_(removed)))
+    if updates:
+        db.session.execute(update(model), updates)
+    if inserts:
+        db.session.execute(insert(model), inserts)
+    return total, bool(removed or updates or inserts)
@@ -0,0 +1,160 @@
+# app/metrics.py
+"""Métricas en formato Prometheus en GET /metrics.
+
+- Latencia de cada petición por blueprint y endpoint (histograma) y conteo
+  por código de estado.
+- Pool de conexiones: tamaño, checkouts, conexiones en uso y overflow.
+- Duración y tamaño de los PDFs y XLSX generados.
+- Aciertos/fallos de la caché compartida (ya acumulados entre workers en la
+  tabla ``cache_stats``, se leen al momento de exponer).
+
+Con varios workers de gunicorn cada proceso escribe sus valores en
+PROMETHEUS_MULTIPROC_DIR (lo define gunicorn.conf.py) y /metrics los suma
+todos, sin importar qué worker atienda el scrape. Sin esa variable (flask run)
+las métricas son las del proceso.
+"""
+import os
+import time
+from contextlib import contextmanager
+from hmac import compare_digest
+
+from flask import Blueprint, Response, abort, current_app, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+from .cache import cache
+from .models import db
+
+metrics_bp = Blueprint("metrics", __name__)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+REQUEST_SECONDS = Histogram(
+    "app_request_duration_seconds", "Duración de las peticiones HTTP",
+    ["blueprint", "endpoint", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+REQUESTS = Counter(
+    "app_requests_total", "Peticiones HTTP atendidas",
+    ["blueprint", "endpoint", "method", "status"])
+
+POOL_CHECKOUTS = Counter(
+    "app_db_pool_checkouts_total", "Conexiones tomadas del pool")
+POOL_CHECKED_OUT = Gauge(
+    "app_db_pool_checked_out", "Conexiones del pool en uso", multiprocess_mode="livesum")
+POOL_SIZE = Gauge(
+    "app_db_pool_size", "Tamaño configurado del pool", multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge(
+    "app_db_pool_overflow", "Conexiones abiertas por encima de pool_size",
+    multiprocess_mode="livesum")
+
+DOCUMENT_SECONDS = Histogram(
+    "app_document_render_seconds", "Tiempo de generación de PDFs / XLSX", ["kind"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+DOCUMENT_BYTES = Histogram(
+    "app_document_bytes", "Tamaño de los PDFs / XLSX generados", ["kind"],
+    buckets=(10e3, 50e3, 100e3, 250e3, 500e3, 1e6, 5e6, 20e6, 100e6))
+PDF_CACHE = Counter(
+    "app_pdf_cache_requests_total", "Búsquedas en la caché de PDFs", ["result"])
+
+
+# -----------------------------
+# Instrumentación
+# -----------------------------
+@contextmanager
+def timed_document(kind):
+    """``with timed_document("pdf") as doc: ...; doc["bytes"] = n`` registra duración y tamaño."""
+    doc = {"bytes": None}
+    started = time.perf_counter()
+    yield doc
+    DOCUMENT_SECONDS.labels(kind).observe(time.perf_counter() - started)
+    if doc["bytes"] is not None:
+        DOCUMENT_BYTES.labels(kind).observe(doc["bytes"])
+
+
+def _start_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def _observe_request(response):
+    started = g.pop("_metrics_started", None)
+    endpoint = request.endpoint or "(sin endpoint)"
+    if started is None or endpoint in ("static", "metrics.metrics"):
+        return response
+    blueprint = request.blueprint or "app"
+    REQUEST_SECONDS.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+    REQUESTS.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+
+def _watch_pool(pool):
+    size = getattr(pool, "size", None)
+    if size:
+        POOL_SIZE.set(size())
+
+    def _overflow():
+        overflow = getattr(pool, "overflow", None)
+        if overflow:
+            POOL_OVERFLOW.set(max(overflow(), 0))
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        POOL_CHECKOUTS.inc()
+        POOL_CHECKED_OUT.inc()
+        _overflow()
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_conn, record):
+        POOL_CHECKED_OUT.dec()
+        _overflow()
+
+
+def init_app(app):
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    with app.app_context():
+        for engine in db.engines.values():
+            _watch_pool(engine.pool)
+
+
+# -----------------------------
+# Exposición
+# -----------------------------
+class SharedCacheCollector:
+    """Aciertos/fallos por nombre desde la caché compartida (ya globales)."""
+
+    def collect(self):
+        hits = CounterMetricFamily("app_cache_hits", "Aciertos de la caché compartida", labels=["name"])
+        misses = CounterMetricFamily("app_cache_misses", "Fallos de la caché compartida", labels=["name"])
+        ratio = GaugeMetricFamily("app_cache_hit_ratio", "Aciertos / consultas a la caché", labels=["name"])
+        for name, s in cache.stats().items():
+            hits.add_metric([name], s["hits"])
+            misses.add_metric([name], s["misses"])
+            total = s["hits"] + s["misses"]
+            ratio.add_metric([name], s["hits"] / total if total else 0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+def _registry():
+    registry = CollectorRegistry()
+    if MULTIPROC_DIR:
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        for collector in (REQUEST_SECONDS, REQUESTS, POOL_CHECKOUTS, POOL_CHECKED_OUT,
+                          POOL_SIZE, POOL_OVERFLOW, DOCUMENT_SECONDS, DOCUMENT_BYTES, PDF_CACHE):
+            registry.register(collector)
+    registry.register(SharedCacheCollector())
+    return registry
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    # METRICS_TOKEN vacío = abierto (para el scraper dentro del clúster)
+    token = current_app.config.get("METRICS_TOKEN")
+    auth = request.headers.get("Authorization", "")
+    if token and not (auth.startswith("Bearer ") and compare_digest(auth[7:], token)):
+        abort(401)
+    return Response(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, Index
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import func, Index, select, String, type_coerce, UniqueConstraint
+from werkzeug.security import check_password_hash
+from .auth.passwords import hash_password
 from decimal import Decimal
 
 db = SQLAlchemy()
@@ -17,6 +18,29 @@ def _D(val):
     except Exception:
         return Decimal("0.00")
 
+def dt_param(value):
+    """Parámetro datetime para comparar contra columnas DateTime.
+
+    En SQLite las fechas son texto y el ORM las escribe siempre como
+    'YYYY-MM-DD HH:MM:SS.ffffff' (también con microsegundo 0); se enlaza el
+    mismo formato para que = y > cuadren con lo guardado.
+    """
+    if db.engine.dialect.name != "sqlite":
+        return value
+    return type_coerce(value.strftime("%Y-%m-%d %H:%M:%S.%f"), String)
+
+
+def dt_since(column, value):
+    """``column >= value`` también para filas escritas con CURRENT_TIMESTAMP.
+
+    Esas guardan 'YYYY-MM-DD HH:MM:SS' sin fracción, que como texto queda
+    antes de '...SS.000000': con un ``value`` de segundos enteros se compara
+    contra el segundo sin fracción para incluirlas (sigue usando el índice).
+    """
+    if db.engine.dialect.name == "sqlite" and not value.microsecond:
+        return column >= type_coerce(value.strftime("%Y-%m-%d %H:%M:%S"), String)
+    return column >= dt_param(value)
+
 # =========================
 # Usuarios
 # =========================
@@ -27,9 +51,17 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    # Sube con cada cambio de contraseña: las sesiones con otro valor dejan de valer
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def set_password(self, raw: str):
-        self.password_hash = generate_password_hash(raw)
+        # Algoritmo y costo según PASSWORD_HASH_METHOD (app/auth/passwords.py)
+        self.password_hash = hash_password(raw)
+        self.session_version = (self.session_version or 0) + 1
+
+    def rehash_password(self, raw: str):
+        """Misma contraseña con la política vigente (no cierra sesiones)."""
+        self.password_hash = hash_password(raw)
 
     def check_password(self, raw: str) -> bool:
         return check_password_hash(self.password_hash, raw)
@@ -67,6 +99,8 @@ class Client(db.Model):
 
     __table_args__ = (
         Index("ix_clients_search", "first_name", "last_name", "email", "phone", "company"),
+        Index("ix_clients_updated_at", "updated_at"),
+        Index("ix_clients_deleted_created", "is_deleted", "created_at"),  # listado de clientes
     )
 
     orders = db.relationship("Order", backref="client", lazy=True)
@@ -88,30 +122,39 @@ class Order(db.Model):
         name="order_status"
     ), nullable=False, default="pendiente")
     total     = db.Column(db.Numeric(10, 2), nullable=False, default=0)  # caché
+    # Cachés mantenidas por app/balances.py al escribir pagos / cambiar total
+    paid_total = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default="0")
+    balance    = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default="0")
     notes     = db.Column(db.Text)
 
     created_at= db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at= db.Column(db.DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index("ix_orders_balance", "balance"),
+        # Cuentas por cobrar: cubre el GROUP BY de los pedidos con saldo
+        Index("ix_orders_open_balance", "balance", "status", "created_at", "client_id"),
+        # Listados por (created_at, id) DESC: general, por estado y por cliente
+        Index("ix_orders_created_id", "created_at", "id"),
+        Index("ix_orders_status_created", "status", "created_at"),
+        Index("ix_orders_client_created", "client_id", "created_at"),
+    )
+
     items    = db.relationship("OrderItem", backref="order", cascade="all, delete-orphan", lazy=True)
     payments = db.relationship("Payment",  backref="order", cascade="all, delete-orphan", lazy=True)
 
+    @classmethod
+    def paid_sum_expr(cls):
+        """Subconsulta correlacionada con la suma real de pagos (para conciliar paid_total)."""
+        return (select(func.coalesce(func.sum(Payment.amount), 0))
+                .where(Payment.order_id == cls.id)
+                .correlate_except(Payment)
+                .scalar_subquery())
+
     def recompute_total(self):
         # Usa siempre Decimal para evitar mezclar con float
         self.total = sum(_D(it.quantity) * _D(it.unit_price) for it in self.items)
 
-    @property
-    def paid_total(self):
-        total = Decimal("0.00")
-        for p in self.payments:
-            total += _D(p.amount)
-        return total
-
-    @property
-    def balance(self):
-        t = _D(self.total)
-        return t - self.paid_total
-
 
 class OrderItem(db.Model):
     __tablename__ = "order_items"
@@ -145,6 +188,68 @@ class FollowUp(db.Model):
     created_at  = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at  = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    # Recurrencia (ver app/recurrence.py): when_at es la primera ocurrencia
+    recur_freq     = db.Column(db.String(10))   # daily / weekly / monthly; NULL = no se repite
+    recur_interval = db.Column(db.Integer)      # cada N días/semanas/meses
+    recur_until    = db.Column(db.DateTime)
+    recur_count    = db.Column(db.Integer)
+    recur_exdates  = db.Column(db.Text)         # ocurrencias omitidas o materializadas
+    series_end     = db.Column(db.DateTime)     # última ocurrencia posible
+    # Ocurrencia materializada de una serie
+    parent_id      = db.Column(db.Integer, db.ForeignKey("followups.id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_followups_when_at", "when_at"),                 # rango del calendario
+        Index("ix_followups_updated_at", "updated_at"),           # ?since= del calendario
+        Index("ix_followups_series", "series_end", "when_at"),    # series que cruzan el rango
+    )
+
+    @property
+    def is_series(self):
+        return bool(self.recur_freq)
+
+
+class FollowUpDeletion(db.Model):
+    """Seguimientos borrados, para que ``/api/followups?since=`` avise al calendario."""
+    __tablename__ = "followup_deletions"
+
+    id          = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    followup_id = db.Column(db.Integer, nullable=False)
+    when_at     = db.Column(db.DateTime, nullable=False)
+    series_end  = db.Column(db.DateTime)   # si era una serie: su última ocurrencia
+    deleted_at  = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_followup_deletions_deleted", "deleted_at"),
+    )
+
+class Notification(db.Model):
+    """Seguimiento vencido, escrito por ``flask followups-scheduler`` (app/scheduler.py)."""
+    __tablename__ = "notifications"
+
+    id          = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    followup_id = db.Column(db.Integer, nullable=False)
+    occurrence  = db.Column(db.Boolean, nullable=False, default=False)  # ocurrencia de una serie
+    client_id   = db.Column(db.Integer, nullable=False)
+    kind        = db.Column(db.String(20), nullable=False)
+    title       = db.Column(db.String(200), nullable=False)
+    due_at      = db.Column(db.DateTime, nullable=False)
+    created_at  = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("followup_id", "due_at", name="uq_notifications_followup_due"),
+    )
+
+
+class NotificationRead(db.Model):
+    """Aviso que un usuario ya marcó como leído (la lectura es de cada usuario)."""
+    __tablename__ = "notification_reads"
+
+    user_id         = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey("notifications.id", ondelete="CASCADE"),
+                                primary_key=True)
+    read_at         = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+
 Client.followups = db.relationship("FollowUp", backref="client", lazy=True, cascade="all, delete-orphan")
 Order.followups  = db.relationship("FollowUp", backref="order",  lazy=True, cascade="all, delete-orphan")
 
@@ -166,6 +271,11 @@ class Payment(db.Model):
     paid_at   = db.Column(db.DateTime, nullable=False, server_default=func.now())
     created_at= db.Column(db.DateTime, nullable=False, server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_payments_order_paid", "order_id", "paid_at"),  # pagos de un pedido
+        Index("ix_payments_paid_at", "paid_at"),                 # rollups por día
+    )
+
 
 # =========================
 # Productos
@@ -199,6 +309,11 @@ class Quote(db.Model):
     created_at  = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     updated_at  = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index("ix_quotes_created_id", "created_at", "id"),
+        Index("ix_quotes_status_created", "status", "created_at"),
+    )
+
     items = db.relationship("QuoteItem", backref="quote", cascade="all, delete-orphan", lazy=True)
 
     def recompute_total(self):
@@ -232,4 +347,75 @@ class QuoteItem(db.Model):
     unit_price  = db.Column(db.Numeric(10, 2), nullable=False, default=0)
     created_at  = db.Column(db.DateTime, server_default=func.now(), nullable=False)
 
-Client.quotes = db.relationship("Quote", backref="client", lazy=True, cascade="all, delete-orphan")
\ No newline at end of file
+Client.quotes = db.relationship("Quote", backref="client", lazy=True, cascade="all, delete-orphan")
+
+# =========================
+# Rollups del dashboard (mantenidos por app/rollups.py)
+# =========================
+class DailyRevenue(db.Model):
+    __tablename__ = "rollup_daily"
+
+    day           = db.Column(db.Date, primary_key=True)
+    revenue       = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # SUM(orders.total)
+    orders_count  = db.Column(db.Integer, nullable=False, default=0)
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    paid          = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # SUM(payments.amount) por paid_at
+
+
+class DailyClientRevenue(db.Model):
+    __tablename__ = "rollup_daily_client"
+
+    day          = db.Column(db.Date, primary_key=True)
+    client_id    = db.Column(db.Integer, primary_key=True)
+    revenue      = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    orders_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_rollup_daily_client_client", "client_id"),
+    )
+
+
+class DailyProductSales(db.Model):
+    __tablename__ = "rollup_daily_product"
+
+    id         = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    day        = db.Column(db.Date, nullable=False)
+    product_id = db.Column(db.Integer, nullable=True)  # NULL = ítems sin catálogo
+    qty        = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    revenue    = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_rollup_daily_product_day", "day", "product_id"),
+    )
+
+
+# =========================
+# Trabajos en segundo plano (PDF / exportaciones, ver app/jobs.py)
+# =========================
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id           = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind         = db.Column(db.String(40), nullable=False)
+    params       = db.Column(db.Text, nullable=False, default="{}")  # JSON
+    status       = db.Column(db.Enum("en_cola", "en_proceso", "listo", "fallido", "vencido",
+                                     name="job_status"),
+                             nullable=False, default="en_cola")
+    attempts     = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    error        = db.Column(db.Text)
+    user_id      = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True, index=True)
+
+    result_path  = db.Column(db.String(500))
+    result_name  = db.Column(db.String(200))
+    mimetype     = db.Column(db.String(120))
+
+    run_after    = db.Column(db.DateTime, nullable=False, server_default=func.now())
+    created_at   = db.Column(db.DateTime, nullable=False, server_default=func.now())
+    started_at   = db.Column(db.DateTime)
+    finished_at  = db.Column(db.DateTime)
+    expires_at   = db.Column(db.DateTime)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
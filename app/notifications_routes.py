@@ -0,0 +1,98 @@
+# app/notifications_routes.py
+"""Avisos de seguimientos vencidos (los escribe ``flask followups-scheduler``).
+
+GET /api/notifications?after=<id> lo consulta la barra de navegación cada
+NOTIFICATIONS_POLL_SECONDS. El ETag es la versión compartida "notifications"
+(cache.py), que cambia cuando el scheduler escribe avisos o alguien los marca
+leídos: mientras no cambie, la respuesta es 304 sin tocar la base.
+
+Leído / no leído es de cada usuario (``notification_reads``): marcar un
+aviso no lo quita de la campana de los demás.
+"""
+from flask import Blueprint, current_app, jsonify, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import exists, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from .cache import cache
+from .models import db, Notification, NotificationRead
+
+notifications_bp = Blueprint("notifications", __name__)
+
+PAGE = 20
+
+
+def _unread(user_id):
+    """Criterio WHERE: avisos que ``user_id`` no ha leído."""
+    return ~exists().where(NotificationRead.user_id == user_id,
+                           NotificationRead.notification_id == Notification.id)
+
+
+def _notification_json(n):
+    if n.occurrence:
+        url = url_for("followups.edit_followup", followup_id=n.followup_id,
+                      occurrence=n.due_at.isoformat())
+    else:
+        url = url_for("followups.edit_followup", followup_id=n.followup_id)
+    return {
+        "id": n.id,
+        "kind": n.kind,
+        "title": n.title,
+        "client_id": n.client_id,
+        "due_at": n.due_at.isoformat(),
+        "read": False,   # la lista solo trae los no leídos del usuario
+        "url": url,
+        "read_url": url_for("notifications.mark_read", notification_id=n.id),
+    }
+
+
+@notifications_bp.route("/api/notifications")
+@login_required
+def api_notifications():
+    after = request.args.get("after", 0, type=int)
+    etag = f"n{cache.version('notifications')}-{current_user.id}-{after}"
+    if etag in request.if_none_match:
+        resp = current_app.response_class(status=304)
+    else:
+        unread_filter = _unread(current_user.id)
+        items = db.session.scalars(
+            select(Notification).where(unread_filter, Notification.id > after)
+            .order_by(Notification.id.desc()).limit(PAGE)).all()
+        unread = db.session.scalar(
+            select(func.count(Notification.id)).where(unread_filter))
+        resp = jsonify({
+            "items": [_notification_json(n) for n in items],
+            "unread": unread,
+            "last": max([after] + [n.id for n in items]),
+        })
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+@notifications_bp.route("/notifications/<int:notification_id>/read", methods=["POST"])
+@login_required
+def mark_read(notification_id):
+    db.get_or_404(Notification, notification_id)
+    if db.session.get(NotificationRead, (current_user.id, notification_id)) is None:
+        db.session.add(NotificationRead(user_id=current_user.id, notification_id=notification_id))
+        try:
+            db.session.commit()
+        except IntegrityError:   # doble clic: ya lo marcó la otra petición
+            db.session.rollback()
+    return jsonify({"ok": True})
+
+
+@notifications_bp.route("/notifications/read-all", methods=["POST"])
+@login_required
+def mark_all_read():
+    pending = select(literal(current_user.id), Notification.id).where(_unread(current_user.id))
+    try:
+        db.session.execute(insert(NotificationRead)
+                           .from_select(["user_id", "notification_id"], pending))
+        db.session.commit()
+    except IntegrityError:   # otra petición del mismo usuario marcó alguno a la vez
+        db.session.rollback()
+    cache.bump("notifications")   # INSERT masivo: no pasa por VERSIONS_BY_MODEL
+    return jsonify({"ok": True})
@@ -1,9 +1,10 @@
 # app/orders_routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required
 from sqlalchemy import asc, desc
+from sqlalchemy.orm import contains_eager
 from io import BytesIO
-from datetime import datetime
+from datetime import date, datetime
 from reportlab.lib.pagesizes import LETTER
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
@@ -13,52 +14,68 @@ import os
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT
 from .models import db, Client, Order, OrderItem, Product  # incluye Product
+from .pagination import use_keyset, keyset_paginate
+from .search import client_match
+from .exports import YIELD_PER, fmt_dt, xlsx_response
+from .jobs_routes import wants_async, enqueue_response
+from . import pdf_cache, rollups
+from .cache import mark_tags
+from .line_items import rows_from_form, sync_items
 
 orders_bp = Blueprint("orders", __name__)
 
 # -----------------------------
 # LISTADO DE PEDIDOS
 # -----------------------------
+def _order_filters(status, q, with_balance=False):
+    """Criterios de ?status=, ?q= y ?saldo=1 (requiere JOIN con Client)."""
+    criteria = []
+    if status:
+        criteria.append(Order.status == status)
+    if q:
+        criteria.append(client_match(q))
+    if with_balance:
+        criteria.append(Order.balance > 0)  # ix_orders_balance
+    return criteria
+
+
 @orders_bp.route("/orders")
 @login_required
 def list_orders():
     status = (request.args.get("status") or "").strip()
     q = (request.args.get("q") or "").strip()
+    with_balance = request.args.get("saldo") == "1"
     page = request.args.get("page", 1, type=int)
     per_page = 10
 
-    query = Order.query.join(Client)
-    if status:
-        query = query.filter(Order.status == status)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(
-            (Client.first_name.ilike(like)) |
-            (Client.last_name.ilike(like)) |
-            (Client.email.ilike(like))
-        )
+    # Cliente por JOIN en la misma consulta (sin N+1); pagado/saldo son columnas
+    query = (Order.query.join(Client)
+             .options(contains_eager(Order.client))
+             .filter(*_order_filters(status, q, with_balance)))
 
-    pagination = query.order_by(desc(Order.created_at)).paginate(page=page, per_page=per_page)
-    return render_template("orders_list.html", pagination=pagination, q=q, status=status)
+    if use_keyset():
+        pagination = keyset_paginate(query, Order.created_at, Order.id, per_page=per_page)
+    else:
+        pagination = query.order_by(desc(Order.created_at)).paginate(page=page, per_page=per_page)
+    return render_template("orders_list.html", pagination=pagination, q=q, status=status,
+                           with_balance=with_balance)
 
 
 # -------- util para leer filas de ítems sin perder ninguna --------
-def _iter_items_from_form():
-    descs  = request.form.getlist("item_description[]")
-    qtys   = request.form.getlist("item_qty[]")
-    prices = request.form.getlist("item_price[]")
-    prods  = request.form.getlist("item_product_id[]")
-
-    n = max(len(descs), len(qtys), len(prices), len(prods))
-    for i in range(n):
-        d   = (descs[i]  if i < len(descs)  else "").strip()
-        q   = (qtys[i]   if i < len(qtys)   else "0")
-        p   = (prices[i] if i < len(prices) else "0")
-        pid = (prods[i]  if i < len(prods)  else "")
-        # si la fila viene totalmente vacía, saltar
-        if not d and not (pid and (q or p)):
-            continue
-        yield d, q, p, pid
+def _item_rows():
+    # si la fila viene totalmente vacía (sin descripción ni producto), saltar
+    return rows_from_form(skip=lambda r: not r["description"] and not r["product_id"])
+
+
+def _save_items(order, rows):
+    """Aplica los ítems del form al pedido (solo lo que cambió) y recalcula total."""
+    total, changed = sync_items(OrderItem, "order_id", order.id, order.items, rows)
+    order.total = total
+    if changed:
+        db.session.expire(order, ["items"])
+        # Escrituras en bloque: no pasan por el flush, avisar a rollups y caché
+        rollups.mark_days(db.session, [rollups.as_date(order.created_at) or date.today()])
+        mark_tags(db.session, "dashboard")
 
 
 # -----------------------------
@@ -67,9 +84,8 @@ def _iter_items_from_form():
 @orders_bp.route("/orders/new", methods=["GET", "POST"])
 @login_required
 def create_order():
-    clients  = Client.query.filter_by(is_deleted=False).order_by(asc(Client.first_name)).all()
-    products = Product.query.order_by(Product.name.asc()).all()
     default_client_id = request.args.get("client_id", type=int)
+    selected_client = db.session.get(Client, default_client_id) if default_client_id else None
 
     if request.method == "POST":
         client_id = request.form.get("client_id", type=int)
@@ -78,34 +94,20 @@ def create_order():
 
         if not client_id:
             flash("Cliente e ítems son obligatorios.", "danger")
-            return render_template("order_form.html", order=None, clients=clients, products=products, default_client_id=default_client_id)
+            return render_template("order_form.html", order=None, selected_client=selected_client)
 
         order = Order(client_id=client_id, status=status, notes=notes)
         db.session.add(order)
         db.session.flush()  # tener order.id
 
-        # crear ítems
-        for d, q, p, pid in _iter_items_from_form():
-            try:
-                qv = float(q or 0); pv = float(p or 0)
-            except ValueError:
-                qv = 0; pv = 0
-            item = OrderItem(order_id=order.id, description=d or "", quantity=qv, unit_price=pv)
-            if pid:
-                try:
-                    item.product_id = int(pid)
-                except ValueError:
-                    pass
-            db.session.add(item)
-
-        db.session.flush()
-        order.recompute_total()
+        # crear ítems (un solo INSERT en bloque)
+        _save_items(order, _item_rows())
         db.session.commit()
 
         flash("Pedido creado.", "success")
         return redirect(url_for("orders.list_orders"))
 
-    return render_template("order_form.html", order=None, clients=clients, products=products, default_client_id=default_client_id)
+    return render_template("order_form.html", order=None, selected_client=selected_client)
 
 
 # -----------------------------
@@ -115,39 +117,20 @@ def create_order():
 @login_required
 def edit_order(order_id):
     order    = Order.query.get_or_404(order_id)
-    clients  = Client.query.filter_by(is_deleted=False).order_by(asc(Client.first_name)).all()
-    products = Product.query.order_by(Product.name.asc()).all()
 
     if request.method == "POST":
         order.client_id = request.form.get("client_id", type=int)
         order.status    = (request.form.get("status") or "pendiente").strip()
         order.notes     = (request.form.get("notes")  or "").strip()
 
-        # borrar items actuales y recrear
-        for it in list(order.items):
-            db.session.delete(it)
-
-        for d, q, p, pid in _iter_items_from_form():
-            try:
-                qv = float(q or 0); pv = float(p or 0)
-            except ValueError:
-                qv = 0; pv = 0
-            it = OrderItem(order_id=order.id, description=d or "", quantity=qv, unit_price=pv)
-            if pid:
-                try:
-                    it.product_id = int(pid)
-                except ValueError:
-                    pass
-            db.session.add(it)
-
-        db.session.flush()
-        order.recompute_total()
+        # solo se escriben los ítems que cambiaron (ver line_items.py)
+        _save_items(order, _item_rows())
         db.session.commit()
 
         flash("Pedido actualizado.", "success")
         return redirect(url_for("orders.list_orders"))
 
-    return render_template("order_form.html", order=order, clients=clients, products=products)
+    return render_template("order_form.html", order=order)
 
 
 # -----------------------------
@@ -173,14 +156,67 @@ def client_orders(client_id):
     page = request.args.get("page", 1, type=int)
     per_page = 10
 
-    pagination = (Order.query
-                  .filter(Order.client_id == client.id)
-                  .order_by(Order.created_at.desc())
-                  .paginate(page=page, per_page=per_page))
+    query = Order.query.filter(Order.client_id == client.id)
+    if use_keyset():
+        pagination = keyset_paginate(query, Order.created_at, Order.id, per_page=per_page)
+    else:
+        pagination = query.order_by(Order.created_at.desc()).paginate(page=page, per_page=per_page)
 
     return render_template("orders_by_client.html", client=client, pagination=pagination)
 
 
+# -----------------------------
+# EXPORTAR PEDIDOS (con ítems)
+# -----------------------------
+ORDER_HEADER = ["ID", "Cliente", "Email", "Estado", "Total (Q)", "Pagado (Q)", "Saldo (Q)", "Notas", "Creado"]
+ORDER_ITEM_HEADER = ["Pedido", "Producto", "SKU", "Descripción", "Cant.", "P. Unitario (Q)", "Importe (Q)"]
+
+
+def _order_rows(status="", q=""):
+    stmt = (db.select(Order.id, Client.first_name, Client.last_name, Client.email,
+                      Order.status, Order.total, Order.paid_total, Order.balance,
+                      Order.notes, Order.created_at)
+            .join(Client, Client.id == Order.client_id)
+            .where(*_order_filters(status, q))
+            .order_by(Order.id))
+    for r in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        yield [r.id, f"{r.first_name} {r.last_name}", r.email, r.status,
+               float(r.total or 0), float(r.paid_total or 0), float(r.balance or 0),
+               r.notes or "", fmt_dt(r.created_at)]
+
+
+def _order_item_rows(status="", q=""):
+    order_ids = (db.select(Order.id)
+                 .join(Client, Client.id == Order.client_id)
+                 .where(*_order_filters(status, q)))
+    stmt = (db.select(OrderItem.order_id, Product.name, Product.sku, OrderItem.description,
+                      OrderItem.quantity, OrderItem.unit_price)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .where(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.order_id, OrderItem.id))
+    for r in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        qty = float(r.quantity or 0)
+        price = float(r.unit_price or 0)
+        yield [r.order_id, r.name or "", r.sku or "", r.description or "", qty, price, qty * price]
+
+
+def order_sheets(status="", q=""):
+    return [
+        ("Pedidos", ORDER_HEADER, _order_rows(status, q)),
+        ("Ítems", ORDER_ITEM_HEADER, _order_item_rows(status, q)),
+    ]
+
+
+@orders_bp.route("/orders/export")
+@login_required
+def export_orders():
+    status = (request.args.get("status") or "").strip()
+    q = (request.args.get("q") or "").strip()
+    if wants_async():
+        return enqueue_response("export_orders", {"status": status, "q": q})
+    return xlsx_response("pedidos.xlsx", order_sheets(status, q))
+
+
 # -----------------------------
 # FACTURA / COTIZACIÓN EN PDF
 # -----------------------------
@@ -188,6 +224,29 @@ def client_orders(client_id):
 @login_required
 def order_invoice_pdf(order_id):
     order = Order.query.get_or_404(order_id)
+    if wants_async():
+        return enqueue_response("order_pdf", {"order_id": order.id})
+    return pdf_cache.send_pdf(order_pdf_key(order), lambda: render_order_pdf(order),
+                              f"Pedido_{order.id}.pdf")
+
+
+# Subir al cambiar el diseño de render_order_pdf (invalida la caché de PDFs)
+ORDER_PDF_VERSION = 1
+
+
+def order_pdf_key(order):
+    """Hash de todo lo que muestra el PDF del pedido (clave de caché y ETag)."""
+    client = order.client
+    return pdf_cache.content_key("order", ORDER_PDF_VERSION, [
+        order.id, order.status, order.total, order.notes, order.created_at, order.updated_at,
+        [client.full_name(), client.email, client.phone, client.address],
+        [[it.id, it.description, it.quantity, it.unit_price] for it in order.items],
+        order.paid_total,
+    ])
+
+
+def render_order_pdf(order):
+    """Genera el PDF del pedido y devuelve los bytes (requiere app context)."""
     client = order.client
 
     buffer = BytesIO()
@@ -330,7 +389,4 @@ def order_invoice_pdf(order_id):
     c.setFont("Helvetica", 9)
     c.drawString(margin_x, y, "Gracias por su compra.")
     c.showPage(); c.save()
-    buffer.seek(0)
-
-    filename = f"Pedido_{order.id}.pdf"
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype="application/pdf")
\ No newline at end of file
+    return buffer.getvalue()
\ No newline at end of file
@@ -0,0 +1,142 @@
+# app/pagination.py
+"""Paginación por cursor (keyset) sobre (created_at, id).
+
+Alternativa opcional a ``paginate()``: no hace OFFSET ni COUNT(*) por request,
+así que la página 5000 cuesta lo mismo que la 1. Se activa con
+``PAGINATION_MODE=cursor`` en la config o con ``?mode=cursor`` / ``?after=`` /
+``?before=`` en la URL.
+"""
+import base64
+import time
+from datetime import datetime
+from threading import Lock
+
+from flask import current_app, request
+from sqlalchemy import and_, or_, select, String, type_coerce
+
+from .models import db, dt_param
+
+# Conteos cacheados por consulta: {clave: (expira_en, total)}
+_count_cache = {}
+_count_lock = Lock()
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Devuelve (created_at, id) o None si el cursor no es válido."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        ts, pk = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(ts), int(pk)
+    except Exception:
+        return None
+
+
+def use_keyset():
+    """True si este request debe paginar por cursor."""
+    args = request.args
+    if args.get("after") or args.get("before"):
+        return True
+    mode = args.get("mode") or current_app.config.get("PAGINATION_MODE", "offset")
+    return mode == "cursor"
+
+
+def cached_count(query):
+    """COUNT(*) de la consulta, cacheado por PAGINATION_COUNT_TTL segundos."""
+    ttl = current_app.config.get("PAGINATION_COUNT_TTL", 60)
+    compiled = query.statement.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    now = time.monotonic()
+    with _count_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+    total = query.order_by(None).count()
+    with _count_lock:
+        if len(_count_cache) > 1024:
+            _count_cache.clear()
+        _count_cache[key] = (now + ttl, total)
+    return total
+
+
+class KeysetPagination:
+    """Página obtenida por cursor. Expone lo que usan las plantillas."""
+
+    is_keyset = True
+
+    def __init__(self, items, per_page, has_prev, has_next, total):
+        self.items = items
+        self.per_page = per_page
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.total = total
+
+    @property
+    def prev_cursor(self):
+        if not (self.has_prev and self.items):
+            return None
+        first = self.items[0]
+        return encode_cursor(first.created_at, first.id)
+
+    @property
+    def next_cursor(self):
+        if not (self.has_next and self.items):
+            return None
+        last = self.items[-1]
+        return encode_cursor(last.created_at, last.id)
+
+
+def _cursor_ts(created_col, id_col, ts, pk):
+    """created_at del cursor tal como está guardado en la fila ``pk``.
+
+    En SQLite conviven '...SS' (CURRENT_TIMESTAMP) y '...SS.000000' (ORM) para
+    el mismo instante y el ORDER BY compara el texto; con el valor guardado,
+    < y = siguen exactamente ese orden. Si la fila ya no existe (o cambió),
+    se usa el formato del ORM.
+    """
+    if db.engine.dialect.name == "sqlite":
+        raw = db.session.scalar(select(type_coerce(created_col, String)).where(id_col == pk))
+        if raw and datetime.fromisoformat(raw) == ts:
+            return type_coerce(raw, String)
+    return dt_param(ts)
+
+
+def keyset_paginate(query, created_col, id_col, per_page=10):
+    """Pagina ``query`` en orden (created_at DESC, id DESC) leyendo el cursor
+    de ``?after=`` (siguiente página) o ``?before=`` (página anterior)."""
+    after = decode_cursor(request.args.get("after"))
+    before = decode_cursor(request.args.get("before")) if not after else None
+
+    base = query.order_by(None)
+    if after:
+        ts, pk = after
+        ts = _cursor_ts(created_col, id_col, ts, pk)
+        page_q = (base
+                  .filter(or_(created_col < ts, and_(created_col == ts, id_col < pk)))
+                  .order_by(created_col.desc(), id_col.desc()))
+    elif before:
+        ts, pk = before
+        ts = _cursor_ts(created_col, id_col, ts, pk)
+        page_q = (base
+                  .filter(or_(created_col > ts, and_(created_col == ts, id_col > pk)))
+                  .order_by(created_col.asc(), id_col.asc()))
+    else:
+        page_q = base.order_by(created_col.desc(), id_col.desc())
+
+    rows = page_q.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = bool(after), more
+
+    return KeysetPagination(rows, per_page, has_prev, has_next, cached_count(query))
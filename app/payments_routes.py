@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required
 from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
 from datetime import datetime
-from .models import db, Order, Payment
+from .models import db, Client, Order, Payment
+from .exports import YIELD_PER, fmt_dt, xlsx_response
+from .search import client_match
+from .jobs_routes import wants_async, enqueue_response
 
 payments_bp = Blueprint("payments", __name__)
 
@@ -10,7 +14,11 @@ payments_bp = Blueprint("payments", __name__)
 @payments_bp.route("/orders/<int:order_id>/payments", methods=["GET", "POST"])
 @login_required
 def order_payments(order_id):
-    order = Order.query.get_or_404(order_id)
+    # Cliente en la misma consulta; pagado/saldo son columnas del pedido
+    order = (Order.query
+             .options(joinedload(Order.client))
+             .filter(Order.id == order_id)
+             .first_or_404())
 
     if request.method == "POST":
         try:
@@ -47,4 +55,34 @@ def delete_payment(payment_id):
     db.session.delete(p)
     db.session.commit()
     flash("Pago eliminado.", "success")
-    return redirect(url_for("payments.order_payments", order_id=order_id))
\ No newline at end of file
+    return redirect(url_for("payments.order_payments", order_id=order_id))
+
+# Exportar pagos (?order_id= o ?q= por cliente)
+PAYMENT_HEADER = ["ID", "Pedido", "Cliente", "Fecha", "Monto (Q)", "Método", "Referencia", "Notas"]
+
+def _payment_rows(order_id=None, q=""):
+    stmt = (db.select(Payment.id, Payment.order_id, Client.first_name, Client.last_name,
+                      Payment.paid_at, Payment.amount, Payment.method, Payment.reference, Payment.notes)
+            .join(Order, Order.id == Payment.order_id)
+            .join(Client, Client.id == Order.client_id)
+            .order_by(Payment.id))
+    if order_id:
+        stmt = stmt.where(Payment.order_id == order_id)
+    if q:
+        stmt = stmt.where(client_match(q))
+    for r in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        yield [r.id, r.order_id, f"{r.first_name} {r.last_name}", fmt_dt(r.paid_at),
+               float(r.amount or 0), r.method, r.reference or "", r.notes or ""]
+
+def payment_sheets(order_id=None, q=""):
+    return [("Pagos", PAYMENT_HEADER, _payment_rows(order_id, q))]
+
+@payments_bp.route("/payments/export")
+@login_required
+def export_payments():
+    order_id = request.args.get("order_id", type=int)
+    q = (request.args.get("q") or "").strip()
+    if wants_async():
+        return enqueue_response("export_payments", {"order_id": order_id, "q": q})
+    name = f"pagos_pedido_{order_id}.xlsx" if order_id else "pagos.xlsx"
+    return xlsx_response(name, payment_sheets(order_id, q))
@@ -0,0 +1,129 @@
+# app/pdf_cache.py
+"""Caché en disco de PDFs (facturas y cotizaciones) direccionada por contenido.
+
+La clave es un hash de todo lo que el PDF muestra (ítems, pagos, cliente,
+``updated_at``, versión de la plantilla y logo), así que no hace falta
+invalidar: si el pedido cambia, cambia la clave y el archivo viejo termina
+saliendo por LRU. La misma clave sirve de ETag, de modo que un cliente que ya
+tiene la factura recibe un 304 sin leer el archivo.
+
+Los archivos viven en PDF_CACHE_DIR; el tamaño total se limita a
+PDF_CACHE_MAX_MB borrando primero los de acceso más antiguo (mtime, que se
+actualiza en cada acierto).
+"""
+import hashlib
+import json
+import os
+import tempfile
+from io import BytesIO
+
+from flask import current_app, request, send_file
+
+from .metrics import PDF_CACHE, timed_document
+
+PDF_MIMETYPE = "application/pdf"
+
+
+def cache_dir():
+    path = current_app.config.get("PDF_CACHE_DIR") or os.path.join(
+        tempfile.gettempdir(), "app_pdf_cache")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _logo_stamp():
+    logo = os.path.join(current_app.static_folder, "img", "logo.png")
+    try:
+        st = os.stat(logo)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def content_key(kind, version, parts):
+    """Hash estable de ``parts`` (listas/dicts/valores simples) + plantilla + logo."""
+    payload = json.dumps([kind, version, _logo_stamp(), parts],
+                         sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:40]
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _store(path, data):
+    # Escribir a un temporal y renombrar: otro worker nunca ve un PDF a medias
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def evict(max_bytes=None):
+    """Borra los PDFs usados hace más tiempo hasta quedar bajo ``max_bytes``.
+    Devuelve cuántos archivos borró."""
+    if max_bytes is None:
+        max_bytes = current_app.config.get("PDF_CACHE_MAX_MB", 200) * 1024 * 1024
+    entries, total = [], 0
+    for e in os.scandir(cache_dir()):
+        if not e.name.endswith(".pdf"):
+            continue
+        try:
+            st = e.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, e.path))
+        total += st.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def _render(render):
+    with timed_document("pdf") as doc:
+        data = render()
+        doc["bytes"] = len(data)
+    return data
+
+
+def get_or_render(key, render):
+    """Ruta del PDF cacheado para ``key``; si no existe, ``render()`` -> bytes."""
+    path = os.path.join(cache_dir(), f"{key}.pdf")
+    if _touch(path):
+        PDF_CACHE.labels("hit").inc()
+        return path
+    PDF_CACHE.labels("miss").inc()
+    _store(path, _render(render))
+    evict()
+    return path
+
+
+def send_pdf(key, render, download_name):
+    """Respuesta con ETag = ``key``; atiende If-None-Match sin generar nada."""
+    if key in request.if_none_match:
+        resp = current_app.response_class(status=304)
+    elif current_app.config.get("PDF_CACHE_ENABLED", True):
+        resp = send_file(get_or_render(key, render), as_attachment=True,
+                         download_name=download_name, mimetype=PDF_MIMETYPE,
+                         etag=False, conditional=False)
+    else:
+        resp = send_file(BytesIO(_render(render)), as_attachment=True,
+                         download_name=download_name, mimetype=PDF_MIMETYPE, etag=False)
+    resp.set_etag(key)
+    # Siempre revalidar: el mismo pedido puede cambiar en cualquier momento
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
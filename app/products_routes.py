@@ -1,9 +1,10 @@
 # app/products_routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, current_app
 from flask_login import login_required
 from sqlalchemy import asc, desc, func
 from sqlalchemy.exc import IntegrityError
 from .models import db, Product
+from .catalog import catalog
 
 products_bp = Blueprint("products", __name__)
 
@@ -105,24 +106,35 @@ def edit_product(pid):
     return render_template("product_form.html", product=p)
 
 
-# API simple para autocompletar/buscar
+def _catalog_response(payload, etag):
+    """JSON con ETag del catálogo; 304 si el navegador ya tiene esta versión."""
+    if etag in request.if_none_match:
+        resp = current_app.response_class(status=304)
+    else:
+        resp = jsonify(payload)
+    resp.set_etag(etag)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+# API para autocompletar/buscar (catálogo en memoria, ver catalog.py)
+# Sin ?q= devuelve el catálogo completo (lo usan los formularios de pedido/cotización)
 @products_bp.route("/api/products")
 @login_required
 def api_products():
     q = (request.args.get("q") or "").strip()
-    query = Product.query
-    if q:
-        like = f"%{q}%"
-        query = query.filter((Product.name.ilike(like)) | (Product.sku.ilike(like)))
-    res = [
-        {"id": p.id, "sku": p.sku, "name": p.name, "price": float(p.price)}
-        for p in query.order_by(asc(Product.name)).limit(50)
-    ]
-    return jsonify(res)
+    # negativo = 0 (un slice [:-n] quitaría los últimos en vez de limitar)
+    limit = max(request.args.get("limit", 50 if q else 0, type=int), 0)
+    cat = catalog.ensure_fresh()
+    return _catalog_response(cat.search(q, limit), cat.etag)
 
 
 @products_bp.route("/api/products/<int:pid>")
 @login_required
 def api_product_detail(pid):
-    p = Product.query.get_or_404(pid)
-    return jsonify({"id": p.id, "sku": p.sku, "name": p.name, "price": float(p.price)})
\ No newline at end of file
+    cat = catalog.ensure_fresh()
+    p = cat.by_id.get(pid)
+    if p is None:
+        abort(404)
+    return _catalog_response(p, cat.etag)
\ No newline at end of file
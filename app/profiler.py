@@ -0,0 +1,150 @@
+# app/profiler.py
+"""Perfilador de SQL por petición (opcional, PROFILER_ENABLED=True).
+
+Con eventos del engine de SQLAlchemy cuenta las consultas y el tiempo de BD
+de cada petición y agrega por endpoint. Si una misma sentencia (mismo SQL,
+distintos parámetros) se repite ``PROFILER_NPLUS1_THRESHOLD`` veces en una
+petición se reporta como posible N+1 (p. ej. ``o.client`` en un listado sin
+``contains_eager``). Cada respuesta lleva ``Server-Timing`` (db / app), que
+el navegador muestra en la pestaña de red.
+
+Las peticiones más lentas que ``PROFILER_SLOW_MS`` se guardan en un buffer
+circular de ``PROFILER_KEEP`` entradas, visible en /admin/profiler. Todo vive
+en memoria del worker.
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_SQL_SAMPLE = 300
+
+
+class RequestProfile:
+    __slots__ = ("started", "queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+
+
+class SQLProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.endpoints = {}
+        self.slow = deque()
+        self.started_at = time.time()
+
+    def init_app(self, app):
+        self.enabled = app.config.get("PROFILER_ENABLED", False)
+        self.slow_ms = app.config.get("PROFILER_SLOW_MS", 200)
+        self.threshold = app.config.get("PROFILER_NPLUS1_THRESHOLD", 5)
+        self.slow = deque(maxlen=app.config.get("PROFILER_KEEP", 50))
+        app.extensions["sql_profiler"] = self
+        if not self.enabled:
+            return
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # -----------------------------
+    # Hooks de Flask
+    # -----------------------------
+    def _start(self):
+        g._sql_profile = RequestProfile()
+
+    def _finish(self, response):
+        prof = g.pop("_sql_profile", None)
+        if prof is None:
+            return response
+        total_ms = (time.perf_counter() - prof.started) * 1000
+        db_ms = prof.db_seconds * 1000
+        repeated = [(sql, n) for sql, n in prof.statements.most_common() if n >= self.threshold]
+        endpoint = request.endpoint or "(sin endpoint)"
+
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={db_ms:.1f};desc="{prof.queries} consultas", app;dur={total_ms - db_ms:.1f}')
+        self.record(endpoint, request.method, request.full_path.rstrip("?"), response.status_code,
+                    total_ms, db_ms, prof.queries, repeated)
+        return response
+
+    # -----------------------------
+    # Agregados
+    # -----------------------------
+    def record(self, endpoint, method, path, status, total_ms, db_ms, queries, repeated):
+        with self._lock:
+            s = self.endpoints.get(endpoint)
+            if s is None:
+                s = self.endpoints[endpoint] = {
+                    "requests": 0, "queries": 0, "max_queries": 0,
+                    "total_ms": 0.0, "db_ms": 0.0, "max_ms": 0.0, "nplus1": 0,
+                }
+            s["requests"] += 1
+            s["queries"] += queries
+            s["max_queries"] = max(s["max_queries"], queries)
+            s["total_ms"] += total_ms
+            s["db_ms"] += db_ms
+            s["max_ms"] = max(s["max_ms"], total_ms)
+            s["nplus1"] += bool(repeated)
+            if total_ms >= self.slow_ms or repeated:
+                self.slow.append({
+                    "at": time.time(), "endpoint": endpoint, "method": method, "path": path,
+                    "status": status, "total_ms": total_ms, "db_ms": db_ms, "queries": queries,
+                    "repeated": [(sql[:_SQL_SAMPLE], n) for sql, n in repeated[:5]],
+                })
+
+    def snapshot(self):
+        """(endpoints ordenados por tiempo total, peticiones lentas de la más lenta a la menos)."""
+        with self._lock:
+            endpoints = sorted(((name, dict(s)) for name, s in self.endpoints.items()),
+                               key=lambda kv: kv[1]["total_ms"], reverse=True)
+            slow = sorted((dict(r) for r in self.slow), key=lambda r: r["total_ms"], reverse=True)
+        return endpoints, slow
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+            self.slow.clear()
+            self.started_at = time.time()
+
+    @property
+    def pid(self):
+        return os.getpid()
+
+
+profiler = SQLProfiler()
+
+
+# -----------------------------
+# Eventos del engine (todas las conexiones)
+# -----------------------------
+def _current():
+    return g.get("_sql_profile") if has_request_context() else None
+
+
+# El inicio va en el contexto de ejecución y no en ``conn.info``: si la
+# sentencia falla no hay after_cursor_execute, y lo guardado en la conexión
+# (que vuelve al pool) quedaría acumulándose.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current() is not None:
+        context._sql_profile_t0 = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    prof = _current()
+    t0 = getattr(context, "_sql_profile_t0", None)
+    if prof is None or t0 is None:
+        return
+    prof.db_seconds += time.perf_counter() - t0
+    prof.queries += 1
+    prof.statements[statement] += 1
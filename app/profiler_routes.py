@@ -0,0 +1,41 @@
+# app/profiler_routes.py
+from datetime import datetime
+
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app, abort, jsonify, request
+from flask_login import login_required, current_user
+
+from .db_engine import pool_stats
+from .profiler import profiler
+
+profiler_bp = Blueprint("profiler", __name__)
+
+
+def _require_admin():
+    # PROFILER_ADMINS vacío = cualquier usuario autenticado
+    admins = current_app.config.get("PROFILER_ADMINS", [])
+    if admins and current_user.email.lower() not in admins:
+        abort(404)
+
+
+@profiler_bp.route("/admin/profiler")
+@login_required
+def profiler_page():
+    _require_admin()
+    endpoints, slow = profiler.snapshot()
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"pid": profiler.pid, "enabled": profiler.enabled, "pool": pool_stats(),
+                        "endpoints": dict(endpoints), "slow": slow})
+    slow = [dict(r, at=datetime.fromtimestamp(r["at"])) for r in slow]
+    return render_template("admin_profiler.html", endpoints=endpoints, slow=slow,
+                           enabled=profiler.enabled, pid=profiler.pid, pool=pool_stats(),
+                           since=datetime.fromtimestamp(profiler.started_at),
+                           slow_ms=profiler.slow_ms, threshold=profiler.threshold)
+
+
+@profiler_bp.route("/admin/profiler/reset", methods=["POST"])
+@login_required
+def profiler_reset():
+    _require_admin()
+    profiler.reset()
+    flash("Estadísticas reiniciadas.", "success")
+    return redirect(url_for("profiler.profiler_page"))
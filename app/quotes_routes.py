@@ -1,16 +1,22 @@
 # app/quotes_routes.py
 from flask import (
     Blueprint, render_template, request, redirect, url_for, flash,
-    send_file, current_app
+    current_app
 )
 from flask_login import login_required
 from sqlalchemy import asc, desc
+from sqlalchemy.orm import contains_eager
 from datetime import datetime
 from io import BytesIO
 import os
-from decimal import Decimal
 
-from .models import db, Client, Product, Quote, QuoteItem, Order, OrderItem
+from .models import db, Client, Quote, QuoteItem, Order, OrderItem
+from .pagination import use_keyset, keyset_paginate
+from .search import client_match
+from .line_items import rows_from_form, sync_items
+from .exports import YIELD_PER, fmt_dt, xlsx_response
+from .jobs_routes import wants_async, enqueue_response
+from . import pdf_cache
 
 # PDF (ReportLab)
 from reportlab.lib.pagesizes import LETTER
@@ -26,26 +32,15 @@ quotes_bp = Blueprint("quotes", __name__)
 # ---------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------
-def _iter_items_from_form():
-    """Lee arrays del form sin perder filas, aunque vengan desalineados."""
-    descs  = request.form.getlist("item_description[]")
-    qtys   = request.form.getlist("item_qty[]")
-    prices = request.form.getlist("item_price[]")
-    prods  = request.form.getlist("item_product_id[]")
-    n = max(len(descs), len(qtys), len(prices), len(prods))
-    for i in range(n):
-        d   = (descs[i]  if i < len(descs)  else "").strip()
-        q   = (qtys[i]   if i < len(qtys)   else "0")
-        p   = (prices[i] if i < len(prices) else "0")
-        pid = (prods[i]  if i < len(prods)  else "")
-        yield d, q, p, pid
-
-def _valid_items_present():
-    """Retorna True si hay al menos un ítem con descripción no vacía."""
-    for d, q, p, pid in _iter_items_from_form():
-        if d:
-            return True
-    return False
+def _item_rows():
+    """Ítems del form con descripción (las filas sin descripción se ignoran)."""
+    return rows_from_form(skip=lambda r: not r["description"])
+
+def _save_items(quote, rows):
+    """Aplica los ítems al documento (solo lo que cambió) y recalcula total."""
+    quote.total, changed = sync_items(QuoteItem, "quote_id", quote.id, quote.items, rows)
+    if changed:
+        db.session.expire(quote, ["items"])
 
 def _parse_date_yyyy_mm_dd(s):
     if not s:
@@ -55,12 +50,14 @@ def _parse_date_yyyy_mm_dd(s):
     except ValueError:
         return None
 
-def _to_decimal(x):
-    """Convierte cualquier entrada a Decimal(2) de forma segura."""
-    try:
-        return Decimal(str(x)).quantize(Decimal("0.01"))
-    except Exception:
-        return Decimal("0.00")
+def _quote_filters(status, q):
+    """Criterios de ?status= y ?q= (requiere JOIN con Client)."""
+    criteria = []
+    if status:
+        criteria.append(Quote.status == status)
+    if q:
+        criteria.append(client_match(q))
+    return criteria
 
 # ---------------------------------------------------------
 # Listado de cotizaciones
@@ -73,34 +70,57 @@ def list_quotes():
     page   = request.args.get("page", 1, type=int)
     per_page = 10
 
-    query = Quote.query.join(Client)
-    if status:
-        query = query.filter(Quote.status == status)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(
-            (Client.first_name.ilike(like)) |
-            (Client.last_name.ilike(like)) |
-            (Client.email.ilike(like))
-        )
+    query = (Quote.query.join(Client)
+             .options(contains_eager(Quote.client))
+             .filter(*_quote_filters(status, q)))
 
-    pagination = (query
-                  .order_by(desc(Quote.created_at))
-                  .paginate(page=page, per_page=per_page))
+    if use_keyset():
+        pagination = keyset_paginate(query, Quote.created_at, Quote.id, per_page=per_page)
+    else:
+        pagination = (query
+                      .order_by(desc(Quote.created_at))
+                      .paginate(page=page, per_page=per_page))
 
     return render_template("quotes_list.html",
                            pagination=pagination,
                            q=q, status=status)
 
+# ---------------------------------------------------------
+# Exportar cotizaciones
+# ---------------------------------------------------------
+QUOTE_HEADER = ["ID", "Cliente", "Email", "Estado", "Vigencia", "Total (Q)", "Notas", "Creada"]
+
+def _quote_rows(status="", q=""):
+    stmt = (db.select(Quote.id, Client.first_name, Client.last_name, Client.email,
+                      Quote.status, Quote.valid_until, Quote.total, Quote.notes, Quote.created_at)
+            .join(Client, Client.id == Quote.client_id)
+            .where(*_quote_filters(status, q))
+            .order_by(Quote.id))
+    for r in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        yield [r.id, f"{r.first_name} {r.last_name}", r.email, r.status,
+               r.valid_until.isoformat() if r.valid_until else "",
+               float(r.total or 0), r.notes or "", fmt_dt(r.created_at)]
+
+def quote_sheets(status="", q=""):
+    return [("Cotizaciones", QUOTE_HEADER, _quote_rows(status, q))]
+
+@quotes_bp.route("/quotes/export")
+@login_required
+def export_quotes():
+    status = (request.args.get("status") or "").strip()
+    q      = (request.args.get("q") or "").strip()
+    if wants_async():
+        return enqueue_response("export_quotes", {"status": status, "q": q})
+    return xlsx_response("cotizaciones.xlsx", quote_sheets(status, q))
+
 # ---------------------------------------------------------
 # Crear cotización
 # ---------------------------------------------------------
 @quotes_bp.route("/quotes/new", methods=["GET", "POST"])
 @login_required
 def create_quote():
-    clients  = Client.query.filter_by(is_deleted=False).order_by(asc(Client.first_name)).all()
-    products = Product.query.order_by(Product.name.asc()).all()
     default_client_id = request.args.get("client_id", type=int)
+    selected_client = db.session.get(Client, default_client_id) if default_client_id else None
 
     if request.method == "POST":
         client_id   = request.form.get("client_id", type=int)
@@ -111,43 +131,27 @@ def create_quote():
         if not client_id:
             flash("El cliente es obligatorio.", "danger")
             return render_template("quote_form.html", quote=None,
-                                   clients=clients, products=products,
-                                   default_client_id=default_client_id)
+                                   selected_client=selected_client)
 
-        if not _valid_items_present():
+        rows = _item_rows()
+        if not rows:
             flash("Agrega al menos un ítem con descripción.", "warning")
             return render_template("quote_form.html", quote=None,
-                                   clients=clients, products=products,
-                                   default_client_id=default_client_id)
+                                   selected_client=db.session.get(Client, client_id))
 
         q = Quote(client_id=client_id, status=status, notes=notes, valid_until=valid_until)
         db.session.add(q)
         db.session.flush()  # conseguir q.id
 
-        # items
-        for d, qty, price, pid in _iter_items_from_form():
-            if not d:
-                continue
-            qv = _to_decimal(qty)
-            pv = _to_decimal(price)
-            it = QuoteItem(quote_id=q.id, description=d, quantity=qv, unit_price=pv)
-            if pid:
-                try:
-                    it.product_id = int(pid)
-                except ValueError:
-                    pass
-            db.session.add(it)
-
-        db.session.flush()
-        q.recompute_total()
+        # items (un solo INSERT en bloque)
+        _save_items(q, rows)
         db.session.commit()
 
         flash("Cotización creada.", "success")
         return redirect(url_for("quotes.list_quotes"))
 
     return render_template("quote_form.html",
-                           quote=None, clients=clients, products=products,
-                           default_client_id=default_client_id)
+                           quote=None, selected_client=selected_client)
 
 # ---------------------------------------------------------
 # Editar cotización
@@ -156,8 +160,6 @@ def create_quote():
 @login_required
 def edit_quote(quote_id):
     quote    = Quote.query.get_or_404(quote_id)
-    clients  = Client.query.filter_by(is_deleted=False).order_by(asc(Client.first_name)).all()
-    products = Product.query.order_by(Product.name.asc()).all()
 
     if request.method == "POST":
         quote.client_id   = request.form.get("client_id", type=int)
@@ -166,37 +168,21 @@ def edit_quote(quote_id):
         quote.valid_until = _parse_date_yyyy_mm_dd(request.form.get("valid_until"))
 
         # Validación: al menos un ítem
-        if not _valid_items_present():
+        rows = _item_rows()
+        if not rows:
             flash("Agrega al menos un ítem con descripción.", "warning")
             return render_template("quote_form.html",
-                                   quote=quote, clients=clients, products=products)
-
-        # sustituimos items actuales por los nuevos (simple + robusto)
-        for it in list(quote.items):
-            db.session.delete(it)
-
-        for d, qty, price, pid in _iter_items_from_form():
-            if not d:
-                continue
-            qv = _to_decimal(qty)
-            pv = _to_decimal(price)
-            it = QuoteItem(quote_id=quote.id, description=d, quantity=qv, unit_price=pv)
-            if pid:
-                try:
-                    it.product_id = int(pid)
-                except ValueError:
-                    pass
-            db.session.add(it)
-
-        db.session.flush()
-        quote.recompute_total()
+                                   quote=quote)
+
+        # solo se escriben los ítems que cambiaron (ver line_items.py)
+        _save_items(quote, rows)
         db.session.commit()
 
         flash("Cotización actualizada.", "success")
         return redirect(url_for("quotes.list_quotes"))
 
     return render_template("quote_form.html",
-                           quote=quote, clients=clients, products=products)
+                           quote=quote)
 
 # ---------------------------------------------------------
 # Eliminar cotización
@@ -258,6 +244,25 @@ def quote_to_order(quote_id):
 @login_required
 def quote_pdf(quote_id):
     q = Quote.query.get_or_404(quote_id)
+    if wants_async():
+        return enqueue_response("quote_pdf", {"quote_id": q.id})
+    return pdf_cache.send_pdf(quote_pdf_key(q), lambda: render_quote_pdf(q),
+                              f"cotizacion_{q.id}.pdf")
+
+# Subir al cambiar el diseño de render_quote_pdf (invalida la caché de PDFs)
+QUOTE_PDF_VERSION = 1
+
+def quote_pdf_key(q):
+    """Hash de todo lo que muestra el PDF de la cotización (clave de caché y ETag)."""
+    client = q.client
+    return pdf_cache.content_key("quote", QUOTE_PDF_VERSION, [
+        q.id, q.total, q.notes, q.valid_until, q.created_at, q.updated_at,
+        [client.full_name(), client.email, client.phone, client.address],
+        [[it.id, it.description, it.quantity, it.unit_price] for it in q.items],
+    ])
+
+def render_quote_pdf(q):
+    """Genera el PDF de la cotización y devuelve los bytes (requiere app context)."""
     client = q.client
 
     buffer = BytesIO()
@@ -403,7 +408,4 @@ def quote_pdf(quote_id):
     c.setFont("Helvetica", 9)
     c.drawString(margin_x, y, "Gracias por su preferencia. Esta cotización no constituye factura.")
     c.showPage(); c.save()
-    buffer.seek(0)
-
-    filename = f"cotizacion_{q.id}.pdf"
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype="application/pdf")
\ No newline at end of file
+    return buffer.getvalue()
\ No newline at end of file
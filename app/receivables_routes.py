@@ -0,0 +1,178 @@
+# app/receivables_routes.py
+"""Antigüedad de saldos (cuentas por cobrar) por cliente.
+
+GET /receivables            página HTML (paginada por cliente)
+GET /api/receivables        lo mismo en JSON
+GET /receivables/export     XLSX con todos los clientes (admite ?async=1)
+
+Los tramos 0-30 / 31-60 / 61-90 / 90+ se calculan por días desde la
+creación del pedido hasta ``as_of`` (hoy por defecto) con un solo GROUP BY:
+
+- a hoy, sobre ``Order.balance`` (los pagos ya están sumados, ver
+  balances.py); ``ix_orders_open_balance`` cubre la consulta, así que solo
+  se leen del índice los pedidos con saldo;
+- a una fecha pasada, con ``total`` menos los pagos con ``paid_at`` hasta
+  ese día (el estado del pedido es el actual).
+
+El resultado por cliente se calcula una vez y queda en la caché compartida
+(etiqueta "receivables", se invalida al escribir pedidos, pagos o
+clientes); las páginas, los totales y el XLSX salen de esa lista.
+"""
+import math
+from datetime import date, timedelta
+
+from flask import Blueprint, current_app, render_template, request, jsonify
+from flask_login import login_required
+from sqlalchemy import case, func, type_coerce
+
+from .cache import cache
+from .exports import xlsx_response
+from .jobs_routes import wants_async, enqueue_response
+from .models import db, Client, Order, Payment
+
+receivables_bp = Blueprint("receivables", __name__)
+
+BUCKETS = ("0-30", "31-60", "61-90", "90+")
+PER_PAGE = 25
+
+
+def _bucket_columns(as_of, amount):
+    """SUM(amount) por tramo: límites como fecha (en SQLite compara texto)."""
+    def since(days):
+        return Order.created_at >= type_coerce(as_of - timedelta(days=days), db.Date)
+
+    return [
+        func.coalesce(func.sum(case((since(30), amount), else_=0)), 0).label("b0_30"),
+        func.coalesce(func.sum(case((since(30), 0), (since(60), amount), else_=0)), 0).label("b31_60"),
+        func.coalesce(func.sum(case((since(60), 0), (since(90), amount), else_=0)), 0).label("b61_90"),
+        func.coalesce(func.sum(case((since(90), 0), else_=amount)), 0).label("b90"),
+        func.coalesce(func.sum(amount), 0).label("total"),
+    ]
+
+
+def aging_statement(as_of):
+    """Una fila por cliente con saldo: tramos, total, nº de pedidos y el más antiguo."""
+    cutoff = type_coerce(as_of + timedelta(days=1), db.Date)
+    if as_of >= date.today():
+        amount, source, open_ = Order.balance, Order, Order.balance > 0
+    else:
+        paid = (db.select(Payment.order_id, func.sum(Payment.amount).label("paid"))
+                .where(Payment.paid_at < cutoff)
+                .group_by(Payment.order_id)
+                .subquery())
+        amount = Order.total - func.coalesce(paid.c.paid, 0)
+        source = db.outerjoin(Order, paid, paid.c.order_id == Order.id)
+        # Redondeo a centavos: SQLite guarda NUMERIC como REAL y la resta no es exacta
+        open_ = func.round(amount, 2) > 0
+    # "+ 0": sin esto SQLite recorre entero ix_orders_client_created (ya viene
+    # agrupado) en vez de leer solo los pedidos con saldo de ix_orders_open_balance
+    client_id = Order.client_id + 0
+    per_client = (
+        db.select(client_id.label("client_id"), *_bucket_columns(as_of, amount),
+                  func.count(Order.id).label("orders"),
+                  func.min(Order.created_at).label("oldest"))
+        .select_from(source)
+        .where(open_, Order.status != "cancelado", Order.created_at < cutoff)
+        .group_by(client_id)
+        .subquery()
+    )
+    return (
+        db.select(Client.id, Client.first_name, Client.last_name, Client.email, per_client)
+        .join(per_client, per_client.c.client_id == Client.id)
+    )
+
+
+def _client_json(r):
+    return {
+        "client_id": r.id,
+        "name": f"{r.first_name} {r.last_name}",
+        "email": r.email,
+        "0-30": round(float(r.b0_30), 2), "31-60": round(float(r.b31_60), 2),
+        "61-90": round(float(r.b61_90), 2), "90+": round(float(r.b90), 2),
+        "total": round(float(r.total), 2),
+        "orders": r.orders,
+        "oldest": r.oldest.isoformat() if hasattr(r.oldest, "isoformat") else r.oldest,
+    }
+
+
+def aging(as_of):
+    """Lista de clientes (dicts de ``_client_json``) de mayor a menor saldo, cacheada."""
+    def compute():
+        rows = [_client_json(r) for r in db.session.execute(aging_statement(as_of))]
+        rows.sort(key=lambda c: (-c["total"], c["client_id"]))
+        return rows
+
+    return cache.get_or_set(f"receivables:{as_of.isoformat()}", compute,
+                            ttl=current_app.config.get("RECEIVABLES_CACHE_TTL", 300),
+                            tag="receivables")
+
+
+def aging_totals(clients):
+    totals = {b: round(sum(c[b] for c in clients), 2) for b in (*BUCKETS, "total")}
+    totals["clients"] = len(clients)
+    return totals
+
+
+def _as_of():
+    try:
+        return date.fromisoformat(request.args.get("as_of", ""))
+    except ValueError:
+        return date.today()
+
+
+def _page(as_of):
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", PER_PAGE, type=int), 1), 200)
+    clients = aging(as_of)
+    pages = max(math.ceil(len(clients) / per_page), 1)
+    start = (page - 1) * per_page
+    return page, per_page, pages, aging_totals(clients), clients[start:start + per_page]
+
+
+@receivables_bp.route("/receivables")
+@login_required
+def receivables():
+    as_of = _as_of()
+    page, per_page, pages, totals, rows = _page(as_of)
+    return render_template("receivables.html", as_of=as_of, page=page, pages=pages,
+                           totals=totals, clients=rows,
+                           buckets=BUCKETS)
+
+
+@receivables_bp.route("/api/receivables")
+@login_required
+def api_receivables():
+    as_of = _as_of()
+    page, per_page, pages, totals, rows = _page(as_of)
+    return jsonify({
+        "as_of": as_of.isoformat(),
+        "page": page, "per_page": per_page, "pages": pages,
+        "totals": totals,
+        "clients": rows,
+    })
+
+
+# -----------------------------
+# Exportar
+# -----------------------------
+RECEIVABLE_HEADER = ["Cliente ID", "Cliente", "Email", "0-30 (Q)", "31-60 (Q)", "61-90 (Q)",
+                     "90+ (Q)", "Total (Q)", "Pedidos", "Más antiguo"]
+
+
+def _receivable_rows(as_of):
+    for c in aging(as_of):
+        yield [c["client_id"], c["name"], c["email"], c["0-30"], c["31-60"], c["61-90"],
+               c["90+"], c["total"], c["orders"], str(c["oldest"])[:10]]
+
+
+def receivable_sheets(as_of):
+    return [("Cuentas por cobrar", RECEIVABLE_HEADER, _receivable_rows(as_of))]
+
+
+@receivables_bp.route("/receivables/export")
+@login_required
+def export_receivables():
+    as_of = _as_of()
+    if wants_async():
+        return enqueue_response("export_receivables", {"as_of": as_of.isoformat()})
+    return xlsx_response(f"cuentas_por_cobrar_{as_of.isoformat()}.xlsx", receivable_sheets(as_of))
@@ -0,0 +1,168 @@
+# app/recurrence.py
+"""Seguimientos recurrentes (diario / semanal / mensual).
+
+Una serie es una sola fila de ``followups`` con ``recur_freq``: ``when_at``
+es la primera ocurrencia y ``series_end`` la última (``OPEN_END`` si no
+tiene fin). Las ocurrencias no se guardan: ``occurrences`` las calcula solo
+dentro del rango pedido, saltando directo a la primera que cae en él, así
+que una serie de años cuesta lo mismo que una de semanas.
+
+``series_end`` junto con ``when_at`` forman el intervalo de la serie
+(índice ``ix_followups_series``): una serie cruza el rango [desde, hasta)
+si ``series_end >= desde`` y ``when_at < hasta``.
+
+Marcar hecha una ocurrencia la materializa: se crea una fila normal con
+``parent_id`` = serie y esa fecha pasa a ``recur_exdates`` (excepciones),
+que también sirve para omitir ocurrencias sueltas.
+"""
+import calendar
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect as sa_inspect, text
+
+from .models import db, FollowUp, FollowUpDeletion
+
+FREQUENCIES = {"daily": "Diario", "weekly": "Semanal", "monthly": "Mensual"}
+OPEN_END = datetime(9999, 12, 31)
+EXDATE_FMT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _add_months(dt, months):
+    """``dt`` + ``months`` meses; el día 31 cae en el último día de los meses cortos."""
+    y, m = divmod(dt.month - 1 + months, 12)
+    year, month = dt.year + y, m + 1
+    return dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))
+
+
+def _nth(dtstart, freq, interval, k):
+    if freq == "monthly":
+        return _add_months(dtstart, k * interval)
+    return dtstart + timedelta(days=k * interval * (7 if freq == "weekly" else 1))
+
+
+def _first_index(dtstart, freq, interval, start):
+    """Índice de la primera ocurrencia >= ``start`` (sin recorrer las anteriores)."""
+    if start <= dtstart:
+        return 0
+    if freq == "monthly":
+        months = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+        k = max(months // interval - 1, 0)
+    else:
+        step = timedelta(days=interval * (7 if freq == "weekly" else 1))
+        k = max((start - dtstart) // step - 1, 0)
+    while _nth(dtstart, freq, interval, k) < start:
+        k += 1
+    return k
+
+
+def parse_exdates(raw):
+    return {datetime.strptime(s, EXDATE_FMT) for s in (raw or "").split()}
+
+
+def format_exdates(dates):
+    return " ".join(sorted(d.strftime(EXDATE_FMT) for d in dates)) or None
+
+
+def occurrences(dtstart, freq, interval, until, count, exdates, start, end):
+    """Ocurrencias de la serie dentro de [start, end), sin las excepciones."""
+    interval = max(interval or 1, 1)
+    skip = parse_exdates(exdates) if isinstance(exdates, str) or exdates is None else exdates
+    k = _first_index(dtstart, freq, interval, start)
+    out = []
+    while count is None or k < count:
+        occ = _nth(dtstart, freq, interval, k)
+        if occ >= end or (until is not None and occ > until):
+            break
+        if occ not in skip:
+            out.append(occ)
+        k += 1
+    return out
+
+
+def series_end(dtstart, freq, interval, until, count):
+    """Última ocurrencia posible (``OPEN_END`` si la serie no termina)."""
+    if freq is None:
+        return None
+    interval = max(interval or 1, 1)
+    last = OPEN_END
+    if count:
+        last = _nth(dtstart, freq, interval, count - 1)
+    if until is not None:
+        last = min(last, until)
+    return max(last, dtstart)
+
+
+def set_rule(f, freq, interval=1, until=None, count=None, exdates=None):
+    """Aplica (o quita, con ``freq=None``) la regla de recurrencia a ``f``."""
+    if freq not in FREQUENCIES:
+        freq = None
+    f.recur_freq = freq
+    f.recur_interval = max(interval or 1, 1) if freq else None
+    f.recur_until = until if freq else None
+    f.recur_count = count if freq and count else None
+    f.recur_exdates = format_exdates(exdates) if freq and exdates else None
+    f.series_end = series_end(f.when_at, freq, f.recur_interval, f.recur_until, f.recur_count)
+
+
+def materialize(series, occurrence, **values):
+    """Crea la fila de una sola ocurrencia (p. ej. al marcarla hecha) y la excluye de la serie."""
+    child = FollowUp(parent_id=series.id, client_id=series.client_id, order_id=series.order_id,
+                     kind=series.kind, title=series.title, notes=series.notes,
+                     when_at=occurrence, **values)
+    skip(series, occurrence)
+    db.session.add(child)
+    return child
+
+
+def skip(series, occurrence):
+    """Omite una ocurrencia de la serie."""
+    dates = parse_exdates(series.recur_exdates)
+    dates.add(occurrence)
+    series.recur_exdates = format_exdates(dates)
+
+
+def is_occurrence(series, occurrence):
+    return bool(series.recur_freq) and occurrence in occurrences(
+        series.when_at, series.recur_freq, series.recur_interval, series.recur_until,
+        series.recur_count, series.recur_exdates, occurrence, occurrence + timedelta(seconds=1))
+
+
+# -----------------------------
+# Bases existentes
+# -----------------------------
+_COLUMNS = {
+    "followups": [
+        ("recur_freq", "VARCHAR(10)"),
+        ("recur_interval", "INTEGER"),
+        ("recur_until", "DATETIME"),
+        ("recur_count", "INTEGER"),
+        ("recur_exdates", "TEXT"),
+        ("series_end", "DATETIME"),
+        ("parent_id", "INTEGER"),
+    ],
+    "followup_deletions": [
+        ("series_end", "DATETIME"),
+    ],
+}
+
+
+def install():
+    """Agrega las columnas de recurrencia (y su índice) a tablas ya existentes."""
+    insp = sa_inspect(db.engine)
+    tables = set(insp.get_table_names())
+    added = []
+    with db.engine.begin() as conn:
+        for table, columns in _COLUMNS.items():
+            if table not in tables:
+                continue
+            have = {c["name"] for c in insp.get_columns(table)}
+            for name, ddl in columns:
+                if name not in have:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    added.append(f"{table}.{name}")
+        for model in (FollowUp, FollowUpDeletion):
+            if model.__tablename__ not in tables:   # la crea create_all, con sus índices
+                continue
+            for index in model.__table__.indexes:
+                index.create(conn, checkfirst=True)
+    return added
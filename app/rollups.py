@@ -0,0 +1,259 @@
+# app/rollups.py
+"""Rollups diarios de ingresos para el dashboard.
+
+Cada flush que toca Order / OrderItem / Payment anota los días afectados en
+``session.info``; después del commit se recalculan solo esos días (una
+consulta acotada por rango de fecha por tabla) en una transacción nueva.
+
+No se hace dentro de la transacción que escribe: en MySQL (REPEATABLE READ)
+dos commits concurrentes del mismo día no verían cada uno la fila del otro
+y el último dejaría un total viejo. La transacción nueva primero bloquea las
+filas de ``daily_revenue`` de esos días y recién después lee, así que cada recálculo ve todo lo confirmado hasta ese momento y los del
+mismo día van uno detrás de otro.
+``flask rollups-rebuild`` regenera todo desde cero.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import click
+from flask import current_app
+from sqlalchemy import case, delete, event, func, insert, select, type_coerce, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import attributes
+
+from flask_sqlalchemy.session import Session
+
+from .models import (
+    db, Order, OrderItem, Payment,
+    DailyRevenue, DailyClientRevenue, DailyProductSales,
+)
+
+_INFO_KEY = "rollup_days"
+
+
+def as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    # SQLite devuelve func.date(...) como texto
+    return date.fromisoformat(str(value)[:10])
+
+
+def _values(obj, attr):
+    """Valores actual y anterior (si cambió) de un atributo ya cargado."""
+    state = sa_inspect(obj)
+    if attr not in state.dict:
+        return None
+    hist = attributes.get_history(obj, attr)
+    return list(hist.added or ()) + list(hist.unchanged or ()) + list(hist.deleted or ())
+
+
+def mark_days(session, days):
+    """Marca días para recalcular al próximo commit (para escrituras Core/bulk)."""
+    session.info.setdefault(_INFO_KEY, set()).update(d for d in days if d)
+
+
+# -----------------------------
+# Recolección de días afectados
+# -----------------------------
+@event.listens_for(Session, "after_flush")
+def _collect_days(session, flush_context):
+    days = set()
+    order_ids = set()    # pedidos cuyo created_at hay que leer de la BD
+    payment_ids = set()  # pagos cuyo paid_at vino del server_default
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Order):
+            vals = _values(obj, "created_at")
+            if vals is None:
+                order_ids.add(obj.id)
+            else:
+                days.update(as_date(v) for v in vals)
+        elif isinstance(obj, OrderItem):
+            vals = _values(obj, "order_id") or [obj.order_id]
+            order_ids.update(v for v in vals if v)
+        elif isinstance(obj, Payment):
+            vals = _values(obj, "paid_at")
+            if vals is None:
+                payment_ids.add(obj.id)
+            else:
+                days.update(as_date(v) for v in vals)
+
+    if not (days or order_ids or payment_ids):
+        return
+
+    conn = session.connection()
+    order_ids.discard(None)
+    payment_ids.discard(None)
+    if order_ids:
+        rows = conn.execute(select(Order.created_at).where(Order.id.in_(order_ids)))
+        days.update(as_date(r[0]) for r in rows)
+    if payment_ids:
+        rows = conn.execute(select(Payment.paid_at).where(Payment.id.in_(payment_ids)))
+        days.update(as_date(r[0]) for r in rows)
+
+    mark_days(session, days)
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_days(session):
+    # before_commit corre antes del flush final del commit: forzarlo aquí
+    # para que after_flush anote también esos cambios
+    session.flush()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_days(session):
+    days = session.info.pop(_INFO_KEY, set())
+    if not days:
+        return
+    try:
+        with session.get_bind().begin() as conn:
+            refresh_days(conn, days)
+    except Exception:
+        # los datos ya se confirmaron; el rollup se corrige con rollups-rebuild
+        current_app.logger.exception("No se pudieron recalcular los rollups de %s", sorted(days))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_days(session, previous_transaction):
+    session.info.pop(_INFO_KEY, None)
+
+
+# -----------------------------
+# Recalcular días
+# -----------------------------
+def _day_range(col, day):
+    # type_coerce a Date: en SQLite compara 'YYYY-MM-DD' como texto, sin
+    # depender de si created_at guardó microsegundos o no
+    return (col >= type_coerce(day, db.Date)) & (col < type_coerce(day + timedelta(days=1), db.Date))
+
+
+def _lock_day(conn, day):
+    """Bloquea (creándola si falta) la fila de ``daily_revenue`` del día.
+
+    Es un UPDATE sin cambios y no un SELECT: en MySQL bloquea la fila igual
+    que FOR UPDATE, y en SQLite abre la transacción de escritura, así que las
+    lecturas siguientes ya no pueden quedar atrás de otro commit.
+    """
+    touch = update(DailyRevenue).where(DailyRevenue.day == day).values(day=DailyRevenue.day)
+    if conn.execute(touch).rowcount:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(DailyRevenue).values(
+                day=day, revenue=0, orders_count=0, pending_count=0, paid=0))
+    except IntegrityError:
+        conn.execute(touch)   # la creó otro recálculo: esperar a que termine
+
+
+def refresh_days(conn, days):
+    """Recalcula las filas de rollup de ``days`` desde las tablas base."""
+    days = sorted(d for d in days if d)
+    # Todos los bloqueos antes de la primera lectura (en orden: sin interbloqueos)
+    for day in days:
+        _lock_day(conn, day)
+    for day in days:
+        in_day = _day_range(Order.created_at, day)
+
+        revenue, orders_count, pending = conn.execute(
+            select(
+                func.coalesce(func.sum(Order.total), 0),
+                func.count(Order.id),
+                func.coalesce(func.sum(case((Order.status == "pendiente", 1), else_=0)), 0),
+            ).where(in_day)
+        ).one()
+        paid = conn.execute(
+            select(func.coalesce(func.sum(Payment.amount), 0))
+            .where(_day_range(Payment.paid_at, day))
+        ).scalar()
+
+        if orders_count or paid:
+            conn.execute(update(DailyRevenue).where(DailyRevenue.day == day).values(
+                revenue=revenue, orders_count=orders_count, pending_count=pending, paid=paid,
+            ))
+        else:
+            conn.execute(delete(DailyRevenue).where(DailyRevenue.day == day))
+
+        conn.execute(delete(DailyClientRevenue).where(DailyClientRevenue.day == day))
+        conn.execute(insert(DailyClientRevenue).from_select(
+            ["day", "client_id", "revenue", "orders_count"],
+            select(
+                type_coerce(day, db.Date),
+                Order.client_id,
+                func.coalesce(func.sum(Order.total), 0),
+                func.count(Order.id),
+            ).where(in_day).group_by(Order.client_id)
+        ))
+
+        conn.execute(delete(DailyProductSales).where(DailyProductSales.day == day))
+        conn.execute(insert(DailyProductSales).from_select(
+            ["day", "product_id", "qty", "revenue"],
+            select(
+                type_coerce(day, db.Date),
+                OrderItem.product_id,
+                func.coalesce(func.sum(OrderItem.quantity), 0),
+                func.coalesce(func.sum(OrderItem.quantity * OrderItem.unit_price), 0),
+            ).join(Order, Order.id == OrderItem.order_id)
+             .where(in_day).group_by(OrderItem.product_id)
+        ))
+
+
+def rebuild_all():
+    """Borra y regenera todos los rollups. Devuelve el nº de días."""
+    with db.engine.begin() as conn:
+        conn.execute(delete(DailyRevenue))
+        conn.execute(delete(DailyClientRevenue))
+        conn.execute(delete(DailyProductSales))
+
+        order_day = func.date(Order.created_at)
+        per_day = {}
+        for d, revenue, n, pending in conn.execute(
+            select(
+                order_day,
+                func.coalesce(func.sum(Order.total), 0),
+                func.count(Order.id),
+                func.coalesce(func.sum(case((Order.status == "pendiente", 1), else_=0)), 0),
+            ).group_by(order_day)
+        ):
+            per_day[as_date(d)] = dict(day=as_date(d), revenue=revenue, orders_count=n,
+                                        pending_count=pending, paid=Decimal("0.00"))
+
+        pay_day = func.date(Payment.paid_at)
+        for d, paid in conn.execute(
+            select(pay_day, func.coalesce(func.sum(Payment.amount), 0)).group_by(pay_day)
+        ):
+            row = per_day.setdefault(as_date(d), dict(day=as_date(d), revenue=0, orders_count=0,
+                                                       pending_count=0, paid=0))
+            row["paid"] = paid
+
+        if per_day:
+            conn.execute(insert(DailyRevenue), list(per_day.values()))
+
+        conn.execute(insert(DailyClientRevenue).from_select(
+            ["day", "client_id", "revenue", "orders_count"],
+            select(order_day, Order.client_id,
+                   func.coalesce(func.sum(Order.total), 0), func.count(Order.id))
+            .group_by(order_day, Order.client_id)
+        ))
+        conn.execute(insert(DailyProductSales).from_select(
+            ["day", "product_id", "qty", "revenue"],
+            select(order_day, OrderItem.product_id,
+                   func.coalesce(func.sum(OrderItem.quantity), 0),
+                   func.coalesce(func.sum(OrderItem.quantity * OrderItem.unit_price), 0))
+            .join(Order, Order.id == OrderItem.order_id)
+            .group_by(order_day, OrderItem.product_id)
+        ))
+    return len(per_day)
+
+
+@click.command("rollups-rebuild")
+def rollups_rebuild_command():
+    """Regenera desde cero los rollups del dashboard."""
+    db.create_all()
+    n = rebuild_all()
+    click.echo(f"✅ Rollups regenerados ({n} días).")
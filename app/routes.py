@@ -1,9 +1,12 @@
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required
 from .models import db, Client
-import io
-from openpyxl import Workbook
+from .pagination import use_keyset, keyset_paginate
+from .search import client_match
+from .exports import YIELD_PER, fmt_dt, xlsx_response
+from .jobs_routes import wants_async, enqueue_response
+from .client_index import client_index
 
 bp = Blueprint("main", __name__)
 
@@ -20,16 +23,12 @@ def list_clients():
 
     query = Client.query.filter_by(is_deleted=False)
     if q:
-        like = f"%{q}%"
-        query = query.filter(
-            (Client.first_name.ilike(like)) |
-            (Client.last_name.ilike(like)) |
-            (Client.email.ilike(like)) |
-            (Client.phone.ilike(like)) |
-            (Client.company.ilike(like))
-        )
+        query = query.filter(client_match(q))
 
-    pagination = query.order_by(Client.created_at.desc()).paginate(page=page, per_page=per_page)
+    if use_keyset():
+        pagination = keyset_paginate(query, Client.created_at, Client.id, per_page=per_page)
+    else:
+        pagination = query.order_by(Client.created_at.desc()).paginate(page=page, per_page=per_page)
     return render_template("clients_list.html", pagination=pagination, q=q)
 
 @bp.route("/clients/new", methods=["GET", "POST"])
@@ -83,6 +82,14 @@ def edit_client(client_id):
 
     return render_template("client_form.html", client=client)
 
+# Autocompletado de clientes para formularios (índice en memoria)
+@bp.route("/api/clients/lookup")
+@login_required
+def api_client_lookup():
+    q = (request.args.get("q") or "").strip()
+    limit = min(request.args.get("limit", 20, type=int), 50)
+    return jsonify(client_index.search(q, limit))
+
 @bp.route("/clients/<int:client_id>/delete", methods=["POST"])
 @login_required
 def delete_client(client_id):
@@ -92,18 +99,28 @@ def delete_client(client_id):
     flash("Cliente desactivado (borrado lógico).", "success")
     return redirect(url_for("main.list_clients"))
 
+def _client_rows(q=""):
+    """Filas de clientes activos para exportar, leídas por lotes."""
+    stmt = (db.select(Client.id, Client.first_name, Client.last_name, Client.email,
+                      Client.phone, Client.company, Client.address, Client.notes,
+                      Client.created_at)
+            .where(Client.is_deleted == False)
+            .order_by(Client.id))
+    if q:
+        stmt = stmt.where(client_match(q))
+    for r in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        yield [r.id, r.first_name, r.last_name, r.email, r.phone or "", r.company or "",
+               r.address or "", r.notes or "", fmt_dt(r.created_at)]
+
+CLIENT_HEADER = ["ID", "Nombre", "Apellido", "Email", "Teléfono", "Empresa", "Dirección", "Notas", "Creado"]
+
+def client_sheets(q=""):
+    return [("Clientes", CLIENT_HEADER, _client_rows(q))]
+
 @bp.route("/clients/export")
 @login_required
 def export_clients():
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Clientes"
-    ws.append(["ID", "Nombre", "Apellido", "Email", "Teléfono", "Empresa", "Dirección", "Notas", "Creado"])
-
-    for c in Client.query.filter_by(is_deleted=False).order_by(Client.id):
-        ws.append([c.id, c.first_name, c.last_name, c.email, c.phone or "", c.company or "", c.address or "", c.notes or "", c.created_at.strftime("%Y-%m-%d %H:%M:%S")])
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return send_file(buf, as_attachment=True, download_name="clientes.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    q = request.args.get("q", "").strip()
+    if wants_async():
+        return enqueue_response("export_clients", {"q": q})
+    return xlsx_response("clientes.xlsx", client_sheets(q))
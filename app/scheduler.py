@@ -0,0 +1,231 @@
+# app/scheduler.py
+"""Avisos de seguimientos vencidos (``flask followups-scheduler``).
+
+Un proceso aparte mantiene en memoria un montículo (heapq) con los
+vencimientos ``(when_at, id)`` de una ventana de SCHEDULER_WINDOW_MINUTES
+hacia adelante. La ventana se carga por lotes de SCHEDULER_BATCH filas con
+``ix_followups_when_at`` (y las series con ``ix_followups_series``, expandidas
+solo dentro de la ventana), así que cientos de miles de seguimientos
+pendientes no se leen nunca de golpe ni se recorre la tabla.
+
+Cuando vence un elemento se escribe en ``notifications`` (único por
+seguimiento y fecha: reiniciar el scheduler o correr dos no duplica avisos)
+y la interfaz los consulta con un GET condicional (notifications_routes.py).
+
+Las altas y ediciones se detectan con la versión compartida "followups"
+(``VERSIONS_BY_MODEL`` en cache.py): al cambiar, se leen solo las filas con
+``updated_at`` posterior a la última vista (``ix_followups_updated_at``) y los
+borrados de ``followup_deletions``. Cada SCHEDULER_RESCAN_SECONDS se revisa
+igual, por si alguien escribió sin pasar por la sesión.
+"""
+import heapq
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from . import recurrence
+from .cache import cache
+from .models import db, dt_since, FollowUp, FollowUpDeletion, Notification
+
+_COLUMNS = (FollowUp.id, FollowUp.client_id, FollowUp.kind, FollowUp.title, FollowUp.done,
+            FollowUp.when_at, FollowUp.recur_freq, FollowUp.recur_interval, FollowUp.recur_until,
+            FollowUp.recur_count, FollowUp.recur_exdates)
+
+
+def _dues(row, start, end):
+    """Vencimientos de la fila dentro de [start, end)."""
+    if row.done:
+        return []
+    if row.recur_freq:
+        return recurrence.occurrences(row.when_at, row.recur_freq, row.recur_interval,
+                                      row.recur_until, row.recur_count, row.recur_exdates, start, end)
+    return [row.when_at] if start <= row.when_at < end else []
+
+
+class DueQueue:
+    def __init__(self, window_minutes=60, batch=5000, catchup_minutes=60):
+        self.window = timedelta(minutes=window_minutes)
+        self.batch = batch
+        self.catchup = timedelta(minutes=catchup_minutes)
+        self.heap = []        # (vence, id); las entradas viejas se descartan al sacarlas
+        self.current = {}     # id -> {vencimientos vigentes}
+        self.info = {}        # id -> (client_id, kind, title, es_serie)
+        self.floor = None     # lo anterior ya no se avisa
+        self.loaded_until = None
+        self.since = None     # marca para buscar cambios
+
+    # -----------------------------
+    # Carga por ventanas
+    # -----------------------------
+    def start(self, now):
+        self.floor = self.loaded_until = now - self.catchup
+        self.since = max((d for d in (
+            db.session.scalar(select(func.max(FollowUp.updated_at))),
+            db.session.scalar(select(func.max(FollowUpDeletion.deleted_at))),
+        ) if d), default=now)
+        self.fill(now)
+
+    def fill(self, now):
+        """Carga ventanas hasta cubrir ``now`` + SCHEDULER_WINDOW_MINUTES."""
+        while self.loaded_until < now + self.window:
+            self._load(self.loaded_until, self.loaded_until + self.window)
+
+    def _load(self, lo, hi):
+        rows = db.session.execute(
+            select(*_COLUMNS)
+            .where(FollowUp.when_at >= lo, FollowUp.when_at < hi,
+                   FollowUp.done == False, FollowUp.recur_freq.is_(None))
+            .order_by(FollowUp.when_at, FollowUp.id)
+            .limit(self.batch + 1)
+        ).all()
+        if len(rows) > self.batch:
+            # lote lleno: la ventana termina donde empieza la fila que sobró
+            hi = rows[self.batch].when_at
+            if hi == lo:  # más de un lote en el mismo instante
+                hi = lo + timedelta(microseconds=1)
+                rows = db.session.execute(
+                    select(*_COLUMNS).where(FollowUp.when_at == lo, FollowUp.done == False,
+                                            FollowUp.recur_freq.is_(None))).all()
+            rows = [r for r in rows if r.when_at < hi]
+        rows += db.session.execute(
+            select(*_COLUMNS)
+            .where(FollowUp.series_end >= lo, FollowUp.when_at < hi, FollowUp.done == False)
+        ).all()
+        for row in rows:
+            self._add(row, _dues(row, lo, hi))
+        self.loaded_until = hi
+
+    def _add(self, row, dues):
+        if not dues:
+            return
+        self.info[row.id] = (row.client_id, row.kind, row.title, bool(row.recur_freq))
+        self.current.setdefault(row.id, set()).update(dues)
+        for at in dues:
+            heapq.heappush(self.heap, (at, row.id))
+
+    def _drop(self, fid):
+        self.current.pop(fid, None)
+        self.info.pop(fid, None)
+
+    # -----------------------------
+    # Cambios
+    # -----------------------------
+    def apply_changes(self):
+        """Relee los seguimientos cambiados o borrados desde la última vez; devuelve cuántos."""
+        changed = db.session.execute(select(*_COLUMNS, FollowUp.updated_at)
+                                     .where(dt_since(FollowUp.updated_at, self.since))).all()
+        deleted = db.session.execute(select(FollowUpDeletion.followup_id, FollowUpDeletion.deleted_at)
+                                     .where(dt_since(FollowUpDeletion.deleted_at, self.since))).all()
+        for fid, at in deleted:
+            self._drop(fid)
+            self.since = max(self.since, at)
+        for row in changed:
+            self._drop(row.id)
+            self._add(row, _dues(row, self.floor, self.loaded_until))
+            self.since = max(self.since, row.updated_at)
+        return len(changed) + len(deleted)
+
+    # -----------------------------
+    # Vencimientos
+    # -----------------------------
+    def pop_due(self, now):
+        """[(id, vence, info)] vencidos hasta ``now``."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            at, fid = heapq.heappop(self.heap)
+            dues = self.current.get(fid)
+            if not dues or at not in dues:
+                continue   # entrada vieja (se editó, se borró o ya se avisó)
+            dues.discard(at)
+            due.append((fid, at, self.info[fid]))
+            if not dues:
+                self._drop(fid)
+        # un seguimiento creado o movido a un momento ya pasado se avisa si cae
+        # dentro de SCHEDULER_CATCHUP_MINUTES (los repetidos los filtra la tabla)
+        self.floor = max(self.floor, now - self.catchup)
+        return due
+
+    def next_due(self):
+        return self.heap[0][0] if self.heap else None
+
+    def __len__(self):
+        return sum(len(d) for d in self.current.values())
+
+
+def write_notifications(due):
+    """Inserta los avisos que no existan todavía; devuelve cuántos escribió."""
+    if not due:
+        return 0
+    keys = {(fid, at) for fid, at, _ in due}
+    existing = {tuple(r) for r in db.session.execute(
+        select(Notification.followup_id, Notification.due_at)
+        .where(Notification.followup_id.in_(sorted({fid for fid, _ in keys})),
+               Notification.due_at >= min(at for _, at in keys)))}
+    rows = [{"followup_id": fid, "occurrence": series, "client_id": client_id, "kind": kind,
+             "title": title, "due_at": at}
+            for fid, at, (client_id, kind, title, series) in due if (fid, at) not in existing]
+    if not rows:
+        return 0
+    written = len(rows)
+    try:
+        db.session.execute(insert(Notification), rows)
+        db.session.commit()
+    except IntegrityError:
+        # otro scheduler escribió alguno al mismo tiempo: uno por uno
+        db.session.rollback()
+        written = 0
+        for row in rows:
+            try:
+                db.session.execute(insert(Notification), [row])
+                db.session.commit()
+                written += 1
+            except IntegrityError:
+                db.session.rollback()
+    if written:
+        cache.bump("notifications")
+    return written
+
+
+def run_scheduler(once=False, now_fn=datetime.utcnow):
+    cfg = current_app.config
+    queue = DueQueue(window_minutes=cfg.get("SCHEDULER_WINDOW_MINUTES", 60),
+                     batch=cfg.get("SCHEDULER_BATCH", 5000),
+                     catchup_minutes=cfg.get("SCHEDULER_CATCHUP_MINUTES", 60))
+    poll = cfg.get("SCHEDULER_POLL_SECONDS", 1.0)
+    rescan = cfg.get("SCHEDULER_RESCAN_SECONDS", 60)
+    queue.start(now_fn())
+    version = cache.version("followups")
+    last_scan = time.monotonic()
+    written = 0
+
+    while True:
+        now = now_fn()
+        current = cache.version("followups")
+        if current != version or time.monotonic() - last_scan > rescan:
+            version = current
+            last_scan = time.monotonic()
+            queue.apply_changes()
+        queue.fill(now)
+        written += write_notifications(queue.pop_due(now))
+        db.session.remove()   # no retener la transacción (ni el snapshot) entre vueltas
+        if once:
+            return written
+        next_due = queue.next_due()
+        wait = poll if next_due is None else min(poll, max((next_due - now_fn()).total_seconds(), 0))
+        time.sleep(wait)
+
+
+@click.command("followups-scheduler")
+@click.option("--once", is_flag=True, help="Escribe los avisos vencidos hasta ahora y termina.")
+def followups_scheduler_command(once):
+    """Escribe en notifications los seguimientos a medida que vencen."""
+    db.create_all()
+    if once:
+        click.echo(f"✅ {run_scheduler(once=True)} avisos escritos.")
+        return
+    click.echo("▶ Scheduler de seguimientos iniciado.")
+    run_scheduler()
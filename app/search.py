@@ -0,0 +1,222 @@
+# app/search.py
+"""Búsqueda de clientes con índice de texto completo.
+
+- SQLite: tablas FTS5 ``clients_fts`` (nombres/empresa, búsqueda por prefijo) y
+  ``clients_fts_sub`` (tokenizer trigram sobre todas las columnas, para
+  fragmentos), sincronizadas con ``clients`` mediante triggers.
+- MySQL: índices FULLTEXT sobre nombres/empresa y FULLTEXT con parser ngram
+  sobre todas las columnas (InnoDB los mantiene solo).
+- Cualquier otro caso (índice no instalado): ILIKE como antes.
+
+Con índice o sin él, ``q`` encuentra el texto en cualquier parte de nombre,
+apellido, email, teléfono o empresa ("ana" o "lorz" dan "Mariana
+Solorzano"); los textos de menos de 3 caracteres (2 en MySQL) solo se
+buscan como prefijo de palabra.
+
+El índice se crea con ``flask search-index`` (o desde init_db.py).
+"""
+import re
+import time
+
+import click
+from sqlalchemy import Integer, column, or_, text
+
+from .models import db, Client
+
+# Segundos antes de volver a comprobar si el índice ya fue instalado
+_RECHECK_SECONDS = 60
+_installed = {}
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+           first_name, last_name, email, company,
+           content='clients', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts_sub USING fts5(
+           first_name, last_name, email, phone, company,
+           content='clients', content_rowid='id',
+           tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS clients_fts_ai AFTER INSERT ON clients BEGIN
+           INSERT INTO clients_fts(rowid, first_name, last_name, email, company)
+           VALUES (new.id, new.first_name, new.last_name, new.email, new.company);
+           INSERT INTO clients_fts_sub(rowid, first_name, last_name, email, phone, company)
+           VALUES (new.id, new.first_name, new.last_name, new.email, new.phone, new.company);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS clients_fts_ad AFTER DELETE ON clients BEGIN
+           INSERT INTO clients_fts(clients_fts, rowid, first_name, last_name, email, company)
+           VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.company);
+           INSERT INTO clients_fts_sub(clients_fts_sub, rowid, first_name, last_name, email, phone, company)
+           VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone, old.company);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS clients_fts_au AFTER UPDATE ON clients BEGIN
+           INSERT INTO clients_fts(clients_fts, rowid, first_name, last_name, email, company)
+           VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.company);
+           INSERT INTO clients_fts_sub(clients_fts_sub, rowid, first_name, last_name, email, phone, company)
+           VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone, old.company);
+           INSERT INTO clients_fts(rowid, first_name, last_name, email, company)
+           VALUES (new.id, new.first_name, new.last_name, new.email, new.company);
+           INSERT INTO clients_fts_sub(rowid, first_name, last_name, email, phone, company)
+           VALUES (new.id, new.first_name, new.last_name, new.email, new.phone, new.company);
+       END""",
+]
+
+_SQLITE_REBUILD = [
+    "INSERT INTO clients_fts(clients_fts) VALUES ('rebuild')",
+    "INSERT INTO clients_fts_sub(clients_fts_sub) VALUES ('rebuild')",
+]
+
+# Versión anterior: trigram solo sobre email/teléfono (los triggers tienen el
+# mismo nombre, se recrean con el cuerpo nuevo)
+_SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS clients_fts_ai",
+    "DROP TRIGGER IF EXISTS clients_fts_ad",
+    "DROP TRIGGER IF EXISTS clients_fts_au",
+    "DROP TABLE IF EXISTS clients_fts_tri",
+]
+
+_MYSQL_DDL = [
+    "ALTER TABLE clients ADD FULLTEXT INDEX ft_clients_names (first_name, last_name, email, company)",
+    "ALTER TABLE clients ADD FULLTEXT INDEX ft_clients_ngram "
+    "(first_name, last_name, email, phone, company) WITH PARSER ngram",
+]
+_MYSQL_OBSOLETE = ["ft_clients_contact"]
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def is_installed():
+    """¿Existe el índice de búsqueda en la BD actual? (cacheado por proceso)"""
+    key = str(db.engine.url)
+    hit = _installed.get(key)
+    now = time.monotonic()
+    if hit is not None and (hit[0] or hit[1] > now):
+        return hit[0]
+
+    dialect = _dialect()
+    if dialect == "sqlite":
+        sql = "SELECT 1 FROM sqlite_master WHERE name = 'clients_fts_sub'"
+    elif dialect == "mysql":
+        sql = ("SELECT 1 FROM information_schema.statistics "
+               "WHERE table_schema = DATABASE() AND table_name = 'clients' "
+               "AND index_name = 'ft_clients_ngram' LIMIT 1")
+    else:
+        _installed[key] = (False, float("inf"))
+        return False
+
+    ok = db.session.execute(text(sql)).first() is not None
+    _installed[key] = (ok, now + _RECHECK_SECONDS)
+    return ok
+
+
+def install(rebuild=True):
+    """Crea (si falta) y reconstruye el índice. Devuelve el dialecto usado."""
+    dialect = _dialect()
+    with db.engine.begin() as conn:
+        if dialect == "sqlite":
+            for stmt in _SQLITE_DROP + _SQLITE_DDL:
+                conn.exec_driver_sql(stmt)
+            if rebuild:
+                for stmt in _SQLITE_REBUILD:
+                    conn.exec_driver_sql(stmt)
+        elif dialect == "mysql":
+            existing = {r[0] for r in conn.exec_driver_sql(
+                "SELECT DISTINCT index_name FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'clients'")}
+            for stmt in _MYSQL_DDL:
+                name = stmt.split("INDEX ", 1)[1].split(" ", 1)[0]
+                if name not in existing:
+                    conn.exec_driver_sql(stmt)
+            for name in _MYSQL_OBSOLETE:
+                if name in existing:
+                    conn.exec_driver_sql(f"ALTER TABLE clients DROP INDEX {name}")
+            # InnoDB mantiene FULLTEXT al vuelo; no hay 'rebuild' que hacer
+        else:
+            raise RuntimeError(f"Búsqueda de texto completo no soportada en '{dialect}'.")
+    _installed.pop(str(db.engine.url), None)
+    return dialect
+
+
+# -----------------------------
+# Construcción de consultas
+# -----------------------------
+_MYSQL_BOOL_CHARS = re.compile(r'[+\-<>()~*"@]')
+
+
+def _tokens(q):
+    return [t for t in q.split() if t]
+
+
+def _fts5_phrase(s):
+    return '"' + s.replace('"', '""') + '"'
+
+
+def _ilike_clause(q):
+    like = f"%{q}%"
+    return (
+        (Client.first_name.ilike(like)) |
+        (Client.last_name.ilike(like)) |
+        (Client.email.ilike(like)) |
+        (Client.phone.ilike(like)) |
+        (Client.company.ilike(like))
+    )
+
+
+def _sqlite_clause(q):
+    names = " AND ".join(_fts5_phrase(t) + "*" for t in _tokens(q))
+    subq = (text("SELECT rowid FROM clients_fts WHERE clients_fts MATCH :fts_names")
+            .bindparams(fts_names=names)
+            .columns(column("rowid", Integer)))
+    parts = [Client.id.in_(subq)]
+    # trigram (fragmento en cualquier columna) exige al menos 3 caracteres
+    if len(q) >= 3:
+        tri = (text("SELECT rowid FROM clients_fts_sub WHERE clients_fts_sub MATCH :fts_tri")
+               .bindparams(fts_tri=_fts5_phrase(q))
+               .columns(column("rowid", Integer)))
+        parts.append(Client.id.in_(tri))
+    return or_(*parts)
+
+
+def _mysql_clause(q):
+    words = [_MYSQL_BOOL_CHARS.sub(" ", t).strip() for t in _tokens(q)]
+    words = [w for t in words for w in t.split() if len(w) >= 3]
+    parts = []
+    if words:
+        parts.append(text(
+            "MATCH (clients.first_name, clients.last_name, clients.email, clients.company) "
+            "AGAINST (:ft_names IN BOOLEAN MODE)"
+        ).bindparams(ft_names=" ".join(f"+{w}*" for w in words)))
+    frag = q.replace('"', " ").strip()
+    if len(frag) >= 2:
+        parts.append(text(
+            "MATCH (clients.first_name, clients.last_name, clients.email, clients.phone, "
+            "clients.company) AGAINST (:ft_sub IN BOOLEAN MODE)"
+        ).bindparams(ft_sub=f'"{frag}"'))
+    if not parts:
+        return _ilike_clause(q)
+    return or_(*parts)
+
+
+def client_match(q):
+    """Criterio WHERE sobre ``Client`` para el texto ``q`` (None si vacío).
+
+    Lo comparten clientes, pedidos y cotizaciones; estos dos últimos ya hacen
+    JOIN con ``Client``.
+    """
+    q = (q or "").strip()
+    if not q:
+        return None
+    if not is_installed():
+        return _ilike_clause(q)
+    if _dialect() == "sqlite":
+        return _sqlite_clause(q)
+    return _mysql_clause(q)
+
+
+@click.command("search-index")
+@click.option("--no-rebuild", is_flag=True, help="Solo crear estructuras, sin reindexar.")
+def search_index_command(no_rebuild):
+    """Crea/reconstruye el índice de búsqueda de clientes."""
+    dialect = install(rebuild=not no_rebuild)
+    click.echo(f"✅ Índice de búsqueda listo ({dialect}).")
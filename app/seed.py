@@ -0,0 +1,310 @@
+# app/seed.py
+"""Datos sintéticos para pruebas de carga (``flask seed``).
+
+Genera clientes, productos, pedidos con ítems y pagos, cotizaciones con
+ítems y seguimientos con INSERT en bloque (executemany) por lotes, con ids
+asignados aquí para enlazar hijos sin leerlos de vuelta. Con la misma
+``--seed`` y la base vacía los datos salen idénticos, así que las mediciones
+de ``flask bench`` son comparables entre commits.
+
+Como los INSERT no pasan por la sesión, ``paid_total``/``balance`` se
+calculan al generar y al final se regeneran los rollups y se avisa a las
+cachés en memoria (clientes, productos, seguimientos, dashboard).
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import click
+from sqlalchemy import func, insert, select
+
+from . import recurrence, rollups
+from .auth.passwords import hash_many
+from .cache import cache
+from .models import (db, Client, FollowUp, Order, OrderItem, Payment, Product, Quote,
+                     QuoteItem, User)
+
+FIRST_NAMES = ["Ana", "Luis", "María", "José", "Carlos", "Lucía", "Jorge", "Sofía", "Pedro",
+               "Elena", "Diego", "Carmen", "Andrés", "Valeria", "Miguel", "Gabriela", "Raúl",
+               "Daniela", "Fernando", "Isabel", "Héctor", "Paola", "Ricardo", "Andrea"]
+LAST_NAMES = ["López", "García", "Pérez", "Hernández", "Martínez", "González", "Rodríguez",
+              "Ramírez", "Morales", "Castillo", "Juárez", "Méndez", "Ortiz", "Reyes", "Cruz",
+              "Flores", "Vásquez", "Aguilar", "Estrada", "Barrios"]
+COMPANIES = ["Distribuidora", "Comercial", "Ferretería", "Farmacia", "Librería", "Panadería",
+             "Taller", "Importadora", "Agroservicio", "Tienda"]
+PRODUCT_WORDS = ["Cable", "Tornillo", "Cuaderno", "Lámpara", "Filtro", "Bomba", "Llanta",
+                 "Cemento", "Pintura", "Tubo", "Válvula", "Batería", "Cinta", "Guante", "Mochila"]
+PRODUCT_ADJ = ["básico", "reforzado", "premium", "industrial", "compacto", "doble", "eco"]
+
+ORDER_STATUS = (["pendiente"] * 3 + ["en_proceso"] * 2 + ["enviado"] * 2 + ["entregado"] * 6
+                + ["cancelado"])
+QUOTE_STATUS = ["borrador", "enviada", "enviada", "aceptada", "rechazada", "vencida"]
+METHODS = ["efectivo", "transferencia", "tarjeta", "otro"]
+CENT = Decimal("0.01")
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(insert(model), rows)
+
+
+class Seeder:
+    def __init__(self, seed=42, days=365, batch=2000):
+        self.rnd = random.Random(seed)
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.days = days
+        self.batch = batch
+        self.counts = {}
+
+    def _when(self):
+        return self.now - timedelta(seconds=self.rnd.randrange(self.days * 86400))
+
+    def _count(self, name, n):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    # -----------------------------
+    # Catálogos
+    # -----------------------------
+    def products(self, n):
+        start = _next_id(Product)
+        rows = []
+        for i in range(start, start + n):
+            rows.append({
+                "id": i, "sku": f"SEED-{i:06d}",
+                "name": f"{self.rnd.choice(PRODUCT_WORDS)} {self.rnd.choice(PRODUCT_ADJ)} {i}",
+                "price": Decimal(self.rnd.randrange(100, 250000)) * CENT,
+                "is_active": self.rnd.random() > 0.05, "created_at": self._when(),
+            })
+        _insert(Product, rows)
+        db.session.commit()
+        self._count("products", n)
+        return [(r["id"], r["name"], r["price"]) for r in rows]
+
+    def clients(self, n):
+        start = _next_id(Client)
+        for lo in range(start, start + n, self.batch):
+            rows = []
+            for i in range(lo, min(lo + self.batch, start + n)):
+                first, last = self.rnd.choice(FIRST_NAMES), self.rnd.choice(LAST_NAMES)
+                created = self._when()
+                rows.append({
+                    "id": i, "first_name": first, "last_name": last,
+                    "email": f"cliente{i}@seed.example.com",
+                    "phone": f"5{self.rnd.randrange(10**7):07d}",
+                    "company": f"{self.rnd.choice(COMPANIES)} {last}" if self.rnd.random() < 0.6 else None,
+                    "is_deleted": self.rnd.random() < 0.02,
+                    "created_at": created, "updated_at": created,
+                })
+            _insert(Client, rows)
+            db.session.commit()
+        self._count("clients", n)
+        return start, start + n
+
+    # -----------------------------
+    # Documentos con ítems
+    # -----------------------------
+    def _items(self, parent_key, parent_id, products, created):
+        items, total = [], Decimal("0.00")
+        for _ in range(self.rnd.choice((1, 1, 2, 2, 3, 4, 6))):
+            qty = Decimal(self.rnd.randrange(1, 11))
+            if products and self.rnd.random() < 0.8:
+                pid, name, price = self.rnd.choice(products)
+            else:
+                pid, name, price = None, "Servicio " + self.rnd.choice(PRODUCT_ADJ), \
+                    Decimal(self.rnd.randrange(5000, 90000)) * CENT
+            items.append({parent_key: parent_id, "product_id": pid, "description": name,
+                          "quantity": qty, "unit_price": price, "created_at": created})
+            total += qty * price
+        return items, total
+
+    def _payments(self, order_id, status, total, created):
+        if status == "cancelado" or total <= 0:
+            return []
+        share = {"entregado": 1.0, "enviado": self.rnd.choice((1.0, 0.5)),
+                 "en_proceso": self.rnd.choice((0.5, 0.0)),
+                 "pendiente": self.rnd.choice((0.3, 0.0, 0.0))}[status]
+        if self.rnd.random() < 0.1:
+            share = 0.0  # algunos morosos en cualquier estado
+        amount = (total * Decimal(str(share))).quantize(CENT)
+        if amount <= 0:
+            return []
+        parts = [amount] if amount < 100 or self.rnd.random() < 0.6 else \
+            [(amount / 2).quantize(CENT), amount - (amount / 2).quantize(CENT)]
+        rows = []
+        for part in parts:
+            paid_at = min(created + timedelta(days=self.rnd.randrange(0, 31),
+                                              seconds=self.rnd.randrange(86400)), self.now)
+            rows.append({"order_id": order_id, "amount": part, "method": self.rnd.choice(METHODS),
+                         "reference": None, "paid_at": paid_at, "created_at": paid_at})
+        return rows
+
+    def orders(self, n, client_range, products):
+        start = _next_id(Order)
+        lo_c, hi_c = client_range
+        for lo in range(start, start + n, self.batch):
+            orders, items, payments = [], [], []
+            for oid in range(lo, min(lo + self.batch, start + n)):
+                created = self._when()
+                status = self.rnd.choice(ORDER_STATUS)
+                its, total = self._items("order_id", oid, products, created)
+                pays = self._payments(oid, status, total, created)
+                paid = sum((p["amount"] for p in pays), Decimal("0.00"))
+                orders.append({"id": oid, "client_id": self.rnd.randrange(lo_c, hi_c),
+                               "status": status, "total": total, "paid_total": paid,
+                               "balance": total - paid, "notes": None,
+                               "created_at": created, "updated_at": created})
+                items.extend(its)
+                payments.extend(pays)
+            _insert(Order, orders)
+            _insert(OrderItem, items)
+            _insert(Payment, payments)
+            db.session.commit()
+            self._count("orders", len(orders))
+            self._count("order_items", len(items))
+            self._count("payments", len(payments))
+
+    def quotes(self, n, client_range, products):
+        start = _next_id(Quote)
+        lo_c, hi_c = client_range
+        for lo in range(start, start + n, self.batch):
+            quotes, items = [], []
+            for qid in range(lo, min(lo + self.batch, start + n)):
+                created = self._when()
+                its, total = self._items("quote_id", qid, products, created)
+                quotes.append({"id": qid, "client_id": self.rnd.randrange(lo_c, hi_c),
+                               "status": self.rnd.choice(QUOTE_STATUS),
+                               "valid_until": (created + timedelta(days=15)).date(),
+                               "total": total, "notes": None,
+                               "created_at": created, "updated_at": created})
+                items.extend(its)
+            _insert(Quote, quotes)
+            _insert(QuoteItem, items)
+            db.session.commit()
+            self._count("quotes", len(quotes))
+            self._count("quote_items", len(items))
+
+    def followups(self, n, client_range):
+        lo_c, hi_c = client_range
+        kinds = ["seguimiento", "entrega", "cobro"]
+        for lo in range(0, n, self.batch):
+            rows = []
+            for _ in range(lo, min(lo + self.batch, n)):
+                when = self.now + timedelta(minutes=self.rnd.randrange(-60 * 24 * 60, 60 * 24 * 60))
+                kind = self.rnd.choice(kinds)
+                # creado unos días antes, pero nunca en el futuro
+                created = min(when - timedelta(days=3), self.now)
+                rows.append({"client_id": self.rnd.randrange(lo_c, hi_c), "order_id": None,
+                             "kind": kind, "title": f"{kind.capitalize()} con cliente",
+                             "when_at": when, "done": when < self.now and self.rnd.random() < 0.7,
+                             "created_at": created, "updated_at": created})
+            _insert(FollowUp, rows)
+            db.session.commit()
+        self._count("followups", n)
+
+    def series(self, n, client_range):
+        """Seguimientos recurrentes (el "cobro" semanal por cliente, etc.)."""
+        lo_c, hi_c = client_range
+        rows = []
+        for _ in range(n):
+            start = self.now.replace(minute=0, second=0) - timedelta(days=self.rnd.randrange(self.days))
+            freq = self.rnd.choice(("weekly", "weekly", "weekly", "monthly", "daily"))
+            count = self.rnd.choice((None, None, 12, 52))
+            kind = self.rnd.choice(["cobro", "cobro", "seguimiento"])
+            rows.append({"client_id": self.rnd.randrange(lo_c, hi_c), "order_id": None,
+                         "kind": kind, "title": f"{kind.capitalize()} recurrente",
+                         "when_at": start, "done": False,
+                         "recur_freq": freq, "recur_interval": 1, "recur_count": count,
+                         "series_end": recurrence.series_end(start, freq, 1, None, count),
+                         "created_at": start, "updated_at": start})
+        for lo in range(0, n, self.batch):
+            _insert(FollowUp, rows[lo:lo + self.batch])
+            db.session.commit()
+        self._count("series", n)
+
+
+def create_users(pairs, processes=None):
+    """Alta masiva de ``[(email, contraseña)]``: hashea en paralelo e inserta en bloque.
+    Omite los emails que ya existen; devuelve cuántos creó."""
+    emails = [e.strip().lower() for e, _ in pairs]
+    existing = set()
+    for i in range(0, len(emails), 500):
+        existing.update(db.session.scalars(select(User.email).where(User.email.in_(emails[i:i + 500]))))
+    todo = {}
+    for email, (_, raw) in zip(emails, pairs):
+        if email not in existing:
+            todo.setdefault(email, raw)
+    hashes = hash_many(list(todo.values()), processes=processes)
+    _insert(User, [{"email": e, "password_hash": h, "is_active": True}
+                   for e, h in zip(todo, hashes)])
+    db.session.commit()
+    return len(todo)
+
+
+def require_scratch_db(i_know=False):
+    """Corta si la base no es SQLite: seed y bench-login crean usuarios activos
+    con contraseña conocida. ``--i-know`` lo permite igual."""
+    dialect = db.engine.dialect.name
+    if dialect != "sqlite" and not i_know:
+        raise click.ClickException(
+            f"La base es {dialect}, no SQLite: este comando crea usuarios con contraseña "
+            "'bench'. Úsalo en una base de pruebas o agrega --i-know.")
+
+
+def ensure_user(email, password):
+    if not db.session.scalar(select(User.id).where(User.email == email)):
+        u = User(email=email)
+        u.set_password(password)
+        db.session.add(u)
+        db.session.commit()
+
+
+@click.command("seed")
+@click.option("--clients", "n_clients", default=1000, show_default=True)
+@click.option("--orders", "n_orders", default=10000, show_default=True)
+@click.option("--quotes", "n_quotes", default=None, type=int, help="Por defecto orders / 4.")
+@click.option("--followups", "n_followups", default=None, type=int, help="Por defecto clients / 2.")
+@click.option("--series", "n_series", default=None, type=int,
+              help="Seguimientos recurrentes; por defecto clients / 10.")
+@click.option("--products", "n_products", default=200, show_default=True)
+@click.option("--days", default=365, show_default=True, help="Días hacia atrás para las fechas.")
+@click.option("--seed", default=42, show_default=True, help="Semilla del generador.")
+@click.option("--batch", default=2000, show_default=True, help="Filas padre por INSERT.")
+@click.option("--user", default="bench@example.com", show_default=True,
+              help="Usuario para iniciar sesión (contraseña = 'bench').")
+@click.option("--i-know", is_flag=True, help="Permitir una base que no sea SQLite.")
+def seed_command(n_clients, n_orders, n_quotes, n_followups, n_series, n_products, days, seed, batch, user,
+                 i_know):
+    """Llena la base con datos sintéticos (millones de filas en minutos)."""
+    require_scratch_db(i_know)
+    db.create_all()
+    n_quotes = n_orders // 4 if n_quotes is None else n_quotes
+    n_followups = n_clients // 2 if n_followups is None else n_followups
+    n_series = n_clients // 10 if n_series is None else n_series
+    started = time.perf_counter()
+    s = Seeder(seed=seed, days=days, batch=batch)
+
+    ensure_user(user, "bench")
+    products = s.products(n_products)
+    client_range = s.clients(n_clients)
+    if n_clients:
+        s.orders(n_orders, client_range, products)
+        s.quotes(n_quotes, client_range, products)
+        s.followups(n_followups, client_range)
+        s.series(n_series, client_range)
+
+    click.echo("▶ Regenerando rollups...")
+    rollups.rebuild_all()
+    for name in ("clients", "products", "followups"):
+        cache.bump(name)
+    cache.invalidate("dashboard", "receivables")
+
+    seconds = time.perf_counter() - started
+    total = sum(s.counts.values())
+    for name, n in s.counts.items():
+        click.echo(f"  {name:<12} {n:>10,}")
+    click.echo(f"✅ {total:,} filas en {seconds:.1f} s ({total / seconds:,.0f} filas/s).")
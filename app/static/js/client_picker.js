@@ -0,0 +1,66 @@
+// Autocompletado de clientes (reemplaza el <select> con todos los clientes).
+// Busca en /api/clients/lookup mientras se escribe y guarda el id elegido
+// en el input oculto name="client_id".
+document.querySelectorAll('.client-picker').forEach(picker => {
+  const input  = picker.querySelector('.client-picker-input');
+  const hidden = picker.querySelector('input[type="hidden"]');
+  const menu   = picker.querySelector('.client-picker-menu');
+  const url    = picker.dataset.url;
+  let timer = null;
+  let seq = 0;
+
+  function choose(c){
+    hidden.value = c.id;
+    input.value = c.label;
+    input.setCustomValidity('');
+    menu.classList.remove('show');
+  }
+
+  function render(items){
+    menu.innerHTML = '';
+    if (!items.length){
+      menu.innerHTML = '<span class="dropdown-item-text text-muted">Sin resultados</span>';
+    }
+    items.forEach(c => {
+      const a = document.createElement('button');
+      a.type = 'button';
+      a.className = 'dropdown-item';
+      a.textContent = c.label + (c.company ? ' (' + c.company + ')' : '');
+      a.addEventListener('mousedown', e => { e.preventDefault(); choose(c); });
+      menu.appendChild(a);
+    });
+    menu.classList.add('show');
+  }
+
+  input.addEventListener('input', () => {
+    hidden.value = '';
+    clearTimeout(timer);
+    const q = input.value.trim();
+    if (q.length < 2){ menu.classList.remove('show'); return; }
+    timer = setTimeout(() => {
+      const mine = ++seq;
+      fetch(url + '?q=' + encodeURIComponent(q))
+        .then(r => r.json())
+        .then(items => { if (mine === seq) render(items); });
+    }, 150);
+  });
+
+  input.addEventListener('keydown', e => {
+    if (e.key === 'Enter' && menu.classList.contains('show')){
+      const first = menu.querySelector('.dropdown-item');
+      if (first){ e.preventDefault(); first.dispatchEvent(new MouseEvent('mousedown')); }
+    } else if (e.key === 'Escape'){
+      menu.classList.remove('show');
+    }
+  });
+
+  input.addEventListener('blur', () => menu.classList.remove('show'));
+
+  input.form.addEventListener('submit', e => {
+    if (input.required && !hidden.value){
+      input.setCustomValidity('Selecciona un cliente de la lista.');
+      input.reportValidity();
+      e.preventDefault();
+    }
+  });
+});
@@ -1,16 +1,29 @@
-
 import argparse
+import csv
 from app import create_app
 from app.models import db, User
+from app.seed import create_users
 
 def main():
     parser = argparse.ArgumentParser(description="Crear usuario para el sistema")
-    parser.add_argument("--email", required=True, help="Email del usuario (único)")
-    parser.add_argument("--password", required=True, help="Contraseña en texto plano (se guardará hasheada)")
+    parser.add_argument("--email", help="Email del usuario (único)")
+    parser.add_argument("--password", help="Contraseña en texto plano (se guardará hasheada)")
+    parser.add_argument("--bulk", metavar="CSV", help="Archivo con columnas email,password (alta masiva)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para hashear en --bulk (por defecto, núcleos)")
     args = parser.parse_args()
+    if not args.bulk and not (args.email and args.password):
+        parser.error("use --email y --password, o --bulk archivo.csv")
 
     app = create_app()
     with app.app_context():
+        if args.bulk:
+            with open(args.bulk, newline="", encoding="utf-8") as fh:
+                pairs = [(r[0], r[1]) for r in csv.reader(fh)
+                         if len(r) >= 2 and r[0].strip() and r[0].strip().lower() != "email"]
+            created = create_users(pairs, processes=args.workers)
+            print(f"✅ {created} usuarios creados ({len(pairs) - created} ya existían).")
+            return
+
         if User.query.filter_by(email=args.email.lower()).first():
             print("❌ Ya existe un usuario con ese email.")
             return
@@ -0,0 +1,29 @@
+# gunicorn.conf.py (gunicorn lo carga solo desde el directorio de trabajo)
+"""Workers con hilos y métricas multiproceso.
+
+- ``gthread``: mientras un hilo espera la verificación de una contraseña
+  (app/auth/passwords.py) los demás siguen atendiendo; con el worker
+  ``sync`` el proceso entero queda bloqueado en cada login.
+- Cada worker escribe sus métricas en PROMETHEUS_MULTIPROC_DIR y /metrics
+  las suma (ver app/metrics.py).
+"""
+import os
+import shutil
+import tempfile
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "app_metrics"))
+
+
+def on_starting(server):
+    # Los archivos de una ejecución anterior no deben sumarse
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,8 +1,20 @@
 
 from app import create_app, db
 from app import models  
+from app import search
+from app import recurrence
+from app.auth import user_cache
 
 app = create_app()
 with app.app_context():
     db.create_all()
-    print("✅ Tablas creadas correctamente.")
\ No newline at end of file
+    print("✅ Tablas creadas correctamente.")
+    added = recurrence.install()
+    if user_cache.install():
+        added.append("users.session_version")
+    if added:
+        print("✅ Columnas agregadas:", ", ".join(added))
+    try:
+        print(f"✅ Índice de búsqueda listo ({search.install()}).")
+    except Exception as e:
+        print("⚠️  No se pudo crear el índice de búsqueda:", e)
\ No newline at end of file